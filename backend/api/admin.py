@@ -0,0 +1,48 @@
+from flask import Blueprint, jsonify
+from models.database import get_db
+from api.auth import admin_required
+from utils.tts import get_tts
+
+bp = Blueprint('admin', __name__)
+db = get_db()
+
+
+@bp.route('/query-stats', methods=['GET'])
+@admin_required
+def get_query_stats():
+    """查询延迟直方图与慢查询（当前进程）"""
+    return jsonify({
+        'success': True,
+        'data': db.query_stats(),
+        'pool': db.pool_stats()
+    })
+
+
+@bp.route('/cache-stats', methods=['GET'])
+@admin_required
+def get_cache_stats():
+    """结果缓存命中/未命中计数（当前进程）"""
+    return jsonify({'success': True, 'data': db.cache_stats()})
+
+
+@bp.route('/tts-stats', methods=['GET'])
+@admin_required
+def get_tts_stats():
+    """TTS 上游请求、重试与熔断状态（当前进程）"""
+    return jsonify({'success': True, 'data': get_tts().stats()})
+
+
+@bp.route('/audio-cache-stats', methods=['GET'])
+@admin_required
+def get_audio_cache_stats():
+    """音频缓存容量、命中率、淘汰与启动扫描结果，以及当前进程的内存层"""
+    tts = get_tts()
+    return jsonify({'success': True, 'data': dict(tts.cache.stats(), memory=tts.memory.stats())})
+
+
+@bp.route('/query-stats/reset', methods=['POST'])
+@admin_required
+def reset_query_stats():
+    """清空查询统计"""
+    db.reset_query_stats()
+    return jsonify({'success': True, 'message': '已清空'})
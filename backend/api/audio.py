@@ -1,14 +1,26 @@
-from flask import Blueprint, request, jsonify, send_file
-from utils.tts import TTSManager
-import os
+import re
+from flask import Blueprint, Response, request, jsonify, send_file, url_for
+from pathlib import Path
+from config import Config
+from utils.tts import TTSUnavailableError, get_tts
 
 bp = Blueprint('audio', __name__)
-tts = TTSManager()
+# 缓存键：文本、发音人、语速的 MD5
+CACHE_KEY_PATTERN = re.compile(r'[0-9a-f]{32}')
+tts = get_tts()
+tts.cache.warm_start()
+
+
+@bp.errorhandler(TTSUnavailableError)
+def handle_tts_unavailable(e):
+    response = jsonify({'success': False, 'error': '语音服务暂不可用，请稍后重试'})
+    response.headers['Retry-After'] = str(int(e.retry_after + 0.5))
+    return response, 503
 
 
 @bp.route('/generate', methods=['POST'])
 def generate_audio():
-    """生成语音"""
+    """生成语音，返回按缓存键寻址的音频 URL"""
     data = request.json
     text = data.get('text')
     voice_name = data.get('voice_name', 'en-US-JennyNeural')
@@ -16,12 +28,55 @@ def generate_audio():
 
     audio_path = tts.generate_audio(text, voice_name, speech_rate)
 
-    if audio_path and os.path.exists(audio_path):
-        return send_file(audio_path, mimetype='audio/mpeg')
+    if audio_path:
+        key = tts.cache_key(text, voice_name, speech_rate)
+        return jsonify({
+            'success': True,
+            'data': {'key': key, 'url': url_for('audio.get_audio_file', key=key)}
+        })
     else:
         return jsonify({'success': False, 'error': 'Failed to generate audio'}), 500
 
 
+@bp.route('/files/<key>.mp3', methods=['GET'])
+def get_audio_file(key):
+    """按缓存键取音频
+
+    键由文本、发音人和语速决定，同一 URL 的内容不变，浏览器、nginx 和 CDN 都可以长期缓存；
+    支持 If-None-Match（304）和 Range。已被淘汰时返回 404，需重新调用 /generate。
+    """
+    if not CACHE_KEY_PATTERN.fullmatch(key):
+        return jsonify({'success': False, 'error': '无效的音频键'}), 404
+
+    tier, audio, audio_path, etag = tts.open_cached(key)
+    if tier is None:
+        return jsonify({'success': False, 'error': '音频不存在，请重新生成'}), 404
+    return audio_response(tier, audio, audio_path, etag)
+
+
+def audio_response(tier, audio, audio_path, etag):
+    """按缓存层发送音频，带强 ETag 和长期缓存头，X-Audio-Cache 标明命中的层（memory/disk）"""
+    if audio is not None:
+        # 内存层的 bytes 直接作为响应体，304 与 Range 由 make_conditional 处理
+        response = Response(audio, mimetype='audio/mpeg')
+        response.set_etag(etag)
+        response.make_conditional(request, accept_ranges=True, complete_length=len(audio))
+    elif Config.AUDIO_ACCEL_PREFIX:
+        # 由 nginx 从共享卷直接发送，nginx 生成同样的 ETag 并处理 304 与 Range（见 frontend/nginx.conf）
+        response = Response(mimetype='audio/mpeg')
+        response.headers['X-Accel-Redirect'] = (
+            Config.AUDIO_ACCEL_PREFIX + Path(audio_path).relative_to(tts.cache.root).as_posix())
+    else:
+        # send_file 处理 304 与 Range，gunicorn 的 wsgi.file_wrapper 以 sendfile 发送，文件内容不经过 Python
+        response = send_file(audio_path, mimetype='audio/mpeg', etag=etag, conditional=True,
+                             max_age=Config.AUDIO_URL_MAX_AGE)
+    response.headers['X-Audio-Cache'] = tier
+    response.cache_control.public = True
+    response.cache_control.max_age = Config.AUDIO_URL_MAX_AGE
+    response.cache_control.immutable = True
+    return response
+
+
 @bp.route('/voices', methods=['GET'])
 def get_voices():
     """获取可用发音人列表"""
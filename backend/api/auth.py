@@ -1,11 +1,12 @@
 from flask import Blueprint, request, jsonify, session
-from models.database import DatabaseManager
+from models.database import get_db
+from config import Config
 import hashlib
 import secrets
 from functools import wraps
 
 bp = Blueprint('auth', __name__)
-db = DatabaseManager()
+db = get_db()
 
 
 def hash_password(password):
@@ -23,6 +24,18 @@ def login_required(f):
     return decorated_function
 
 
+def admin_required(f):
+    """管理员装饰器（用户名在 ADMIN_USERS 中）"""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if 'user_id' not in session:
+            return jsonify({'success': False, 'error': '请先登录'}), 401
+        if session.get('username') not in Config.ADMIN_USERS:
+            return jsonify({'success': False, 'error': '无权访问'}), 403
+        return f(*args, **kwargs)
+    return decorated_function
+
+
 @bp.route('/register', methods=['POST'])
 def register():
     """用户注册"""
@@ -0,0 +1,34 @@
+from flask import Blueprint, request, jsonify, session
+from models.database import get_db
+from api.auth import login_required
+
+bp = Blueprint('dashboard', __name__)
+db = get_db()
+
+
+@bp.route('', methods=['GET'])
+@login_required
+def get_dashboard():
+    """首页看板（统计、详细统计、今日进度、连续天数）
+
+    响应带 ETag，客户端以 If-None-Match 重新验证，数据未变时返回 304。
+    """
+    data = db.get_dashboard(session['user_id'])
+    if not data:
+        return jsonify({'success': False, 'message': '获取失败'}), 500
+
+    # 结果可能来自缓存，不能原地修改
+    streak = data['streak']
+    data = dict(data, streak={
+        'streak_days': streak['current_streak'],
+        'longest_streak': streak['longest_streak'],
+        'last_active_date': streak['last_active_date'],
+        'message': f"已连续学习 {streak['current_streak']} 天"
+    })
+
+    response = jsonify({'success': True, 'data': data})
+    response.add_etag()
+    # 每次都要重新验证；个人数据不进入共享缓存
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
@@ -1,52 +1,124 @@
-from flask import Blueprint, request, jsonify
-from models.database import DatabaseManager
+from flask import Blueprint, Response, request, jsonify, session
+from models.database import get_db, ITEM_FIELDS
+from api.auth import login_required
+from utils.pagination import decode_cursor, paginate
+from utils.rows import parse_fields, rows_response
+from utils.export import EXPORT_FORMATS
+from utils.importer import iter_json_items, iter_ndjson_items, iter_csv_items, validate_item
+from config import Config
 
 bp = Blueprint('items', __name__)
-db = DatabaseManager()
+db = get_db()
+
+# 导入响应中最多返回的错误行数
+MAX_REPORTED_ERRORS = 100
 
 
 @bp.route('/list', methods=['GET'])
+@login_required
 def get_items():
-    """获取学习内容列表"""
+    """获取学习内容列表，支持 ?cursor= 翻页
+
+    ?fields=english,chinese 只返回指定列（id、created_at 总会返回）；
+    ?format=compact 以 {columns, rows} 返回
+    """
     item_type = request.args.get('type', 'all')
     limit = int(request.args.get('limit', 50))
-    items = db.get_items_for_learning(limit, item_type)
-    return jsonify({'success': True, 'data': items})
+    try:
+        after = decode_cursor(request.args['cursor']) if request.args.get('cursor') else None
+        fields = parse_fields(request.args.get('fields'), ITEM_FIELDS, required=('id', 'created_at'))
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+    rows = db.get_items_for_learning(session['user_id'], limit + 1, item_type, after, fields)
+    items, next_cursor = paginate(rows, limit, lambda item: (item.created_at, item.id))
+    return rows_response(items, request.args.get('format') == 'compact', next_cursor=next_cursor)
 
 
 @bp.route('/statistics', methods=['GET'])
+@login_required
 def get_statistics():
     """获取统计信息"""
-    stats = db.get_statistics()
+    stats = db.get_statistics(session['user_id'])
     return jsonify({'success': True, 'data': stats})
 
 
 @bp.route('/import', methods=['POST'])
+@login_required
 def import_items():
-    """导入学习内容"""
-    data = request.json
-    item_type = data.get('type')
-    items = data.get('items', [])
-
-    count = 0
-    for item in items:
-        success = db.add_item(
-            item_type,
-            item.get('english'),
-            item.get('chinese'),
-            item.get('pronunciation', ''),
-            item.get('example_en', ''),
-            item.get('example_zh', '')
-        )
-        if success:
-            count += 1
-
-    return jsonify({'success': True, 'count': count})
+    """导入学习内容
+
+    支持三种请求体：
+    - application/json: {type, items: [...]}
+    - application/x-ndjson: 每行一个对象，流式读取
+    - text/csv: 首行为表头，流式读取
+    NDJSON/CSV 的默认类型通过 ?type= 指定，行内的 type 字段优先。
+    """
+    chunk_size = int(request.args.get('chunk_size', Config.IMPORT_CHUNK_SIZE))
+    chunk_size = max(1, min(chunk_size, 5000))
+    default_type = request.args.get('type')
+
+    content_type = request.mimetype
+    if content_type in ('application/x-ndjson', 'application/jsonl'):
+        source = iter_ndjson_items(request.stream, default_type)
+    elif content_type == 'text/csv':
+        source = iter_csv_items(request.stream, default_type)
+    else:
+        source = iter_json_items(request.json or {})
+
+    errors = []
+
+    def valid_rows():
+        for line, item in source:
+            values, error = validate_item(item)
+            if error:
+                errors.append({'line': line, 'error': error})
+            else:
+                yield line, values
+
+    result = db.add_items_bulk(session['user_id'], valid_rows(), chunk_size)
+    errors.extend(result['errors'])
+    errors.sort(key=lambda e: e['line'] or 0)
+
+    return jsonify({
+        'success': True,
+        'count': result['count'],
+        'chunks': result['chunks'],
+        'error_count': len(errors),
+        'errors': errors[:MAX_REPORTED_ERRORS]
+    })
 
 
 @bp.route('/test', methods=['GET'])
+@login_required
 def get_test_items():
-    """获取测试内容"""
+    """获取测试内容，fields/format 参数同 /list（id 总会返回）"""
     limit = int(request.args.get('limit', 20))
-    items = db.get_items_for_test(limit)
-    return jsonify({'success': True, 'data': items})
+    try:
+        fields = parse_fields(request.args.get('fields'), ITEM_FIELDS, required=('id',))
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+    items = db.get_items_for_test(session['user_id'], limit, fields)
+    return rows_response(items, request.args.get('format') == 'compact')
+
+
+@bp.route('/export', methods=['GET'])
+@login_required
+def export_items():
+    """导出全部学习内容（?format=ndjson|csv），流式输出，可直接用于 /import"""
+    fmt = request.args.get('format', 'ndjson')
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({'success': False, 'error': 'format 只能是 ndjson 或 csv'}), 400
+
+    rows = db.export_items(session['user_id'])
+    if rows is None:
+        return jsonify({'success': False, 'message': '导出失败'}), 500
+
+    encode, content_type, ext = EXPORT_FORMATS[fmt]
+    response = Response(encode(ITEM_FIELDS, rows), content_type=content_type, headers={
+        'Content-Disposition': f'attachment; filename="items.{ext}"'
+    })
+    # 未读完（客户端断开、HEAD 请求）时也要归还连接
+    response.call_on_close(rows.close)
+    return response
@@ -1,18 +1,25 @@
-from flask import Blueprint, request, jsonify
-from models.database import DatabaseManager
+from flask import Blueprint, Response, request, jsonify, session
+from models.database import get_db, ITEM_FIELDS, LEARNING_EXPORT_COLUMNS
+from api.auth import login_required
+from datetime import datetime, date
+from config import Config
+from utils.pagination import decode_cursor, paginate
+from utils.rows import parse_fields, rows_response
+from utils.export import EXPORT_FORMATS
 
 bp = Blueprint('learning', __name__)
-db = DatabaseManager()
+db = get_db()
 
 
 @bp.route('/record', methods=['POST'])
+@login_required
 def record_learning():
     """记录学习"""
     data = request.json
     item_id = data.get('item_id')
     is_correct = data.get('is_correct', False)
 
-    success = db.record_learning(item_id, is_correct)
+    success = db.record_learning(session['user_id'], item_id, is_correct)
 
     return jsonify({
         'success': success,
@@ -20,39 +27,108 @@ def record_learning():
     })
 
 
+@bp.route('/record/batch', methods=['POST'])
+@login_required
+def record_learning_batch():
+    """批量记录学习（离线补传）
+
+    请求体：{events: [{item_id, is_correct, client_ts, idempotency_key}, ...]}
+    client_ts 为 ISO 8601 字符串或毫秒时间戳；同一幂等键重复上传只记一次。
+    """
+    data = request.json or {}
+    raw_events = data.get('events') or []
+    if not isinstance(raw_events, list):
+        return jsonify({'success': False, 'error': 'events 应为数组'}), 400
+    if len(raw_events) > Config.RECORD_BATCH_MAX_EVENTS:
+        return jsonify({
+            'success': False,
+            'error': f'单次最多 {Config.RECORD_BATCH_MAX_EVENTS} 条'
+        }), 400
+
+    events = []
+    today = date.today()
+    for index, raw in enumerate(raw_events):
+        try:
+            key = str(raw['idempotency_key'])
+            if not key or len(key) > 64:
+                raise ValueError('idempotency_key 长度应为 1-64')
+            learned_date = _client_date(raw.get('client_ts')) or today
+            events.append({
+                'item_id': int(raw['item_id']),
+                'is_correct': bool(raw.get('is_correct', False)),
+                'learned_date': min(learned_date, today),
+                'idempotency_key': key
+            })
+        except (KeyError, TypeError, ValueError, OverflowError, OSError) as e:
+            # OverflowError / OSError：client_ts 超出平台可表示的时间范围
+            return jsonify({'success': False, 'error': f'第 {index + 1} 条事件无效: {e}'}), 400
+
+    result = db.record_learning_events(session['user_id'], events)
+    if result is None:
+        return jsonify({'success': False, 'message': '记录失败'}), 500
+
+    return jsonify({
+        'success': True,
+        'message': '记录成功',
+        'data': result
+    })
+
+
+def _client_date(client_ts):
+    """客户端时间戳转日期（服务器时区）"""
+    if client_ts is None:
+        return None
+    if isinstance(client_ts, (int, float)):
+        return datetime.fromtimestamp(client_ts / 1000).date()
+    parsed = datetime.fromisoformat(str(client_ts).replace('Z', '+00:00'))
+    if parsed.tzinfo:
+        parsed = parsed.astimezone()
+    return parsed.date()
+
+
 @bp.route('/review/add', methods=['POST'])
+@login_required
 def add_to_review():
     """添加到复习库"""
     data = request.json
     items = data.get('items', [])
 
-    success = db.add_to_review(items)
+    result = db.add_to_review(session['user_id'], items)
+
+    if result is None:
+        return jsonify({'success': False, 'message': '添加失败'})
 
     return jsonify({
-        'success': success,
-        'message': f'已添加 {len(items)} 项到复习库' if success else '添加失败'
+        'success': True,
+        'message': f"已添加 {result['queued']} 项到复习库",
+        'data': result
     })
 
 
 @bp.route('/review/list', methods=['GET'])
+@login_required
 def get_review_list():
-    """获取复习列表"""
+    """获取复习列表，支持 ?cursor= 翻页，fields/format 参数同 /api/items/list"""
     limit = int(request.args.get('limit', 50))
-    items = db.get_review_items(limit)
+    try:
+        after = decode_cursor(request.args['cursor']) if request.args.get('cursor') else None
+        fields = parse_fields(request.args.get('fields'), ITEM_FIELDS, required=('id',))
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
 
-    return jsonify({
-        'success': True,
-        'data': items
-    })
+    rows = db.get_review_items(session['user_id'], limit + 1, after, fields)
+    items, next_cursor = paginate(rows, limit, lambda item: (item.added_date, item.review_id))
+    return rows_response(items, request.args.get('format') == 'compact', next_cursor=next_cursor)
 
 
 @bp.route('/review/mark', methods=['POST'])
+@login_required
 def mark_reviewed():
     """标记为已复习"""
     data = request.json
     item_id = data.get('item_id')
 
-    success = db.mark_as_reviewed(item_id)
+    success = db.mark_as_reviewed(session['user_id'], item_id)
 
     return jsonify({
         'success': success,
@@ -61,10 +137,24 @@ def mark_reviewed():
 
 
 @bp.route('/history', methods=['GET'])
+@login_required
 def get_learning_history():
-    """获取学习历史"""
+    """获取学习历史
+
+    参数：days（默认 7），或 start/end（YYYY-MM-DD）；granularity=day|week|month
+    """
     days = int(request.args.get('days', 7))
-    history = db.get_learning_history(days)
+    granularity = request.args.get('granularity', 'day')
+    if granularity not in ('day', 'week', 'month'):
+        return jsonify({'success': False, 'error': 'granularity 只能是 day、week 或 month'}), 400
+
+    try:
+        start_date = _parse_date(request.args.get('start'))
+        end_date = _parse_date(request.args.get('end'))
+    except ValueError:
+        return jsonify({'success': False, 'error': '日期格式应为 YYYY-MM-DD'}), 400
+
+    history = db.get_learning_history(session['user_id'], days, start_date, end_date, granularity)
 
     return jsonify({
         'success': True,
@@ -72,10 +162,42 @@ def get_learning_history():
     })
 
 
+def _parse_date(value):
+    return datetime.strptime(value, '%Y-%m-%d').date() if value else None
+
+
+@bp.route('/items/stats', methods=['GET'])
+@login_required
+def get_item_lifetime_stats():
+    """内容的终身学习统计（含已压缩的历史记录）
+
+    参数：ids=1,2,3（最多 RECORD_BATCH_MAX_EVENTS 个）
+    """
+    try:
+        item_ids = [int(v) for v in request.args.get('ids', '').split(',') if v.strip()]
+    except ValueError:
+        return jsonify({'success': False, 'error': 'ids 应为逗号分隔的整数'}), 400
+    if not item_ids:
+        return jsonify({'success': False, 'error': '缺少 ids'}), 400
+    if len(item_ids) > Config.RECORD_BATCH_MAX_EVENTS:
+        return jsonify({
+            'success': False,
+            'error': f'单次最多 {Config.RECORD_BATCH_MAX_EVENTS} 个'
+        }), 400
+
+    stats = db.get_item_lifetime_stats(session['user_id'], item_ids)
+
+    return jsonify({
+        'success': True,
+        'data': {str(item_id): value for item_id, value in stats.items()}
+    })
+
+
 @bp.route('/statistics/detail', methods=['GET'])
+@login_required
 def get_detailed_statistics():
     """获取详细统计"""
-    stats = db.get_detailed_statistics()
+    stats = db.get_detailed_statistics(session['user_id'])
 
     return jsonify({
         'success': True,
@@ -84,9 +206,10 @@ def get_detailed_statistics():
 
 
 @bp.route('/progress/today', methods=['GET'])
+@login_required
 def get_today_progress():
     """获取今日进度"""
-    progress = db.get_today_progress()
+    progress = db.get_today_progress(session['user_id'])
 
     return jsonify({
         'success': True,
@@ -95,14 +218,38 @@ def get_today_progress():
 
 
 @bp.route('/streak', methods=['GET'])
+@login_required
 def get_learning_streak():
     """获取连续学习天数"""
-    streak = db.get_learning_streak()
+    streak = db.get_learning_streak(session['user_id'])
 
     return jsonify({
         'success': True,
         'data': {
-            'streak_days': streak,
-            'message': f'已连续学习 {streak} 天'
+            'streak_days': streak['current_streak'],
+            'longest_streak': streak['longest_streak'],
+            'last_active_date': streak['last_active_date'],
+            'message': f"已连续学习 {streak['current_streak']} 天"
         }
     })
+
+
+@bp.route('/export', methods=['GET'])
+@login_required
+def export_learning_records():
+    """导出全部学习记录（?format=ndjson|csv），流式输出"""
+    fmt = request.args.get('format', 'ndjson')
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({'success': False, 'error': 'format 只能是 ndjson 或 csv'}), 400
+
+    rows = db.export_learning_records(session['user_id'])
+    if rows is None:
+        return jsonify({'success': False, 'message': '导出失败'}), 500
+
+    encode, content_type, ext = EXPORT_FORMATS[fmt]
+    response = Response(encode(LEARNING_EXPORT_COLUMNS, rows), content_type=content_type, headers={
+        'Content-Disposition': f'attachment; filename="learning_records.{ext}"'
+    })
+    # 未读完（客户端断开、HEAD 请求）时也要归还连接
+    response.call_on_close(rows.close)
+    return response
@@ -1,7 +1,10 @@
-from flask import Flask, jsonify, request, send_file
+from flask import Flask, jsonify, request, send_file, session
 from flask_cors import CORS
-from api import items, learning, audio, auth
+from api import items, learning, audio, auth, admin, dashboard
 from config import Config
+from models.database import get_db
+from models.pool import PoolExhaustedError
+from models import replicas
 
 app = Flask(__name__)
 app.config.from_object(Config)
@@ -30,6 +33,22 @@ app.register_blueprint(auth.bp, url_prefix='/api/auth')
 app.register_blueprint(items.bp, url_prefix='/api/items')
 app.register_blueprint(learning.bp, url_prefix='/api/learning')
 app.register_blueprint(audio.bp, url_prefix='/api/audio')
+app.register_blueprint(admin.bp, url_prefix='/api/admin')
+app.register_blueprint(dashboard.bp, url_prefix='/api/dashboard')
+
+
+if Config.DB_REPLICAS:
+    # 读己之写窗口随会话保存，同一用户的后续请求落到其他 worker 时同样走主库
+    @app.before_request
+    def restore_read_your_writes():
+        replicas.begin_request(session.get('primary_until'))
+
+    @app.after_request
+    def save_read_your_writes(response):
+        primary_until = replicas.end_request(Config.READ_YOUR_WRITES_SECONDS)
+        if primary_until:
+            session['primary_until'] = primary_until
+        return response
 
 
 @app.route('/api/health')
@@ -37,5 +56,16 @@ def health_check():
     return jsonify({'status': 'ok'})
 
 
+@app.route('/api/health/db')
+def db_pool_stats():
+    """连接池指标（含从库路由）"""
+    return jsonify({'status': 'ok', 'pool': get_db().pool_stats()})
+
+
+@app.errorhandler(PoolExhaustedError)
+def handle_pool_exhausted(e):
+    return jsonify({'success': False, 'error': '服务繁忙，请稍后重试'}), 503
+
+
 if __name__ == '__main__':
     app.run(debug=True, host='0.0.0.0', port=5000)
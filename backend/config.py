@@ -1,19 +1,109 @@
 import os
+import tempfile
 class Config:
     # 数据库
     DB_HOST = os.getenv('DB_HOST', '192.168.145.129')
     DB_USER = os.getenv('DB_USER', 'root')
     DB_PASSWORD = os.getenv('DB_PASSWORD', '123456')
     DB_DATABASE = os.getenv('DB_DATABASE', 'english_learning')
+    # 存储后端：mysql，或单机部署用的嵌入式 sqlite（SQLITE_PATH 为数据库文件）
+    DB_BACKEND = os.getenv('DB_BACKEND', 'mysql')
+    SQLITE_PATH = os.getenv(
+        'SQLITE_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'english_learning.db'))
+    SQLITE_CACHE_MB = int(os.getenv('SQLITE_CACHE_MB', 64))
+    SQLITE_MMAP_MB = int(os.getenv('SQLITE_MMAP_MB', 256))
+
+    # 连接池（每个进程一个）
+    DB_POOL_MIN_SIZE = int(os.getenv('DB_POOL_MIN_SIZE', 2))
+    DB_POOL_MAX_SIZE = int(os.getenv('DB_POOL_MAX_SIZE', 10))
+    DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', 5))
+    # 高频查询使用服务端预处理语句，每个连接缓存的语句数
+    DB_PREPARED_STATEMENTS = os.getenv('DB_PREPARED_STATEMENTS', 'True') == 'True'
+    DB_STATEMENT_CACHE_SIZE = int(os.getenv('DB_STATEMENT_CACHE_SIZE', 32))
+
+    # 只读从库（逗号分隔的 host[:port]，账号、库名默认与主库相同），统计、列表等只读查询走从库
+    DB_REPLICAS = [a.strip() for a in os.getenv('DB_REPLICAS', '').split(',') if a.strip()]
+    DB_REPLICA_USER = os.getenv('DB_REPLICA_USER', '')
+    DB_REPLICA_PASSWORD = os.getenv('DB_REPLICA_PASSWORD', '')
+    DB_REPLICA_POOL_MAX_SIZE = int(os.getenv('DB_REPLICA_POOL_MAX_SIZE', DB_POOL_MAX_SIZE))
+    # 从库连接池满时等待的秒数，超时换下一个从库或主库
+    DB_REPLICA_POOL_TIMEOUT = float(os.getenv('DB_REPLICA_POOL_TIMEOUT', 1))
+    # 不可用从库的重试间隔、复制延迟上限（秒，0 为不检查，检查需要 REPLICATION CLIENT 权限）
+    DB_REPLICA_CHECK_INTERVAL = float(os.getenv('DB_REPLICA_CHECK_INTERVAL', 5))
+    DB_REPLICA_MAX_LAG = float(os.getenv('DB_REPLICA_MAX_LAG', 0))
+    # 读己之写：用户写入后这么多秒内的读请求走主库（应大于从库的正常复制延迟）
+    READ_YOUR_WRITES_SECONDS = float(os.getenv('READ_YOUR_WRITES_SECONDS', 5))
+
+    # 查询统计：慢查询阈值（毫秒）、是否补抓 EXPLAIN、保留的慢查询条数
+    QUERY_STATS_ENABLED = os.getenv('QUERY_STATS_ENABLED', 'True') == 'True'
+    SLOW_QUERY_MS = float(os.getenv('SLOW_QUERY_MS', 200))
+    SLOW_QUERY_EXPLAIN = os.getenv('SLOW_QUERY_EXPLAIN', 'False') == 'True'
+    SLOW_QUERY_LOG_SIZE = int(os.getenv('SLOW_QUERY_LOG_SIZE', 100))
+
+    # 读方法结果缓存：条数上限、TTL（秒）；共享文件让同机所有 worker 共用失效状态，留空则仅进程内
+    RESULT_CACHE_ENABLED = os.getenv('RESULT_CACHE_ENABLED', 'True') == 'True'
+    RESULT_CACHE_MAX_ENTRIES = int(os.getenv('RESULT_CACHE_MAX_ENTRIES', 2048))
+    RESULT_CACHE_TTL = float(os.getenv('RESULT_CACHE_TTL', 30))
+    RESULT_CACHE_SHARED_PATH = os.getenv(
+        'RESULT_CACHE_SHARED_PATH', os.path.join(tempfile.gettempdir(), 'english_learning_cache.db'))
 
     # Azure TTS
     AZURE_TTS_KEY = os.getenv('AZURE_SUBSCRIPTION_KEY')
     AZURE_TTS_REGION = os.getenv('AZURE_REGION', 'eastus')
+    # 覆盖合成接口地址（如本地的 scripts/fake_tts_server.py），留空则按区域访问 Azure
+    TTS_ENDPOINT = os.getenv('TTS_ENDPOINT', '')
+    # keep-alive 连接数，与每个进程的并发请求数一致
+    TTS_POOL_SIZE = int(os.getenv('TTS_POOL_SIZE', DB_POOL_MAX_SIZE))
+    TTS_CONNECT_TIMEOUT = float(os.getenv('TTS_CONNECT_TIMEOUT', 3))
+    TTS_READ_TIMEOUT = float(os.getenv('TTS_READ_TIMEOUT', 10))
+    # 429/5xx 与连接错误的重试次数、抖动退避的基数与上限（秒）
+    TTS_MAX_RETRIES = int(os.getenv('TTS_MAX_RETRIES', 2))
+    TTS_BACKOFF_BASE = float(os.getenv('TTS_BACKOFF_BASE', 0.2))
+    TTS_BACKOFF_MAX = float(os.getenv('TTS_BACKOFF_MAX', 2))
+    # 连续失败多少次后熔断、熔断持续秒数
+    TTS_BREAKER_THRESHOLD = int(os.getenv('TTS_BREAKER_THRESHOLD', 5))
+    TTS_BREAKER_COOLDOWN = float(os.getenv('TTS_BREAKER_COOLDOWN', 30))
+
+    # 音频缓存：目录、容量上限（MB，0 为不限）、淘汰策略（lru/lfu）、超限后淘汰到上限的比例
+    AUDIO_CACHE_DIR = os.getenv(
+        'AUDIO_CACHE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'audio_cache'))
+    AUDIO_CACHE_MAX_MB = int(os.getenv('AUDIO_CACHE_MAX_MB', 2048))
+    AUDIO_CACHE_POLICY = os.getenv('AUDIO_CACHE_POLICY', 'lru')
+    AUDIO_CACHE_EVICT_TO = float(os.getenv('AUDIO_CACHE_EVICT_TO', 0.9))
+    # 进程内热点音频层：容量（MB，0 为关闭）、单个文件上限（KB）、磁盘层命中几次后载入
+    AUDIO_MEMORY_CACHE_MB = int(os.getenv('AUDIO_MEMORY_CACHE_MB', 32))
+    AUDIO_MEMORY_MAX_ITEM_KB = int(os.getenv('AUDIO_MEMORY_MAX_ITEM_KB', 128))
+    AUDIO_MEMORY_ADMIT_HITS = int(os.getenv('AUDIO_MEMORY_ADMIT_HITS', 2))
+    # 磁盘层命中交给 nginx 发送：X-Accel-Redirect 的 internal location 前缀（如 /_audio/），留空则由 gunicorn sendfile
+    AUDIO_ACCEL_PREFIX = os.getenv('AUDIO_ACCEL_PREFIX', '')
+    # 按缓存键寻址的音频 URL 内容不变，浏览器、nginx、CDN 的缓存时间（秒）
+    AUDIO_URL_MAX_AGE = int(os.getenv('AUDIO_URL_MAX_AGE', 365 * 24 * 3600))
 
 
+    # 学习记录写缓冲：开启后答题事件合并后批量写库
+    RECORD_WRITE_BEHIND = os.getenv('RECORD_WRITE_BEHIND', 'False') == 'True'
+    RECORD_BUFFER_MAX_EVENTS = int(os.getenv('RECORD_BUFFER_MAX_EVENTS', 500))
+    RECORD_BUFFER_FLUSH_INTERVAL = float(os.getenv('RECORD_BUFFER_FLUSH_INTERVAL', 2))
+    # 追加日志目录，留空则进程崩溃时未写库的事件会丢失
+    RECORD_BUFFER_LOG_DIR = os.getenv('RECORD_BUFFER_LOG_DIR', '')
+
+    # 批量答题上传：单次最多事件数、幂等键保留天数
+    RECORD_BATCH_MAX_EVENTS = int(os.getenv('RECORD_BATCH_MAX_EVENTS', 500))
+    IDEMPOTENCY_KEY_TTL_DAYS = int(os.getenv('IDEMPOTENCY_KEY_TTL_DAYS', 7))
+
+    # 学习记录压缩：逐日记录保留天数、每批处理的行数
+    RECORD_RETENTION_DAYS = int(os.getenv('RECORD_RETENTION_DAYS', 90))
+    COMPACTION_BATCH_SIZE = int(os.getenv('COMPACTION_BATCH_SIZE', 5000))
+
+    # 批量导入每个事务的行数
+    IMPORT_CHUNK_SIZE = int(os.getenv('IMPORT_CHUNK_SIZE', 500))
+
     # CORS 配置
     CORS_ORIGINS = os.getenv('CORS_ORIGINS', '*').split(',')
 
+    # 管理员用户名（逗号分隔），可访问 /api/admin
+    ADMIN_USERS = [u for u in os.getenv('ADMIN_USERS', '').split(',') if u]
+
     # 其他配置
     SECRET_KEY = os.getenv('SECRET_KEY', 'dev-secret-key')
     DEBUG = os.getenv('DEBUG', 'False') == 'True'
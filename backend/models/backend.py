@@ -0,0 +1,25 @@
+from config import Config
+
+# 可选的存储后端
+BACKENDS = ('mysql', 'sqlite')
+
+
+def get_backend():
+    """按 Config.DB_BACKEND 返回进程内唯一的存储后端
+
+    两种后端都提供与 ConnectionPool 相同的接口，DatabaseManager 不区分：
+    - dialect: 'mysql' / 'sqlite'
+    - prefill() / create_database() / get_connection(timeout) / stats()
+    - 连接: cursor(dictionary=, buffered=) / execute_prepared() / start_transaction()
+      / commit() / rollback() / close()（归还）/ discard()（断开）
+    - 出错抛出 mysql.connector.Error 的子类
+
+    SQL 统一按 MySQL 方言书写，SQLite 后端在执行前转换（见 models/sqlite_backend.py）。
+    """
+    if Config.DB_BACKEND == 'sqlite':
+        from models.sqlite_backend import get_sqlite_pool
+        return get_sqlite_pool()
+    if Config.DB_BACKEND != 'mysql':
+        raise ValueError(f"未知的 DB_BACKEND: {Config.DB_BACKEND}，可选: {', '.join(BACKENDS)}")
+    from models.pool import get_pool
+    return get_pool()
@@ -0,0 +1,245 @@
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from datetime import date
+from functools import wraps
+
+from config import Config
+
+# 所有缓存项都带的全局标签，重建计数表等批量操作时整体失效
+GLOBAL_TAG = 'all'
+# 共享存储每写入这么多次清理一次过期项
+SHARED_PURGE_EVERY = 1000
+
+
+class ResultCache:
+    """读方法的结果缓存（read-through）
+
+    - 进程内 LRU，每项有 TTL，并记录写入时各标签的版本号
+    - 写操作按标签（如 records:3）递增版本号，旧版本的缓存项随之失效
+    - 设置 shared_path 时标签版本和缓存项同时存入共享的 SQLite 文件，
+      同机所有 gunicorn worker 看到同一份失效状态，并可复用彼此的结果
+    """
+
+    def __init__(self, max_entries=2048, ttl=30.0, shared_path=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.shared_path = shared_path or None
+        self._init_state()
+
+    def _init_state(self):
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (expires_at, versions, value)
+        self._versions = {}
+        self._local = threading.local()
+        self._stats = {
+            'hits': 0,
+            'shared_hits': 0,
+            'misses': 0,
+            'stale': 0,
+            'evictions': 0,
+            'invalidations': 0,
+            'shared_errors': 0,
+        }
+
+    # ---- 共享存储 ----
+
+    def _check_pid(self):
+        # fork 出的 worker 不沿用父进程的缓存项、锁和 SQLite 连接
+        if self._pid != os.getpid():
+            self._init_state()
+
+    def _shared(self):
+        """本线程的 SQLite 连接（sqlite3 连接不能跨线程、跨 fork 使用）"""
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            db = sqlite3.connect(self.shared_path, timeout=0.2, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=OFF")
+            db.execute("""
+                CREATE TABLE IF NOT EXISTS tag_versions (
+                    tag TEXT PRIMARY KEY,
+                    version INTEGER NOT NULL
+                )
+            """)
+            db.execute("""
+                CREATE TABLE IF NOT EXISTS entries (
+                    key TEXT PRIMARY KEY,
+                    expires_at REAL NOT NULL,
+                    versions BLOB NOT NULL,
+                    value BLOB NOT NULL
+                )
+            """)
+            self._local.db = db
+        return db
+
+    def _shared_error(self, e):
+        with self._lock:
+            self._stats['shared_errors'] += 1
+        print(f"共享结果缓存出错: {e}")
+
+    def _tag_versions(self, tags):
+        if not self.shared_path:
+            with self._lock:
+                return tuple(self._versions.get(tag, 0) for tag in tags)
+        rows = dict(self._shared().execute(
+            f"SELECT tag, version FROM tag_versions WHERE tag IN ({', '.join(['?'] * len(tags))})",
+            tags
+        ).fetchall())
+        return tuple(rows.get(tag, 0) for tag in tags)
+
+    # ---- 读写 ----
+
+    def get_or_load(self, key, tags, loader):
+        """命中且未过期、标签版本未变时返回缓存，否则调用 loader 并写入"""
+        self._check_pid()
+        tags = [GLOBAL_TAG] + list(tags)
+        now = time.time()
+        try:
+            versions = self._tag_versions(tags)
+        except sqlite3.Error as e:
+            self._shared_error(e)
+            return loader()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > now and entry[1] == versions:
+                    self._entries.move_to_end(key)
+                    self._stats['hits'] += 1
+                    return entry[2]
+                del self._entries[key]
+                self._stats['stale'] += 1
+
+        if self.shared_path:
+            try:
+                row = self._shared().execute(
+                    "SELECT expires_at, versions, value FROM entries WHERE key = ?", (key,)
+                ).fetchone()
+                if row and row[0] > now and pickle.loads(row[1]) == versions:
+                    value = pickle.loads(row[2])
+                    self._store_local(key, row[0], versions, value)
+                    with self._lock:
+                        self._stats['shared_hits'] += 1
+                    return value
+            except sqlite3.Error as e:
+                self._shared_error(e)
+            except (pickle.UnpicklingError, AttributeError, ImportError, TypeError, EOFError) as e:
+                # 其他版本的代码写入、无法还原的项，当作未命中
+                self._shared_error(e)
+
+        with self._lock:
+            self._stats['misses'] += 1
+            purge = self._stats['misses'] % SHARED_PURGE_EVERY == 0
+        # 版本号在查库之前读取：查库期间发生的写入会使这次结果立即过期
+        value = loader()
+        if not value:
+            # 空结果可能来自查询出错，不缓存
+            return value
+
+        expires_at = now + self.ttl
+        self._store_local(key, expires_at, versions, value)
+        if self.shared_path:
+            try:
+                self._shared().execute(
+                    "INSERT OR REPLACE INTO entries (key, expires_at, versions, value) VALUES (?, ?, ?, ?)",
+                    (key, expires_at, pickle.dumps(versions), pickle.dumps(value))
+                )
+            except sqlite3.Error as e:
+                self._shared_error(e)
+            except (pickle.PicklingError, AttributeError, TypeError) as e:
+                # 无法序列化的结果只留在进程内，不能让读请求失败
+                self._shared_error(e)
+            if purge:
+                self.purge_expired()
+        return value
+
+    def _store_local(self, key, expires_at, versions, value):
+        with self._lock:
+            self._entries[key] = (expires_at, versions, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats['evictions'] += 1
+
+    def invalidate(self, *tags):
+        """递增标签版本，使带这些标签的缓存项失效"""
+        self._check_pid()
+        with self._lock:
+            self._stats['invalidations'] += 1
+            for tag in tags:
+                self._versions[tag] = self._versions.get(tag, 0) + 1
+        if self.shared_path:
+            try:
+                self._shared().executemany("""
+                    INSERT INTO tag_versions (tag, version) VALUES (?, 1)
+                    ON CONFLICT(tag) DO UPDATE SET version = version + 1
+                """, [(tag,) for tag in tags])
+            except sqlite3.Error as e:
+                # 其他 worker 无法感知这次写入，只能等 TTL 过期
+                self._shared_error(e)
+
+    def clear(self):
+        """全部失效"""
+        with self._lock:
+            self._entries.clear()
+        self.invalidate(GLOBAL_TAG)
+
+    def purge_expired(self):
+        """清理共享存储中过期的缓存项"""
+        if not self.shared_path:
+            return 0
+        try:
+            return self._shared().execute(
+                "DELETE FROM entries WHERE expires_at < ?", (time.time(),)).rowcount
+        except sqlite3.Error as e:
+            self._shared_error(e)
+            return 0
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['size'] = len(self._entries)
+        lookups = stats['hits'] + stats['shared_hits'] + stats['misses']
+        stats['hit_rate'] = round((stats['hits'] + stats['shared_hits']) / lookups, 4) if lookups else 0
+        stats.update({
+            'pid': self._pid,
+            'max_entries': self.max_entries,
+            'ttl': self.ttl,
+            'shared_path': self.shared_path,
+        })
+        return stats
+
+
+def cached(*tables):
+    """DatabaseManager 读方法的缓存装饰器
+
+    被装饰方法的第一个参数必须是 user_id；缓存项带 表名:user_id 标签，
+    由对应写方法调用 _invalidate 失效。键里包含当天日期，跨天自动换键。
+    """
+    def decorator(method):
+        @wraps(method)
+        def wrapper(self, user_id, *args, **kwargs):
+            cache = self.result_cache
+            if cache is None:
+                return method(self, user_id, *args, **kwargs)
+            key = repr((method.__name__, user_id, args, sorted(kwargs.items()), date.today()))
+            tags = [f"{table}:{user_id}" for table in tables]
+            return cache.get_or_load(key, tags, lambda: method(self, user_id, *args, **kwargs))
+        return wrapper
+    return decorator
+
+
+def create_result_cache():
+    """按配置创建结果缓存，未开启时返回 None"""
+    if not Config.RESULT_CACHE_ENABLED:
+        return None
+    return ResultCache(
+        max_entries=Config.RESULT_CACHE_MAX_ENTRIES,
+        ttl=Config.RESULT_CACHE_TTL,
+        shared_path=Config.RESULT_CACHE_SHARED_PATH,
+    )
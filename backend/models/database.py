@@ -1,29 +1,258 @@
-import mysql.connector
-from mysql.connector import Error, pooling
+from mysql.connector import Error
 from datetime import datetime, date, timedelta
 from config import Config
+from models.backend import get_backend
+from models.pool import PoolExhaustedError
+from models.instrumentation import InstrumentedConnection, get_query_stats
+from models.statements import fetch_dict
+from models.cache import cached, create_result_cache
+from models.replicas import get_replica_router
+from utils.rows import make_rows
+from models.write_buffer import LearningWriteBuffer
+import threading
+import random
+from collections import Counter
 import os
+import sys
+import time
+
+# 建表后补充的复合索引 (表, 索引名, 列)
+SCHEMA_INDEXES = [
+    # 学习列表键集分页
+    ('learning_items', 'idx_user_created_id', 'user_id, created_at, id'),
+    ('learning_items', 'idx_user_type_created_id', 'user_id, type, created_at, id'),
+    # 测试抽样按用户探测 id
+    ('learning_items', 'idx_user_id', 'user_id, id'),
+    # 按用户统计学习记录
+    ('learning_records', 'idx_user_date', 'user_id, learned_date'),
+    # 复习列表键集分页
+    ('review_items', 'idx_user_reviewed_added_id', 'user_id, reviewed, added_date, id'),
+]
+
+# 被上面的按用户索引取代
+OBSOLETE_INDEXES = [
+    ('learning_items', 'idx_created_id'),
+    ('learning_items', 'idx_type_created_id'),
+    ('review_items', 'idx_reviewed_added_id'),
+]
+
+# 按用户回填 user_id 时每批的行数
+BACKFILL_BATCH_SIZE = 10000
+
+# 测试抽样：用户内容数不超过该值时直接全量抽样
+SAMPLE_SCAN_THRESHOLD = 5000
+# 测试抽样：每轮探测点数为缺口的倍数，最多探测轮数
+SAMPLE_OVERSAMPLE = 2
+SAMPLE_MAX_ROUNDS = 4
+
+# 推进连续学习天数：昨天学过则 +1，否则从 1 重新开始
+# （赋值不依赖 MySQL 按书写顺序求值：SQLite 中各列都按旧值计算，
+#  因此 longest_streak 直接比较推进后的值，且写在 current_streak 之前）
+_STREAK_NEXT = """IF(last_active_date = CURDATE(), current_streak,
+                   IF(last_active_date = DATE_SUB(CURDATE(), INTERVAL 1 DAY), current_streak + 1, 1))"""
+STREAK_ADVANCE_QUERY = f"""
+    INSERT INTO learning_streaks (user_id, current_streak, longest_streak, last_active_date)
+    VALUES (%s, 1, 1, CURDATE())
+    ON DUPLICATE KEY UPDATE
+    longest_streak = GREATEST(longest_streak, {_STREAK_NEXT}),
+    current_streak = {_STREAK_NEXT},
+    last_active_date = CURDATE()
+"""
+
+# 同上，日期由参数给出；早于最后学习日的日期不改变状态
+_STREAK_NEXT_ON_DATE = """IF(last_active_date >= VALUES(last_active_date), current_streak,
+                           IF(last_active_date = DATE_SUB(VALUES(last_active_date), INTERVAL 1 DAY),
+                              current_streak + 1, 1))"""
+STREAK_ADVANCE_ON_DATE_QUERY = f"""
+    INSERT INTO learning_streaks (user_id, current_streak, longest_streak, last_active_date)
+    VALUES (%s, 1, 1, %s)
+    ON DUPLICATE KEY UPDATE
+    longest_streak = GREATEST(longest_streak, {_STREAK_NEXT_ON_DATE}),
+    current_streak = {_STREAK_NEXT_ON_DATE},
+    last_active_date = GREATEST(last_active_date, VALUES(last_active_date))
+"""
+
+# 学习历史的汇总粒度 -> 周期起始日期表达式
+HISTORY_PERIODS = {
+    'day': "learned_date",
+    'week': "DATE_SUB(learned_date, INTERVAL WEEKDAY(learned_date) DAY)",
+    'month': "DATE_SUB(learned_date, INTERVAL DAYOFMONTH(learned_date) - 1 DAY)",
+}
+
+# 列表接口可选择返回的学习内容列（fields= 参数）
+ITEM_FIELDS = ('id', 'type', 'english', 'chinese', 'pronunciation',
+               'example_en', 'example_zh', 'audio_path', 'created_at')
+
+
+def _item_columns(fields):
+    """fields 转为 li.列 的投影，未指定时为全部列"""
+    return ', '.join(f"li.{field}" for field in (fields or ITEM_FIELDS))
+
+
+# 导出：每次从无缓冲游标取的行数、导出列
+EXPORT_BATCH_SIZE = 1000
+# 慢客户端读取导出流时，服务端写超时（秒）
+EXPORT_NET_WRITE_TIMEOUT = 600
+# record_type 为 daily（逐日记录，first_learned 同 learned_date，days_count 为 1）
+# 或 summary（已压缩的汇总，覆盖 first_learned ~ learned_date 的 days_count 个学习日）
+LEARNING_EXPORT_COLUMNS = ('item_id', 'type', 'english', 'chinese', 'learned_date',
+                           'review_count', 'correct_count', 'wrong_count', 'last_review',
+                           'record_type', 'first_learned', 'days_count')
+
+
+# 首页看板：计数、累计/今日汇总、待复习数、连续天数合并为一条语句
+DASHBOARD_QUERY = """
+    SELECT
+        ic.word_count,
+        ic.phrase_count,
+        ic.sentence_count,
+        r.total_reviews,
+        r.total_correct,
+        r.total_wrong,
+        r.today_items,
+        r.today_reviews,
+        r.today_correct,
+        r.today_wrong,
+        (SELECT COUNT(*) FROM review_items
+         WHERE user_id = %s AND reviewed = FALSE) AS review_pending,
+        ls.current_streak,
+        ls.longest_streak,
+        ls.last_active_date
+    FROM (
+        SELECT
+            COALESCE(SUM(total_reviews), 0) AS total_reviews,
+            COALESCE(SUM(correct_count), 0) AS total_correct,
+            COALESCE(SUM(wrong_count), 0) AS total_wrong,
+            COALESCE(SUM(IF(learned_date = CURDATE(), items_count, 0)), 0) AS today_items,
+            COALESCE(SUM(IF(learned_date = CURDATE(), total_reviews, 0)), 0) AS today_reviews,
+            COALESCE(SUM(IF(learned_date = CURDATE(), correct_count, 0)), 0) AS today_correct,
+            COALESCE(SUM(IF(learned_date = CURDATE(), wrong_count, 0)), 0) AS today_wrong
+        FROM learning_daily_rollup
+        WHERE user_id = %s
+    ) r
+    LEFT JOIN item_counters ic ON ic.user_id = %s
+    LEFT JOIN learning_streaks ls ON ls.user_id = %s
+"""
+
+# 从原始学习记录生成每日汇总
+ROLLUP_INSERT_QUERY = """
+    INSERT INTO learning_daily_rollup
+    (user_id, learned_date, items_count, total_reviews, correct_count, wrong_count)
+    SELECT
+        lr.user_id,
+        lr.learned_date,
+        COUNT(DISTINCT lr.item_id),
+        SUM(lr.review_count),
+        SUM(lr.correct_count),
+        SUM(lr.wrong_count)
+    FROM learning_records lr
+    WHERE lr.user_id IS NOT NULL AND {where}
+    GROUP BY lr.user_id, lr.learned_date
+"""
+
+
+def _accuracy(correct, wrong):
+    """正确率（百分比，两位小数）"""
+    if correct + wrong == 0:
+        return 0
+    return round((correct / (correct + wrong)) * 100, 2)
+
+
+def _with_pending_totals(detail, pending):
+    """详细统计加上写缓冲中的学习量，返回新字典（原字典可能在结果缓存中，不能修改）"""
+    _, reviews, correct, wrong = pending
+    total_correct = detail['total_correct'] + correct
+    total_wrong = detail['total_wrong'] + wrong
+    return dict(detail, total_reviews=detail['total_reviews'] + reviews, total_correct=total_correct,
+                total_wrong=total_wrong, accuracy=_accuracy(total_correct, total_wrong))
+
+
+def _with_pending_today(today, pending):
+    """今日进度加上写缓冲中的学习量，返回新字典"""
+    items, reviews, correct, wrong = pending
+    correct += today['correct_count']
+    wrong += today['wrong_count']
+    return dict(today, learned_count=today['learned_count'] + items, review_count=today['review_count'] + reviews,
+                correct_count=correct, wrong_count=wrong, accuracy=_accuracy(correct, wrong))
+
+
+class RowStream:
+    """无缓冲游标的行迭代器，读完或 close() 时归还连接"""
+
+    def __init__(self, connection, cursor, batch_size=EXPORT_BATCH_SIZE):
+        self._connection = connection
+        self._cursor = cursor
+        self._batch_size = batch_size
+        self._batch = iter(())
+        self._finished = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        while True:
+            row = next(self._batch, None)
+            if row is not None:
+                return row
+            if self._connection is None:
+                raise StopIteration
+            try:
+                batch = self._cursor.fetchmany(self._batch_size)
+            except Error as e:
+                print(f"导出读取出错: {e}")
+                batch = []
+            else:
+                self._finished = not batch
+            if not batch:
+                self.close()
+                raise StopIteration
+            self._batch = iter(batch)
+
+    def close(self):
+        if self._connection is None:
+            return
+        connection, self._connection = self._connection, None
+        if not self._finished:
+            # 客户端中途断开或读取出错：结果未读完的连接不能复用
+            connection.discard()
+            return
+        try:
+            self._cursor.close()
+            # 归还前恢复默认写超时
+            reset = connection.cursor()
+            reset.execute("SET SESSION net_write_timeout = DEFAULT")
+            reset.close()
+            connection.close()
+        except Error:
+            connection.discard()
 
 
 class DatabaseManager:
-    def __init__(self):
-        """初始化数据库连接"""
-        self.db_config = {
-            'host': Config.DB_HOST,
-            'user': Config.DB_USER,
-            'password': Config.DB_PASSWORD,
-            'database': Config.DB_DATABASE,
-            'charset': 'utf8mb4',
-            'collation': 'utf8mb4_unicode_ci'
-        }
+    def __init__(self, pool=None):
+        """初始化数据库连接
+
+        pool 为存储后端（见 models/backend.py），默认按 Config.DB_BACKEND 选择
+        """
+        self.pool = pool or get_backend()
+        self.db_config = self.pool.db_config
+        # 只读从库路由（可选，仅 MySQL）
+        self.replicas = get_replica_router() if pool is None else None
+
+        # 读方法结果缓存（可选）
+        self.result_cache = create_result_cache()
+
+        # 学习记录写缓冲（可选）
+        self.write_buffer = None
+        if Config.RECORD_WRITE_BEHIND:
+            self.write_buffer = LearningWriteBuffer(
+                self.record_learning_batch,
+                max_events=Config.RECORD_BUFFER_MAX_EVENTS,
+                flush_interval=Config.RECORD_BUFFER_FLUSH_INTERVAL,
+                log_dir=Config.RECORD_BUFFER_LOG_DIR or None,
+            )
 
-        # 创建连接池
         try:
-            self.pool = pooling.MySQLConnectionPool(
-                pool_name="english_pool",
-                pool_size=10,
-                **self.db_config
-            )
+            self.pool.prefill()
             print("数据库连接池创建成功")
             self.create_tables()
         except Error as e:
@@ -34,34 +263,71 @@ class DatabaseManager:
     def _create_database(self):
         """创建数据库"""
         try:
-            temp_config = self.db_config.copy()
-            temp_config.pop('database', None)
+            self.pool.create_database()
 
-            connection = mysql.connector.connect(**temp_config)
-            cursor = connection.cursor()
-            cursor.execute(
-                f"CREATE DATABASE IF NOT EXISTS {self.db_config['database']} CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci")
-            cursor.close()
-            connection.close()
-
-            # 重新创建连接池
-            self.pool = pooling.MySQLConnectionPool(
-                pool_name="english_pool",
-                pool_size=10,
-                **self.db_config
-            )
+            # 重新预热连接池
+            self.pool.prefill()
             print("数据库创建成功")
             self.create_tables()
-        except Error as e:
+        except (Error, OSError) as e:
             print(f"创建数据库失败: {e}")
 
-    def get_connection(self):
-        """从连接池获取连接"""
+    def get_connection(self, label=None):
+        """从连接池获取连接，池满时排队等待，超时抛出 PoolExhaustedError
+
+        开启查询统计时返回带计时的连接，语句按调用方的方法名（或 label）归类。
+        """
         try:
-            return self.pool.get_connection()
+            connection = self.pool.get_connection()
+        except PoolExhaustedError:
+            raise
         except Error as e:
             print(f"获取连接失败: {e}")
             return None
+        return self._instrument(connection, label or sys._getframe(1).f_code.co_name)
+
+    def get_read_connection(self, user_id):
+        """只读查询的连接：有可用从库且用户不在读己之写窗口内时取从库连接，否则取主库连接"""
+        label = sys._getframe(1).f_code.co_name
+        connection = self.replicas.get_connection(user_id) if self.replicas else None
+        if connection is None:
+            return self.get_connection(label)
+        return self._instrument(connection, f"{label}@replica")
+
+    def _instrument(self, connection, label):
+        if not Config.QUERY_STATS_ENABLED:
+            return connection
+        return InstrumentedConnection(connection, label, get_query_stats())
+
+    def pool_stats(self):
+        """连接池指标（配置从库时包含从库路由）"""
+        stats = self.pool.stats()
+        if self.replicas:
+            stats['replicas'] = self.replicas.stats()
+        return stats
+
+    def _invalidate(self, user_id, *tables):
+        """写入提交后使该用户相关表的缓存失效，并让该用户随后的读请求走主库（读己之写）"""
+        if self.replicas:
+            self.replicas.note_write(user_id)
+        if self.result_cache:
+            self.result_cache.invalidate(*(f"{table}:{user_id}" for table in tables))
+
+    def _invalidate_all(self):
+        if self.result_cache:
+            self.result_cache.clear()
+
+    def cache_stats(self):
+        """结果缓存命中率等指标"""
+        return self.result_cache.stats() if self.result_cache else {'enabled': False}
+
+    def query_stats(self):
+        """查询延迟与慢查询指标"""
+        return get_query_stats().snapshot()
+
+    def reset_query_stats(self):
+        """清空查询统计"""
+        get_query_stats().reset()
 
     def create_tables(self):
         """创建数据表"""
@@ -71,83 +337,311 @@ class DatabaseManager:
 
         try:
             cursor = connection.cursor()
+            # SQLite 的表结构随连接建立（见 models/sqlite_backend.py）
+            if self.pool.dialect == 'mysql':
+                self._create_mysql_tables(connection, cursor)
 
-            # 用户表
+            # 计数表为空而内容表有数据（升级后首次启动），从基础表重建
             cursor.execute("""
-                CREATE TABLE IF NOT EXISTS users (
-                    id INT AUTO_INCREMENT PRIMARY KEY,
-                    username VARCHAR(50) NOT NULL UNIQUE,
-                    email VARCHAR(100) NOT NULL UNIQUE,
-                    password VARCHAR(255) NOT NULL,
-                    avatar VARCHAR(500),
-                    token VARCHAR(100),
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    last_login TIMESTAMP NULL,
-                    INDEX idx_username (username),
-                    INDEX idx_email (email)
-                ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+                SELECT
+                    EXISTS(SELECT 1 FROM learning_items) AND NOT EXISTS(SELECT 1 FROM item_counters),
+                    EXISTS(SELECT 1 FROM learning_records) AND NOT EXISTS(SELECT 1 FROM learning_daily_rollup),
+                    EXISTS(SELECT 1 FROM learning_records) AND NOT EXISTS(SELECT 1 FROM learning_streaks)
             """)
+            missing_counters, missing_rollup, missing_streaks = cursor.fetchone()
+            cursor.close()
+            print("数据表创建成功")
+            if missing_counters or missing_rollup:
+                self.rebuild_counters()
+            if missing_streaks:
+                self.rebuild_streaks()
+        except Error as e:
+            print(f"创建表失败: {e}")
+        finally:
+            connection.close()
 
-            # 学习内容表（添加 user_id）
+    def _create_mysql_tables(self, connection, cursor):
+        """创建 MySQL 数据表并升级已有的表结构"""
+        # 用户表
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS users (
+                id INT AUTO_INCREMENT PRIMARY KEY,
+                username VARCHAR(50) NOT NULL UNIQUE,
+                email VARCHAR(100) NOT NULL UNIQUE,
+                password VARCHAR(255) NOT NULL,
+                avatar VARCHAR(500),
+                token VARCHAR(100),
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                last_login TIMESTAMP NULL,
+                INDEX idx_username (username),
+                INDEX idx_email (email)
+            ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+        """)
+
+        # 学习内容表（添加 user_id）
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS learning_items (
+                id INT AUTO_INCREMENT PRIMARY KEY,
+                user_id INT,
+                type ENUM('word', 'phrase', 'sentence') NOT NULL,
+                english TEXT NOT NULL,
+                chinese TEXT NOT NULL,
+                pronunciation VARCHAR(200),
+                example_en TEXT,
+                example_zh TEXT,
+                audio_path VARCHAR(500),
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
+                INDEX idx_user_type (user_id, type),
+                INDEX idx_created (created_at)
+            ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+        """)
+
+
+        # 学习记录表
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS learning_records (
+                id INT AUTO_INCREMENT PRIMARY KEY,
+                item_id INT NOT NULL,
+                user_id INT,
+                learned_date DATE NOT NULL,
+                review_count INT DEFAULT 0,
+                correct_count INT DEFAULT 0,
+                wrong_count INT DEFAULT 0,
+                last_review TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+                FOREIGN KEY (item_id) REFERENCES learning_items(id) ON DELETE CASCADE,
+                UNIQUE KEY unique_item_date (item_id, learned_date),
+                INDEX idx_item_date (item_id, learned_date),
+                INDEX idx_learned_date (learned_date)
+            ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+        """)
+
+        # 复习内容表
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS review_items (
+                id INT AUTO_INCREMENT PRIMARY KEY,
+                item_id INT NOT NULL,
+                user_id INT,
+                added_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                reviewed BOOLEAN DEFAULT FALSE,
+                reviewed_date TIMESTAMP NULL,
+                pending TINYINT NULL DEFAULT 1,
+                FOREIGN KEY (item_id) REFERENCES learning_items(id) ON DELETE CASCADE,
+                UNIQUE KEY uniq_pending_item (item_id, pending),
+                INDEX idx_item_reviewed (item_id, reviewed),
+                INDEX idx_added_date (added_date)
+            ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+        """)
+
+        # 内容计数表（随 add_item / 批量导入在同一事务中更新）
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS item_counters (
+                user_id INT NOT NULL PRIMARY KEY,
+                word_count INT NOT NULL DEFAULT 0,
+                phrase_count INT NOT NULL DEFAULT 0,
+                sentence_count INT NOT NULL DEFAULT 0,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+            ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+        """)
+
+        # 每日学习汇总（随 record_learning 在同一事务中更新）
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS learning_daily_rollup (
+                user_id INT NOT NULL,
+                learned_date DATE NOT NULL,
+                items_count INT NOT NULL DEFAULT 0,
+                total_reviews INT NOT NULL DEFAULT 0,
+                correct_count INT NOT NULL DEFAULT 0,
+                wrong_count INT NOT NULL DEFAULT 0,
+                PRIMARY KEY (user_id, learned_date)
+            ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+        """)
+
+        # 连续学习状态（随 record_learning 在每天第一次学习时推进）
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS learning_streaks (
+                user_id INT NOT NULL PRIMARY KEY,
+                current_streak INT NOT NULL DEFAULT 0,
+                longest_streak INT NOT NULL DEFAULT 0,
+                last_active_date DATE NULL
+            ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+        """)
+
+        # 答题事件幂等键（按用户区分，定期按 created_at 清理）
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS learning_event_keys (
+                user_id INT NOT NULL,
+                idempotency_key VARCHAR(64) NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (user_id, idempotency_key),
+                INDEX idx_created (created_at)
+            ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+        """)
+
+        # 学习记录压缩：超过保留期的逐日记录按内容合并为终身汇总
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS learning_item_summary (
+                item_id INT NOT NULL PRIMARY KEY,
+                user_id INT,
+                days_count INT NOT NULL DEFAULT 0,
+                review_count INT NOT NULL DEFAULT 0,
+                correct_count INT NOT NULL DEFAULT 0,
+                wrong_count INT NOT NULL DEFAULT 0,
+                first_learned DATE NOT NULL,
+                last_learned DATE NOT NULL,
+                last_review TIMESTAMP NULL,
+                FOREIGN KEY (item_id) REFERENCES learning_items(id) ON DELETE CASCADE,
+                INDEX idx_user (user_id)
+            ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+        """)
+
+        # 压缩水位：早于 compacted_before 的逐日记录可能已被合并删除
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS learning_compaction (
+                id TINYINT NOT NULL PRIMARY KEY,
+                compacted_before DATE NOT NULL,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+            ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+        """)
+
+        connection.commit()
+        self._migrate_schema(cursor)
+
+    def _column_exists(self, cursor, table, column):
+        cursor.execute("""
+            SELECT COUNT(*) FROM information_schema.columns
+            WHERE table_schema = DATABASE() AND table_name = %s AND column_name = %s
+        """, (table, column))
+        return cursor.fetchone()[0] > 0
+
+    def _index_exists(self, cursor, table, index):
+        cursor.execute("""
+            SELECT COUNT(*) FROM information_schema.statistics
+            WHERE table_schema = DATABASE() AND table_name = %s AND index_name = %s
+        """, (table, index))
+        return cursor.fetchone()[0] > 0
+
+    def _migrate_schema(self, cursor):
+        """升级已有的表结构"""
+        # 学习记录、复习记录冗余 user_id，按用户查询时只访问本人的行
+        added_user_id = False
+        for table in ('learning_records', 'review_items'):
+            if not self._column_exists(cursor, table, 'user_id'):
+                cursor.execute(f"ALTER TABLE {table} ADD COLUMN user_id INT AFTER item_id")
+                print(f"{table} 已添加 user_id 列")
+                added_user_id = True
+
+        for table, index, columns in SCHEMA_INDEXES:
+            if not self._index_exists(cursor, table, index):
+                cursor.execute(f"ALTER TABLE {table} ADD INDEX {index} ({columns})")
+                print(f"{table} 已添加索引 {index}")
+        for table, index in OBSOLETE_INDEXES:
+            if self._index_exists(cursor, table, index):
+                cursor.execute(f"ALTER TABLE {table} DROP INDEX {index}")
+
+        # 每个内容每天一条学习记录：upsert 依赖该唯一键判断“今天第一次学习”。
+        # 早期的 init.sql 建表时没有该键，重复行先合并到 id 最小的一行，再重建每日汇总
+        if not self._index_exists(cursor, 'learning_records', 'unique_item_date'):
             cursor.execute("""
-                CREATE TABLE IF NOT EXISTS learning_items (
-                    id INT AUTO_INCREMENT PRIMARY KEY,
-                    user_id INT,
-                    type ENUM('word', 'phrase', 'sentence') NOT NULL,
-                    english TEXT NOT NULL,
-                    chinese TEXT NOT NULL,
-                    pronunciation VARCHAR(200),
-                    example_en TEXT,
-                    example_zh TEXT,
-                    audio_path VARCHAR(500),
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
-                    INDEX idx_user_type (user_id, type),
-                    INDEX idx_created (created_at)
-                ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+                UPDATE learning_records lr
+                INNER JOIN (
+                    SELECT MIN(id) AS keep_id, SUM(review_count) AS reviews, SUM(correct_count) AS correct,
+                           SUM(wrong_count) AS wrong, MAX(last_review) AS last_review
+                    FROM learning_records
+                    GROUP BY item_id, learned_date
+                    HAVING COUNT(*) > 1
+                ) dup ON lr.id = dup.keep_id
+                SET lr.review_count = dup.reviews, lr.correct_count = dup.correct,
+                    lr.wrong_count = dup.wrong, lr.last_review = dup.last_review
             """)
-
-
-            # 学习记录表
             cursor.execute("""
-                CREATE TABLE IF NOT EXISTS learning_records (
-                    id INT AUTO_INCREMENT PRIMARY KEY,
-                    item_id INT NOT NULL,
-                    learned_date DATE NOT NULL,
-                    review_count INT DEFAULT 0,
-                    correct_count INT DEFAULT 0,
-                    wrong_count INT DEFAULT 0,
-                    last_review TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
-                    FOREIGN KEY (item_id) REFERENCES learning_items(id) ON DELETE CASCADE,
-                    UNIQUE KEY unique_item_date (item_id, learned_date),
-                    INDEX idx_item_date (item_id, learned_date),
-                    INDEX idx_learned_date (learned_date)
-                ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+                DELETE lr FROM learning_records lr
+                INNER JOIN learning_records keep
+                    ON keep.item_id = lr.item_id AND keep.learned_date = lr.learned_date AND keep.id < lr.id
             """)
-
-            # 复习内容表
+            merged = cursor.rowcount
+            cursor.execute("ALTER TABLE learning_records ADD UNIQUE KEY unique_item_date (item_id, learned_date)")
+            print(f"learning_records 已添加唯一键 unique_item_date（合并 {merged} 条重复记录）")
+            if merged:
+                self.rebuild_counters()
+
+        # 待复习唯一约束：同一内容只能有一条未复习记录。
+        # 未复习的行 pending = 1，复习后置 NULL，唯一键 (item_id, pending) 不约束 NULL。
+        # 不用由 reviewed 计算的生成列：item_id 带 ON DELETE CASCADE 外键，MySQL 8 不允许以它为基列的 STORED 生成列
+        if self._column_exists(cursor, 'review_items', 'pending_item_id'):
+            if self._index_exists(cursor, 'review_items', 'uniq_pending_item'):
+                cursor.execute("ALTER TABLE review_items DROP INDEX uniq_pending_item")
+            cursor.execute("ALTER TABLE review_items DROP COLUMN pending_item_id")
+        if not self._column_exists(cursor, 'review_items', 'pending'):
+            cursor.execute("""
+                DELETE ri FROM review_items ri
+                INNER JOIN review_items keep
+                    ON keep.item_id = ri.item_id AND keep.reviewed = FALSE AND keep.id < ri.id
+                WHERE ri.reviewed = FALSE
+            """)
+            cursor.execute("ALTER TABLE review_items ADD COLUMN pending TINYINT NULL DEFAULT 1")
+            cursor.execute("UPDATE review_items SET pending = NULL WHERE reviewed = TRUE")
+            cursor.execute("ALTER TABLE review_items ADD UNIQUE KEY uniq_pending_item (item_id, pending)")
+            print("review_items 已添加待复习唯一约束")
+
+        # 幂等键按用户区分：旧表的键无法归属到用户，清空后改为 (user_id, idempotency_key) 主键
+        # （键只在客户端重试窗口内有用）
+        if not self._column_exists(cursor, 'learning_event_keys', 'user_id'):
+            cursor.execute("DELETE FROM learning_event_keys")
             cursor.execute("""
-                CREATE TABLE IF NOT EXISTS review_items (
-                    id INT AUTO_INCREMENT PRIMARY KEY,
-                    item_id INT NOT NULL,
-                    added_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    reviewed BOOLEAN DEFAULT FALSE,
-                    reviewed_date TIMESTAMP NULL,
-                    FOREIGN KEY (item_id) REFERENCES learning_items(id) ON DELETE CASCADE,
-                    INDEX idx_item_reviewed (item_id, reviewed),
-                    INDEX idx_added_date (added_date)
-                ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+                ALTER TABLE learning_event_keys
+                ADD COLUMN user_id INT NOT NULL FIRST,
+                DROP PRIMARY KEY,
+                ADD PRIMARY KEY (user_id, idempotency_key)
             """)
+            print("learning_event_keys 已改为按用户的主键")
 
-            connection.commit()
+        if added_user_id:
+            # 只有一个用户时，无归属的内容归给他（单用户部署升级）
+            cursor.execute("SELECT id FROM users LIMIT 2")
+            users = cursor.fetchall()
+            self.backfill_user_scope(users[0][0] if len(users) == 1 else None)
+
+    def backfill_user_scope(self, assign_orphans_to=None):
+        """回填 learning_records / review_items 的 user_id（按 id 分批，避免长时间锁表）
+
+        assign_orphans_to 不为空时，先把 user_id 为空的学习内容归给该用户。
+        """
+        connection = self.get_connection()
+        if not connection:
+            return False
+
+        try:
+            cursor = connection.cursor()
+            if assign_orphans_to:
+                cursor.execute(
+                    "UPDATE learning_items SET user_id = %s WHERE user_id IS NULL", (assign_orphans_to,))
+                connection.commit()
+                print(f"已将 {cursor.rowcount} 条无归属内容分配给用户 {assign_orphans_to}")
+
+            for table in ('learning_records', 'review_items'):
+                cursor.execute(f"SELECT COALESCE(MAX(id), 0) FROM {table}")
+                max_id = cursor.fetchone()[0]
+                for start in range(0, max_id, BACKFILL_BATCH_SIZE):
+                    cursor.execute(f"""
+                        UPDATE {table} t
+                        INNER JOIN learning_items li ON li.id = t.item_id
+                        SET t.user_id = li.user_id
+                        WHERE t.id > %s AND t.id <= %s AND NOT (t.user_id <=> li.user_id)
+                    """, (start, start + BACKFILL_BATCH_SIZE))
+                    connection.commit()
+                print(f"{table} 已回填 user_id")
             cursor.close()
-            print("数据表创建成功")
         except Error as e:
-            print(f"创建表失败: {e}")
+            print(f"回填 user_id 出错: {e}")
+            return False
         finally:
             connection.close()
 
-    def add_item(self, item_type, english, chinese, pronunciation="", example_en="", example_zh="", audio_path=""):
+        # 归属变化后计数表与连续学习状态一并重建
+        return self.rebuild_counters() and self.rebuild_streaks()
+
+    def add_item(self, user_id, item_type, english, chinese, pronunciation="", example_en="", example_zh="", audio_path=""):
         """添加学习内容"""
         connection = self.get_connection()
         if not connection:
@@ -157,13 +651,15 @@ class DatabaseManager:
             cursor = connection.cursor()
             query = """
                 INSERT INTO learning_items 
-                (type, english, chinese, pronunciation, example_en, example_zh, audio_path)
-                VALUES (%s, %s, %s, %s, %s, %s, %s)
+                (user_id, type, english, chinese, pronunciation, example_en, example_zh, audio_path)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
             """
-            cursor.execute(query, (item_type, english, chinese, pronunciation,
+            cursor.execute(query, (user_id, item_type, english, chinese, pronunciation,
                                    example_en, example_zh, audio_path))
+            self._bump_item_counters(cursor, user_id, {item_type: 1})
             connection.commit()
             cursor.close()
+            self._invalidate(user_id, 'items')
             return True
         except Error as e:
             print(f"添加内容出错: {e}")
@@ -171,70 +667,168 @@ class DatabaseManager:
         finally:
             connection.close()
 
-    def get_items_for_learning(self, limit=50, item_type='all'):
-        """获取学习内容列表"""
+    def _bump_item_counters(self, cursor, user_id, counts):
+        """在当前事务中累加内容计数，counts 为 {类型: 数量}"""
+        if not any(counts.values()):
+            return
+        word = counts.get('word', 0)
+        phrase = counts.get('phrase', 0)
+        sentence = counts.get('sentence', 0)
+        cursor.execute("""
+            INSERT INTO item_counters (user_id, word_count, phrase_count, sentence_count)
+            VALUES (%s, %s, %s, %s)
+            ON DUPLICATE KEY UPDATE
+            word_count = word_count + %s,
+            phrase_count = phrase_count + %s,
+            sentence_count = sentence_count + %s
+        """, (user_id, word, phrase, sentence, word, phrase, sentence))
+
+    def add_items_bulk(self, user_id, rows, chunk_size=500, on_chunk=None):
+        """批量导入学习内容
+
+        rows 为 (行号, 行数据元组) 的可迭代对象，按 chunk_size 分块，
+        每块一次 executemany + 一次提交。某块失败时逐行重试以定位出错的行。
+        """
+        query = """
+            INSERT INTO learning_items 
+            (user_id, type, english, chinese, pronunciation, example_en, example_zh, audio_path)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+        """
+        result = {'count': 0, 'chunks': [], 'errors': []}
+
         connection = self.get_connection()
         if not connection:
-            return []
+            result['errors'].append({'line': None, 'error': '数据库连接失败'})
+            return result
 
-        try:
-            cursor = connection.cursor(dictionary=True)
+        def flush(chunk):
+            imported = 0
+            cursor = connection.cursor()
+            try:
+                cursor.executemany(query, [(user_id, *values) for _, values in chunk])
+                self._bump_item_counters(cursor, user_id, Counter(values[0] for _, values in chunk))
+                connection.commit()
+                imported = len(chunk)
+            except Error:
+                connection.rollback()
+                counts = Counter()
+                for line, values in chunk:
+                    try:
+                        cursor.execute(query, (user_id, *values))
+                        counts[values[0]] += 1
+                        imported += 1
+                    except Error as e:
+                        result['errors'].append({'line': line, 'error': str(e)})
+                self._bump_item_counters(cursor, user_id, counts)
+                connection.commit()
+            finally:
+                cursor.close()
+
+            result['count'] += imported
+            progress = {
+                'chunk': len(result['chunks']) + 1,
+                'rows': len(chunk),
+                'imported': imported,
+                'total_imported': result['count']
+            }
+            result['chunks'].append(progress)
+            if on_chunk:
+                on_chunk(progress)
 
-            if item_type == 'all':
-                query = """
-                    SELECT li.* FROM learning_items li
-                    LEFT JOIN learning_records lr ON li.id = lr.item_id 
-                        AND lr.learned_date = CURDATE()
-                    WHERE lr.id IS NULL
-                    ORDER BY li.created_at DESC
-                    LIMIT %s
-                """
-                cursor.execute(query, (limit,))
-            else:
-                query = """
-                    SELECT li.* FROM learning_items li
-                    LEFT JOIN learning_records lr ON li.id = lr.item_id 
-                        AND lr.learned_date = CURDATE()
-                    WHERE lr.id IS NULL AND li.type = %s
-                    ORDER BY li.created_at DESC
-                    LIMIT %s
-                """
-                cursor.execute(query, (item_type, limit))
+        try:
+            chunk = []
+            for line, values in rows:
+                chunk.append((line, values))
+                if len(chunk) >= chunk_size:
+                    flush(chunk)
+                    chunk = []
+            if chunk:
+                flush(chunk)
+        except Error as e:
+            print(f"批量导入出错: {e}")
+            result['errors'].append({'line': None, 'error': str(e)})
+        finally:
+            connection.close()
+            if result['count']:
+                self._invalidate(user_id, 'items')
+        return result
+
+    @cached('items', 'records')
+    def get_items_for_learning(self, user_id, limit=50, item_type='all', after=None, fields=None):
+        """获取学习内容列表（按 created_at, id 倒序）
+
+        after 为上一页最后一行的 (created_at, id)，按键集分页，深页与首页开销相同。
+        fields 为要返回的列（ITEM_FIELDS 的子集），返回紧凑的行对象列表
+        """
+        fields = tuple(fields or ITEM_FIELDS)
+        connection = self.get_read_connection(user_id)
+        if not connection:
+            return []
 
-            items = cursor.fetchall()
-            cursor.close()
-            return items
+        try:
+            conditions = ["li.user_id = %s", "lr.id IS NULL"]
+            params = [user_id]
+            if item_type != 'all':
+                conditions.append("li.type = %s")
+                params.append(item_type)
+            if after:
+                conditions.append("(li.created_at < %s OR (li.created_at = %s AND li.id < %s))")
+                params.extend([after[0], after[0], after[1]])
+
+            query = f"""
+                SELECT {_item_columns(fields)} FROM learning_items li
+                LEFT JOIN learning_records lr ON li.id = lr.item_id 
+                    AND lr.learned_date = CURDATE()
+                WHERE {' AND '.join(conditions)}
+                ORDER BY li.created_at DESC, li.id DESC
+                LIMIT %s
+            """
+            # 类型筛选、是否翻页组合出的 4 种语句（每种投影）各自预处理一次
+            return make_rows(fields, connection.execute_prepared(query, params + [limit]).fetchall())
         except Error as e:
             print(f"获取学习内容出错: {e}")
             return []
         finally:
             connection.close()
 
-    def get_items_for_test(self, limit=20):
-        """获取测试内容列表"""
-        connection = self.get_connection()
+    def get_items_for_test(self, user_id, limit=20, fields=None):
+        """获取测试内容列表，fields 同 get_items_for_learning（需包含 id）"""
+        fields = tuple(fields or ITEM_FIELDS)
+        connection = self.get_read_connection(user_id)
         if not connection:
             return []
 
         try:
-            cursor = connection.cursor(dictionary=True)
+            cursor = connection.cursor()
 
-            # 优先获取复习内容，然后随机获取其他内容
-            query = """
-                (SELECT li.* FROM learning_items li
+            # 优先获取复习内容
+            cursor.execute(f"""
+                SELECT {_item_columns(fields)} FROM learning_items li
                 INNER JOIN review_items ri ON li.id = ri.item_id
-                WHERE ri.reviewed = FALSE
+                WHERE ri.user_id = %s AND ri.reviewed = FALSE
                 ORDER BY ri.added_date ASC
-                LIMIT %s)
-                UNION
-                (SELECT li.* FROM learning_items li
-                WHERE li.id NOT IN (SELECT item_id FROM review_items WHERE reviewed = FALSE)
-                ORDER BY RAND()
-                LIMIT %s)
                 LIMIT %s
-            """
-            cursor.execute(query, (limit // 2, limit // 2, limit))
-            items = cursor.fetchall()
+            """, (user_id, limit // 2))
+            items = []
+            seen = set()
+            for item in make_rows(fields, cursor.fetchall()):
+                if item.id not in seen:
+                    seen.add(item.id)
+                    items.append(item)
+
+            # 其余名额随机抽取不在复习库中的内容
+            sample_cursor = connection.cursor(dictionary=True)
+            sample_ids = self._sample_item_ids(sample_cursor, user_id, limit - len(items), seen)
+            sample_cursor.close()
+            if sample_ids:
+                placeholders = ', '.join(['%s'] * len(sample_ids))
+                cursor.execute(
+                    f"SELECT {_item_columns(fields)} FROM learning_items li WHERE li.id IN ({placeholders})",
+                    sample_ids
+                )
+                rows = {row.id: row for row in make_rows(fields, cursor.fetchall())}
+                items.extend(rows[i] for i in sample_ids if i in rows)
+
             cursor.close()
             return items
         except Error as e:
@@ -243,54 +837,183 @@ class DatabaseManager:
         finally:
             connection.close()
 
-    def add_to_review(self, items):
-        """添加到复习库"""
+    def _sample_item_ids(self, cursor, user_id, count, exclude_ids):
+        """随机抽取用户的 count 个不在复习库中的内容 id
+
+        按用户的内容数（item_counters）选择策略：
+        - 内容较少时取出该用户全部可选 id，在内存中抽样
+        - 内容较多（或计数缺失）时按 id 区间随机探测：每个探测点用 (user_id, id) 索引取 id >= 探测值的第一行，
+          开销与表大小无关，代替 ORDER BY RAND() 的全表扫描和排序
+        用户的 id 与其他用户交错、分布稀疏时，探测会反复落到同一行，不足的名额从随机位置起
+        按 id 顺序补齐（见 _sample_by_range），同样不随用户内容数增长。
+        """
+        if count <= 0:
+            return []
+
+        cursor.execute(
+            "SELECT word_count + phrase_count + sentence_count AS total FROM item_counters WHERE user_id = %s",
+            (user_id,))
+        counters = cursor.fetchone()
+        seen = set(exclude_ids)
+
+        if counters and counters['total'] <= SAMPLE_SCAN_THRESHOLD:
+            return self._sample_by_scan(cursor, user_id, count, seen)
+
+        cursor.execute(
+            "SELECT MIN(id) AS min_id, MAX(id) AS max_id FROM learning_items WHERE user_id = %s", (user_id,))
+        bounds = cursor.fetchone()
+        if not bounds or bounds['min_id'] is None:
+            return []
+        min_id, max_id = bounds['min_id'], bounds['max_id']
+
+        picked = []
+        for _ in range(SAMPLE_MAX_ROUNDS):
+            need = count - len(picked)
+            if need <= 0:
+                break
+
+            # 多探测一些，抵消命中重复 id 或复习内容的损耗
+            probes = [random.randint(min_id, max_id) for _ in range(need * SAMPLE_OVERSAMPLE)]
+            query = " UNION ALL ".join(
+                ["(SELECT id FROM learning_items WHERE user_id = %s AND id >= %s ORDER BY id LIMIT 1)"]
+                * len(probes))
+            cursor.execute(query, [param for probe in probes for param in (user_id, probe)])
+            candidates = []
+            for row in cursor.fetchall():
+                if row['id'] not in seen:
+                    seen.add(row['id'])
+                    candidates.append(row['id'])
+            if not candidates:
+                continue
+
+            # 排除待复习的内容（走 idx_item_reviewed 索引）
+            placeholders = ', '.join(['%s'] * len(candidates))
+            cursor.execute(
+                f"SELECT item_id FROM review_items WHERE reviewed = FALSE AND item_id IN ({placeholders})",
+                candidates
+            )
+            pending = {row['item_id'] for row in cursor.fetchall()}
+            picked.extend(i for i in candidates if i not in pending)
+
+        if len(picked) < count:
+            picked.extend(self._sample_by_range(
+                cursor, user_id, count - len(picked), seen, random.randint(min_id, max_id)))
+        return picked[:count]
+
+    def _sample_by_range(self, cursor, user_id, count, exclude_ids, start_id):
+        """从 start_id 起按 id 顺序取用户 count 个不在复习库中的内容，到末尾后从头继续
+
+        每轮一条 LIMIT 查询，最多 SAMPLE_MAX_ROUNDS 轮，开销与用户内容数无关。
+        """
+        picked = []
+        seen = set(exclude_ids)
+        batch = count * SAMPLE_OVERSAMPLE + len(seen)
+        position, wrapped = start_id, False
+        for _ in range(SAMPLE_MAX_ROUNDS):
+            cursor.execute("""
+                SELECT li.id FROM learning_items li
+                LEFT JOIN review_items ri ON li.id = ri.item_id AND ri.reviewed = FALSE
+                WHERE li.user_id = %s AND li.id >= %s AND ri.id IS NULL
+                ORDER BY li.id
+                LIMIT %s
+            """, (user_id, position, batch))
+            ids = [row['id'] for row in cursor.fetchall()]
+            for item_id in ids:
+                if wrapped and item_id >= start_id:
+                    return picked
+                if item_id not in seen:
+                    seen.add(item_id)
+                    picked.append(item_id)
+                    if len(picked) == count:
+                        return picked
+            if len(ids) < batch:
+                if wrapped:
+                    break
+                # 到达末尾，从最小 id 开始继续，直到回到 start_id
+                position, wrapped = 0, True
+            else:
+                position = ids[-1] + 1
+        return picked
+
+    def _sample_by_scan(self, cursor, user_id, count, exclude_ids):
+        """取出用户全部不在复习库中的内容 id，排除 exclude_ids 后随机抽取 count 个"""
+        cursor.execute("""
+            SELECT li.id FROM learning_items li
+            LEFT JOIN review_items ri ON li.id = ri.item_id AND ri.reviewed = FALSE
+            WHERE li.user_id = %s AND ri.id IS NULL
+        """, (user_id,))
+        candidates = [row['id'] for row in cursor.fetchall() if row['id'] not in exclude_ids]
+        return random.sample(candidates, min(count, len(candidates)))
+
+    def add_to_review(self, user_id, items):
+        """添加到复习库
+
+        一条 INSERT IGNORE 写入全部内容，已在复习库中（未复习）的由唯一键
+        uniq_pending_item 跳过。返回 {'queued': 新加入数, 'already_pending': 已存在数,
+        'not_found': 不存在或不属于该用户的 id 数}，失败返回 None
+        """
+        item_ids = list(dict.fromkeys(item.get('id') for item in items if item.get('id')))
+        if not item_ids:
+            return {'queued': 0, 'already_pending': 0, 'not_found': 0}
+
         connection = self.get_connection()
         if not connection:
-            return False
+            return None
 
         try:
             cursor = connection.cursor()
-            for item in items:
-                item_id = item.get('id')
-                if item_id:
-                    # 检查是否已存在
-                    cursor.execute(
-                        "SELECT id FROM review_items WHERE item_id = %s AND reviewed = FALSE",
-                        (item_id,)
-                    )
-                    if not cursor.fetchone():
-                        cursor.execute(
-                            "INSERT INTO review_items (item_id) VALUES (%s)",
-                            (item_id,)
-                        )
+            placeholders = ', '.join(['%s'] * len(item_ids))
+            connection.start_transaction()
+            cursor.execute(
+                f"SELECT COUNT(*) FROM learning_items WHERE user_id = %s AND id IN ({placeholders})",
+                [user_id] + item_ids)
+            owned = cursor.fetchone()[0]
+            cursor.execute(f"""
+                INSERT IGNORE INTO review_items (item_id, user_id)
+                SELECT id, user_id FROM learning_items WHERE user_id = %s AND id IN ({placeholders})
+            """, [user_id] + item_ids)
+            queued = cursor.rowcount
             connection.commit()
             cursor.close()
-            return True
+            if queued:
+                self._invalidate(user_id, 'reviews')
+            return {'queued': queued, 'already_pending': owned - queued, 'not_found': len(item_ids) - owned}
         except Error as e:
+            connection.rollback()
             print(f"添加到复习库出错: {e}")
-            return False
+            return None
         finally:
             connection.close()
 
-    def get_review_items(self, limit=50):
-        """获取复习列表"""
-        connection = self.get_connection()
+    @cached('reviews')
+    def get_review_items(self, user_id, limit=50, after=None, fields=None):
+        """获取复习列表（按 added_date, 复习记录 id 正序）
+
+        after 为上一页最后一行的 (added_date, review_id)；
+        fields 为学习内容的列，added_date、review_id 总会附在行尾
+        """
+        fields = tuple(fields or ITEM_FIELDS)
+        connection = self.get_read_connection(user_id)
         if not connection:
             return []
 
         try:
-            cursor = connection.cursor(dictionary=True)
-            query = """
-                SELECT li.*, ri.added_date
+            cursor = connection.cursor()
+            keyset = ""
+            params = []
+            if after:
+                keyset = "AND (ri.added_date > %s OR (ri.added_date = %s AND ri.id > %s))"
+                params = [after[0], after[0], after[1]]
+            query = f"""
+                SELECT {_item_columns(fields)}, ri.added_date, ri.id AS review_id
                 FROM learning_items li
                 INNER JOIN review_items ri ON li.id = ri.item_id
-                WHERE ri.reviewed = FALSE
-                ORDER BY ri.added_date ASC
+                WHERE ri.user_id = %s AND ri.reviewed = FALSE {keyset}
+                ORDER BY ri.added_date ASC, ri.id ASC
                 LIMIT %s
             """
-            cursor.execute(query, (limit,))
-            items = cursor.fetchall()
+            cursor.execute(query, [user_id] + params + [limit])
+            items = make_rows(fields + ('added_date', 'review_id'), cursor.fetchall())
             cursor.close()
             return items
         except Error as e:
@@ -299,7 +1022,7 @@ class DatabaseManager:
         finally:
             connection.close()
 
-    def mark_as_reviewed(self, item_id):
+    def mark_as_reviewed(self, user_id, item_id):
         """标记为已复习"""
         connection = self.get_connection()
         if not connection:
@@ -309,11 +1032,13 @@ class DatabaseManager:
             cursor = connection.cursor()
             query = """
                 UPDATE review_items 
-                SET reviewed = TRUE, reviewed_date = CURRENT_TIMESTAMP
-                WHERE item_id = %s AND reviewed = FALSE
+                SET reviewed = TRUE, pending = NULL, reviewed_date = CURRENT_TIMESTAMP
+                WHERE item_id = %s AND user_id = %s AND reviewed = FALSE
             """
-            cursor.execute(query, (item_id,))
+            cursor.execute(query, (item_id, user_id))
             connection.commit()
+            if cursor.rowcount:
+                self._invalidate(user_id, 'reviews')
             cursor.close()
             return True
         except Error as e:
@@ -322,30 +1047,56 @@ class DatabaseManager:
         finally:
             connection.close()
 
-    def record_learning(self, item_id, is_correct):
-        """记录学习"""
+    def record_learning(self, user_id, item_id, is_correct):
+        """记录学习（开启写缓冲时只追加到缓冲，由后台批量写库）"""
+        if self.write_buffer:
+            # 统计方法在缓存结果之外合并缓冲中的事件，这里无需使缓存失效
+            self.write_buffer.add(user_id, item_id, is_correct)
+            return True
+
         connection = self.get_connection()
         if not connection:
             return False
 
         try:
-            cursor = connection.cursor()
             correct = 1 if is_correct else 0
             wrong = 0 if is_correct else 1
 
+            # 答题是最频繁的写入，三条语句都走预处理缓存
+            # 只记录属于该用户的内容
             query = """
                 INSERT INTO learning_records 
-                (item_id, learned_date, review_count, correct_count, wrong_count)
-                VALUES (%s, CURDATE(), 1, %s, %s)
+                (item_id, user_id, learned_date, review_count, correct_count, wrong_count)
+                SELECT id, user_id, CURDATE(), 1, %s, %s FROM learning_items WHERE id = %s AND user_id = %s
                 ON DUPLICATE KEY UPDATE
                 review_count = review_count + 1,
                 correct_count = correct_count + %s,
                 wrong_count = wrong_count + %s,
                 last_review = CURRENT_TIMESTAMP
             """
-            cursor.execute(query, (item_id, correct, wrong, correct, wrong))
+            cursor = connection.execute_prepared(query, (correct, wrong, item_id, user_id, correct, wrong))
+            if cursor.rowcount == 0:
+                connection.rollback()
+                return False
+
+            # 新插入（rowcount=1）说明是该内容今天第一次学习
+            first_today = 1 if cursor.rowcount == 1 else 0
+            cursor = connection.execute_prepared("""
+                INSERT INTO learning_daily_rollup
+                (user_id, learned_date, items_count, total_reviews, correct_count, wrong_count)
+                VALUES (%s, CURDATE(), %s, 1, %s, %s)
+                ON DUPLICATE KEY UPDATE
+                items_count = items_count + %s,
+                total_reviews = total_reviews + 1,
+                correct_count = correct_count + %s,
+                wrong_count = wrong_count + %s
+            """, (user_id, first_today, correct, wrong, first_today, correct, wrong))
+
+            # 汇总行新插入说明该用户今天第一次学习，推进连续天数
+            if cursor.rowcount == 1:
+                connection.execute_prepared(STREAK_ADVANCE_QUERY, (user_id,))
             connection.commit()
-            cursor.close()
+            self._invalidate(user_id, 'records')
             return True
         except Error as e:
             print(f"记录学习出错: {e}")
@@ -353,103 +1104,563 @@ class DatabaseManager:
         finally:
             connection.close()
 
-    def get_statistics(self):
-        """获取统计信息"""
+    def record_learning_batch(self, events):
+        """批量记录学习，events 为 {(user_id, item_id, learned_date): [reviews, correct, wrong]}"""
+        if not events:
+            return True
+
         connection = self.get_connection()
         if not connection:
-            return {
-                'word_count': 0,
-                'phrase_count': 0,
-                'sentence_count': 0,
-                'today_learned': 0
-            }
+            return False
 
         try:
-            cursor = connection.cursor(dictionary=True)
+            cursor = connection.cursor()
+            connection.start_transaction()
+            self._apply_learning_events(cursor, events)
+            connection.commit()
+            cursor.close()
+            for user_id in {user_id for user_id, _, _ in events}:
+                self._invalidate(user_id, 'records')
+            return True
+        except Error as e:
+            connection.rollback()
+            print(f"批量记录学习出错: {e}")
+            return False
+        finally:
+            connection.close()
 
-            # 单词数
-            cursor.execute(
-                "SELECT COUNT(*) as count FROM learning_items WHERE type='word'")
-            word_count = cursor.fetchone()['count']
+    def record_learning_events(self, user_id, events):
+        """按幂等键批量记录答题事件（离线/移动端补传）
 
-            # 短语数
-            cursor.execute(
-                "SELECT COUNT(*) as count FROM learning_items WHERE type='phrase'")
-            phrase_count = cursor.fetchone()['count']
+        events 为 [{'item_id', 'is_correct', 'learned_date', 'idempotency_key'}]，
+        已处理过的幂等键跳过，其余在一个事务中写入。
+        返回 {'applied': 写入数, 'duplicates': 重复数}，失败返回 None
+        """
+        unique = {}
+        for event in events:
+            unique.setdefault(event['idempotency_key'], event)
+        if not unique:
+            return {'applied': 0, 'duplicates': 0}
 
-            # 句子数
-            cursor.execute(
-                "SELECT COUNT(*) as count FROM learning_items WHERE type='sentence'")
-            sentence_count = cursor.fetchone()['count']
+        connection = self.get_connection()
+        if not connection:
+            return None
+
+        try:
+            cursor = connection.cursor()
+            connection.start_transaction()
+
+            keys = list(unique)
+            cursor.execute(f"""
+                SELECT idempotency_key FROM learning_event_keys
+                WHERE user_id = %s AND idempotency_key IN ({', '.join(['%s'] * len(keys))})
+                FOR UPDATE
+            """, [user_id] + keys)
+            seen = {row[0] for row in cursor.fetchall()}
+            fresh = [unique[key] for key in keys if key not in seen]
+
+            if fresh:
+                # 并发重试时主键冲突会使整批回滚，客户端重试即可
+                cursor.executemany(
+                    "INSERT INTO learning_event_keys (user_id, idempotency_key) VALUES (%s, %s)",
+                    [(user_id, event['idempotency_key']) for event in fresh]
+                )
+                aggregated = {}
+                for event in fresh:
+                    counts = aggregated.setdefault((user_id, event['item_id'], event['learned_date']), [0, 0, 0])
+                    counts[0] += 1
+                    counts[1 if event['is_correct'] else 2] += 1
+                self._apply_learning_events(cursor, aggregated)
+
+            connection.commit()
+            cursor.close()
+            if fresh:
+                self._invalidate(user_id, 'records')
+            return {'applied': len(fresh), 'duplicates': len(events) - len(fresh)}
+        except Error as e:
+            connection.rollback()
+            print(f"批量记录答题事件出错: {e}")
+            return None
+        finally:
+            connection.close()
+
+    def purge_idempotency_keys(self, days, batch_size=1000):
+        """分批删除超过 days 天的幂等键，返回删除数"""
+        connection = self.get_connection()
+        if not connection:
+            return 0
 
-            # 今日学习数
+        deleted = 0
+        try:
+            cursor = connection.cursor()
+            while True:
+                cursor.execute("""
+                    DELETE FROM learning_event_keys
+                    WHERE created_at < DATE_SUB(NOW(), INTERVAL %s DAY)
+                    LIMIT %s
+                """, (days, batch_size))
+                connection.commit()
+                deleted += cursor.rowcount
+                if cursor.rowcount < batch_size:
+                    break
+            cursor.close()
+            return deleted
+        except Error as e:
+            print(f"清理幂等键出错: {e}")
+            return deleted
+        finally:
+            connection.close()
+
+    def _apply_learning_events(self, cursor, events):
+        """在当前事务中用多行 upsert 写入 learning_records、每日汇总和连续学习状态
+
+        events 为 {(user_id, item_id, learned_date): [reviews, correct, wrong]}
+        """
+        # 早于压缩水位的日期已合并进终身汇总、不会再被压缩，计入水位当天
+        compacted_before = self._compacted_before(cursor)
+        if compacted_before and any(learned_date < compacted_before for _, _, learned_date in events):
+            clamped = {}
+            for (user_id, item_id, learned_date), counts in events.items():
+                merged = clamped.setdefault((user_id, item_id, max(learned_date, compacted_before)), [0, 0, 0])
+                for i, count in enumerate(counts):
+                    merged[i] += count
+            events = clamped
+
+        item_ids = sorted({item_id for _, item_id, _ in events})
+        dates = sorted({learned_date for _, _, learned_date in events})
+        item_placeholders = ', '.join(['%s'] * len(item_ids))
+        date_placeholders = ', '.join(['%s'] * len(dates))
+
+        # 只保留属于对应用户的内容；已删除的内容直接丢弃
+        cursor.execute(
+            f"SELECT id, user_id FROM learning_items WHERE id IN ({item_placeholders})",
+            item_ids
+        )
+        owners = dict(cursor.fetchall())
+        events = {key: counts for key, counts in events.items() if owners.get(key[1]) == key[0]}
+        if not events:
+            return
+
+        # 已有的 (item_id, 日期) 记录，用于判断是否当天第一次学习
+        cursor.execute(f"""
+            SELECT item_id, learned_date FROM learning_records
+            WHERE item_id IN ({item_placeholders}) AND learned_date IN ({date_placeholders})
+            FOR UPDATE
+        """, item_ids + dates)
+        existing_records = set(cursor.fetchall())
+
+        cursor.executemany("""
+            INSERT INTO learning_records 
+            (item_id, user_id, learned_date, review_count, correct_count, wrong_count)
+            VALUES (%s, %s, %s, %s, %s, %s)
+            ON DUPLICATE KEY UPDATE
+            review_count = review_count + VALUES(review_count),
+            correct_count = correct_count + VALUES(correct_count),
+            wrong_count = wrong_count + VALUES(wrong_count),
+            last_review = CURRENT_TIMESTAMP
+        """, [(item_id, user_id, learned_date, *counts)
+              for (user_id, item_id, learned_date), counts in events.items()])
+
+        rollup = {}
+        for (user_id, item_id, learned_date), (reviews, correct, wrong) in events.items():
+            row = rollup.setdefault((user_id, learned_date), [0, 0, 0, 0])
+            row[0] += 0 if (item_id, learned_date) in existing_records else 1
+            row[1] += reviews
+            row[2] += correct
+            row[3] += wrong
+
+        user_ids = sorted({user_id for user_id, _ in rollup})
+        cursor.execute(f"""
+            SELECT user_id, learned_date FROM learning_daily_rollup
+            WHERE user_id IN ({', '.join(['%s'] * len(user_ids))}) AND learned_date IN ({date_placeholders})
+            FOR UPDATE
+        """, user_ids + dates)
+        existing_days = set(cursor.fetchall())
+
+        cursor.executemany("""
+            INSERT INTO learning_daily_rollup
+            (user_id, learned_date, items_count, total_reviews, correct_count, wrong_count)
+            VALUES (%s, %s, %s, %s, %s, %s)
+            ON DUPLICATE KEY UPDATE
+            items_count = items_count + VALUES(items_count),
+            total_reviews = total_reviews + VALUES(total_reviews),
+            correct_count = correct_count + VALUES(correct_count),
+            wrong_count = wrong_count + VALUES(wrong_count)
+        """, [(user_id, learned_date, *counts) for (user_id, learned_date), counts in rollup.items()])
+
+        # 新出现的学习日按日期顺序推进连续天数
+        new_days = sorted((key for key in rollup if key not in existing_days), key=lambda k: k[1])
+        if new_days:
+            cursor.executemany(STREAK_ADVANCE_ON_DATE_QUERY, new_days)
+
+    def _pending_today(self, user_id):
+        """写缓冲中用户今天尚未写库的学习量 (新内容数, 复习次数, 正确, 错误)
+
+        缓冲只有本进程可见，而结果缓存可能跨 worker 共享：统计方法的缓存部分只读数据库，
+        由公开方法在取得（可能来自缓存的）结果后再合并本项。
+        """
+        if not self.write_buffer:
+            return 0, 0, 0, 0
+        today = date.today()
+        pending = self.write_buffer.pending(user_id, today)
+        if not pending:
+            return 0, 0, 0, 0
+
+        # 今天已写库的内容不算新学
+        item_ids = list(pending)
+        existing = len(item_ids)
+        connection = self.get_connection()
+        if connection:
+            try:
+                cursor = connection.cursor()
+                cursor.execute(f"""
+                    SELECT COUNT(*) FROM learning_records
+                    WHERE learned_date = %s AND item_id IN ({', '.join(['%s'] * len(item_ids))})
+                """, [today] + item_ids)
+                existing = cursor.fetchone()[0]
+                cursor.close()
+            except Error as e:
+                print(f"读取写缓冲对应记录出错: {e}")
+            finally:
+                connection.close()
+        return (
+            len(item_ids) - existing,
+            sum(counts[0] for counts in pending.values()),
+            sum(counts[1] for counts in pending.values()),
+            sum(counts[2] for counts in pending.values()),
+        )
+
+    def get_statistics(self, user_id):
+        """获取统计信息（读计数表，单次主键查询），合并写缓冲中今天新学的内容"""
+        stats = self._get_statistics(user_id)
+        pending_items = self._pending_today(user_id)[0]
+        if not pending_items:
+            return stats
+        return dict(stats, today_learned=stats['today_learned'] + pending_items)
+
+    @cached('items', 'records')
+    def _get_statistics(self, user_id):
+        empty = {
+            'word_count': 0,
+            'phrase_count': 0,
+            'sentence_count': 0,
+            'today_learned': 0
+        }
+        connection = self.get_read_connection(user_id)
+        if not connection:
+            return empty
+
+        try:
+            row = fetch_dict(connection.execute_prepared("""
+                SELECT
+                    ic.word_count,
+                    ic.phrase_count,
+                    ic.sentence_count,
+                    (SELECT items_count FROM learning_daily_rollup
+                     WHERE user_id = %s AND learned_date = CURDATE()) AS today_learned
+                FROM (SELECT %s AS user_id) u
+                LEFT JOIN item_counters ic ON ic.user_id = u.user_id
+            """, (user_id, user_id)))
+            return {key: row[key] or 0 for key in empty}
+        except Error as e:
+            print(f"获取统计信息出错: {e}")
+            return empty
+        finally:
+            connection.close()
+
+    def rebuild_counters(self):
+        """从基础表重建计数表（对账）"""
+        connection = self.get_connection()
+        if not connection:
+            return False
+
+        try:
+            cursor = connection.cursor()
+            connection.start_transaction()
+            cursor.execute("DELETE FROM item_counters")
             cursor.execute("""
-                SELECT COUNT(DISTINCT item_id) as today 
-                FROM learning_records 
-                WHERE learned_date = CURDATE()
+                INSERT INTO item_counters (user_id, word_count, phrase_count, sentence_count)
+                SELECT
+                    user_id,
+                    SUM(type = 'word'),
+                    SUM(type = 'phrase'),
+                    SUM(type = 'sentence')
+                FROM learning_items
+                WHERE user_id IS NOT NULL
+                GROUP BY user_id
             """)
-            today_learned = cursor.fetchone()['today']
+            # 压缩水位之前的逐日记录已不完整，保留这部分每日汇总
+            compacted_before = self._compacted_before(cursor)
+            if compacted_before:
+                cursor.execute(
+                    "DELETE FROM learning_daily_rollup WHERE learned_date >= %s", (compacted_before,))
+                cursor.execute(ROLLUP_INSERT_QUERY.format(where="lr.learned_date >= %s"), (compacted_before,))
+            else:
+                cursor.execute("DELETE FROM learning_daily_rollup")
+                cursor.execute(ROLLUP_INSERT_QUERY.format(where="1 = 1"))
+            connection.commit()
+            cursor.close()
+            self._invalidate_all()
+            print("计数表重建完成")
+            return True
+        except Error as e:
+            print(f"重建计数表出错: {e}")
+            return False
+        finally:
+            connection.close()
 
+    def compact_daily_rollup(self, days=7):
+        """按原始记录重算最近 days 天中已结束日期的汇总（不含今天，不早于压缩水位）"""
+        connection = self.get_connection()
+        if not connection:
+            return False
+
+        try:
+            cursor = connection.cursor()
+            start_date = date.today() - timedelta(days=days)
+            compacted_before = self._compacted_before(cursor)
+            if compacted_before:
+                start_date = max(start_date, compacted_before)
+            connection.start_transaction()
+            cursor.execute("""
+                DELETE FROM learning_daily_rollup
+                WHERE learned_date >= %s AND learned_date < CURDATE()
+            """, (start_date,))
+            cursor.execute(ROLLUP_INSERT_QUERY.format(
+                where="lr.learned_date >= %s AND lr.learned_date < CURDATE()"
+            ), (start_date,))
+            connection.commit()
             cursor.close()
-            return {
-                'word_count': word_count,
-                'phrase_count': phrase_count,
-                'sentence_count': sentence_count,
-                'today_learned': today_learned
-            }
+            self._invalidate_all()
+            return True
         except Error as e:
-            print(f"获取统计信息出错: {e}")
-            return {
-                'word_count': 0,
-                'phrase_count': 0,
-                'sentence_count': 0,
-                'today_learned': 0
-            }
+            print(f"汇总学习记录出错: {e}")
+            return False
         finally:
             connection.close()
 
-    def get_detailed_statistics(self):
-        """获取详细统计"""
+    def _compacted_before(self, cursor):
+        """压缩水位（无则为 None），cursor 为元组游标"""
+        cursor.execute("SELECT compacted_before FROM learning_compaction WHERE id = 1")
+        row = cursor.fetchone()
+        return row[0] if row else None
+
+    def compact_learning_records(self, retention_days, batch_size=5000, pause=0.0):
+        """把 retention_days 天之前的逐日学习记录合并到 learning_item_summary 后删除
+
+        先推进压缩水位，再按 (learned_date, id) 分批处理：每批一个短事务，
+        只锁住本批的行。每日汇总、连续学习天数不受影响（它们不依赖被删除的行）。
+        返回合并的行数，失败返回 None
+        """
+        cutoff = date.today() - timedelta(days=retention_days)
         connection = self.get_connection()
+        if not connection:
+            return None
+
+        compacted = 0
+        try:
+            cursor = connection.cursor()
+            cursor.execute("""
+                INSERT INTO learning_compaction (id, compacted_before) VALUES (1, %s)
+                ON DUPLICATE KEY UPDATE compacted_before = GREATEST(compacted_before, VALUES(compacted_before))
+            """, (cutoff,))
+            connection.commit()
+
+            while True:
+                connection.start_transaction()
+                cursor.execute("""
+                    SELECT id, item_id, user_id, learned_date, review_count,
+                           correct_count, wrong_count, last_review
+                    FROM learning_records
+                    WHERE learned_date < %s
+                    ORDER BY learned_date, id
+                    LIMIT %s
+                    FOR UPDATE
+                """, (cutoff, batch_size))
+                rows = cursor.fetchall()
+                if not rows:
+                    connection.commit()
+                    break
+
+                summary = {}
+                for _, item_id, user_id, learned_date, reviews, correct, wrong, last_review in rows:
+                    entry = summary.get(item_id)
+                    if entry is None:
+                        summary[item_id] = [user_id, 1, reviews, correct, wrong,
+                                            learned_date, learned_date, last_review]
+                        continue
+                    entry[1] += 1
+                    entry[2] += reviews
+                    entry[3] += correct
+                    entry[4] += wrong
+                    entry[5] = min(entry[5], learned_date)
+                    entry[6] = max(entry[6], learned_date)
+                    if last_review and (entry[7] is None or last_review > entry[7]):
+                        entry[7] = last_review
+
+                cursor.executemany("""
+                    INSERT INTO learning_item_summary
+                    (item_id, user_id, days_count, review_count, correct_count, wrong_count,
+                     first_learned, last_learned, last_review)
+                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+                    ON DUPLICATE KEY UPDATE
+                    user_id = VALUES(user_id),
+                    days_count = days_count + VALUES(days_count),
+                    review_count = review_count + VALUES(review_count),
+                    correct_count = correct_count + VALUES(correct_count),
+                    wrong_count = wrong_count + VALUES(wrong_count),
+                    first_learned = LEAST(first_learned, VALUES(first_learned)),
+                    last_learned = GREATEST(last_learned, VALUES(last_learned)),
+                    last_review = GREATEST(COALESCE(last_review, VALUES(last_review)),
+                                           COALESCE(VALUES(last_review), last_review))
+                """, [(item_id, *entry) for item_id, entry in summary.items()])
+                ids = [row[0] for row in rows]
+                cursor.execute(
+                    f"DELETE FROM learning_records WHERE id IN ({', '.join(['%s'] * len(ids))})", ids)
+                connection.commit()
+
+                compacted += len(rows)
+                print(f"已压缩 {compacted} 条学习记录")
+                if len(rows) < batch_size:
+                    break
+                if pause:
+                    time.sleep(pause)
+
+            cursor.close()
+            return compacted
+        except Error as e:
+            connection.rollback()
+            print(f"压缩学习记录出错: {e}")
+            return None
+        finally:
+            connection.close()
+
+    def get_item_lifetime_stats(self, user_id, item_ids):
+        """内容的终身学习统计：已压缩的汇总 + 保留期内的逐日记录 + 写缓冲中今天尚未写库的事件
+
+        返回 {item_id: {days, review_count, correct_count, wrong_count,
+        first_learned, last_learned, accuracy}}，从未学过的内容不在结果中
+        """
+        item_ids = list(dict.fromkeys(item_ids))
+        if not item_ids:
+            return {}
+
+        connection = self.get_read_connection(user_id)
         if not connection:
             return {}
 
         try:
             cursor = connection.cursor(dictionary=True)
+            placeholders = ', '.join(['%s'] * len(item_ids))
+            cursor.execute(f"""
+                SELECT
+                    item_id,
+                    SUM(days) AS days,
+                    SUM(reviews) AS review_count,
+                    SUM(correct) AS correct_count,
+                    SUM(wrong) AS wrong_count,
+                    MIN(first_learned) AS first_learned,
+                    MAX(last_learned) AS last_learned
+                FROM (
+                    SELECT item_id, days_count AS days, review_count AS reviews,
+                           correct_count AS correct, wrong_count AS wrong, first_learned, last_learned
+                    FROM learning_item_summary
+                    WHERE user_id = %s AND item_id IN ({placeholders})
+                    UNION ALL
+                    SELECT item_id, COUNT(*), SUM(review_count), SUM(correct_count), SUM(wrong_count),
+                           MIN(learned_date), MAX(learned_date)
+                    FROM learning_records
+                    WHERE user_id = %s AND item_id IN ({placeholders})
+                    GROUP BY item_id
+                ) merged
+                GROUP BY item_id
+            """, [user_id] + item_ids + [user_id] + item_ids)
+            merged = {
+                row['item_id']: [int(row['days']), int(row['review_count']), int(row['correct_count']),
+                                 int(row['wrong_count']), row['first_learned'], row['last_learned']]
+                for row in cursor.fetchall()
+            }
 
-            # 总学习次数
-            cursor.execute(
-                "SELECT SUM(review_count) as total FROM learning_records")
-            total_reviews = cursor.fetchone()['total'] or 0
+            # 合并写缓冲中尚未写库的事件（与看板一致）
+            today = date.today()
+            pending = self.write_buffer.pending(user_id, today) if self.write_buffer else {}
+            wanted = set(item_ids)
+            pending = {item_id: counts for item_id, counts in pending.items() if item_id in wanted}
+            if pending:
+                cursor.execute(f"""
+                    SELECT item_id FROM learning_records
+                    WHERE learned_date = %s AND item_id IN ({', '.join(['%s'] * len(pending))})
+                """, [today] + list(pending))
+                learned_today = {row['item_id'] for row in cursor.fetchall()}
+                for item_id, (reviews, correct, wrong) in pending.items():
+                    entry = merged.setdefault(item_id, [0, 0, 0, 0, today, today])
+                    entry[0] += 0 if item_id in learned_today else 1
+                    entry[1] += reviews
+                    entry[2] += correct
+                    entry[3] += wrong
+                    entry[4] = min(entry[4], today)
+                    entry[5] = max(entry[5], today)
+
+            stats = {}
+            for item_id, (days, reviews, correct, wrong, first_learned, last_learned) in merged.items():
+                stats[item_id] = {
+                    'days': days,
+                    'review_count': reviews,
+                    'correct_count': correct,
+                    'wrong_count': wrong,
+                    'first_learned': first_learned.strftime('%Y-%m-%d'),
+                    'last_learned': last_learned.strftime('%Y-%m-%d'),
+                    'accuracy': _accuracy(correct, wrong)
+                }
+            cursor.close()
+            return stats
+        except Error as e:
+            print(f"获取内容学习统计出错: {e}")
+            return {}
+        finally:
+            connection.close()
 
-            # 总正确次数
-            cursor.execute(
-                "SELECT SUM(correct_count) as total FROM learning_records")
-            total_correct = cursor.fetchone()['total'] or 0
+    def get_detailed_statistics(self, user_id):
+        """获取详细统计（读每日汇总表），合并写缓冲中尚未写库的事件"""
+        detail = self._get_detailed_statistics(user_id)
+        if not detail:
+            return detail
+        return _with_pending_totals(detail, self._pending_today(user_id))
 
-            # 总错误次数
-            cursor.execute(
-                "SELECT SUM(wrong_count) as total FROM learning_records")
-            total_wrong = cursor.fetchone()['total'] or 0
+    @cached('items', 'records', 'reviews')
+    def _get_detailed_statistics(self, user_id):
+        connection = self.get_read_connection(user_id)
+        if not connection:
+            return {}
+
+        try:
+            cursor = connection.cursor(dictionary=True)
+
+            cursor.execute("""
+                SELECT
+                    COALESCE(SUM(total_reviews), 0) AS total_reviews,
+                    COALESCE(SUM(correct_count), 0) AS total_correct,
+                    COALESCE(SUM(wrong_count), 0) AS total_wrong
+                FROM learning_daily_rollup
+                WHERE user_id = %s
+            """, (user_id,))
+            totals = cursor.fetchone()
+            total_correct = int(totals['total_correct'])
+            total_wrong = int(totals['total_wrong'])
 
             # 待复习数量
             cursor.execute(
-                "SELECT COUNT(*) as count FROM review_items WHERE reviewed = FALSE")
+                "SELECT COUNT(*) as count FROM review_items WHERE user_id = %s AND reviewed = FALSE", (user_id,))
             review_pending = cursor.fetchone()['count']
 
             cursor.close()
 
-            accuracy = 0
-            if total_correct + total_wrong > 0:
-                accuracy = round(
-                    (total_correct / (total_correct + total_wrong)) * 100, 2)
-
             return {
-                'total_reviews': total_reviews,
+                'total_reviews': int(totals['total_reviews']),
                 'total_correct': total_correct,
                 'total_wrong': total_wrong,
                 'review_pending': review_pending,
-                'accuracy': accuracy
+                'accuracy': _accuracy(total_correct, total_wrong)
             }
         except Error as e:
             print(f"获取详细统计出错: {e}")
@@ -457,27 +1668,38 @@ class DatabaseManager:
         finally:
             connection.close()
 
-    def get_learning_history(self, days=7):
-        """获取学习历史"""
-        connection = self.get_connection()
+    def get_learning_history(self, user_id, days=7, start_date=None, end_date=None, granularity='day'):
+        """获取学习历史（读每日汇总表）
+
+        默认返回最近 days 天；指定 start_date/end_date 时按区间查询。
+        granularity 为 week/month 时按周（周一起）/月汇总，
+        此时 items_count 为各天学习内容数之和。
+        """
+        connection = self.get_read_connection(user_id)
         if not connection:
             return []
 
+        if end_date is None:
+            end_date = date.today()
+        if start_date is None:
+            start_date = end_date - timedelta(days=days)
+
         try:
             cursor = connection.cursor(dictionary=True)
-            query = """
+            period = HISTORY_PERIODS[granularity]
+            query = f"""
                 SELECT 
-                    learned_date,
-                    COUNT(DISTINCT item_id) as items_count,
-                    SUM(review_count) as total_reviews,
+                    {period} as learned_date,
+                    SUM(items_count) as items_count,
+                    SUM(total_reviews) as total_reviews,
                     SUM(correct_count) as correct_count,
                     SUM(wrong_count) as wrong_count
-                FROM learning_records
-                WHERE learned_date >= DATE_SUB(CURDATE(), INTERVAL %s DAY)
-                GROUP BY learned_date
-                ORDER BY learned_date DESC
+                FROM learning_daily_rollup
+                WHERE user_id = %s AND learned_date BETWEEN %s AND %s
+                GROUP BY 1
+                ORDER BY 1 DESC
             """
-            cursor.execute(query, (days,))
+            cursor.execute(query, (user_id, start_date, end_date))
             history = cursor.fetchall()
             cursor.close()
 
@@ -485,6 +1707,8 @@ class DatabaseManager:
             for record in history:
                 record['learned_date'] = record['learned_date'].strftime(
                     '%Y-%m-%d')
+                for key in ('items_count', 'total_reviews', 'correct_count', 'wrong_count'):
+                    record[key] = int(record[key])
 
             return history
         except Error as e:
@@ -493,55 +1717,37 @@ class DatabaseManager:
         finally:
             connection.close()
 
-    def get_today_progress(self):
-        """获取今日进度"""
-        connection = self.get_connection()
+    def get_today_progress(self, user_id):
+        """获取今日进度（读每日汇总表），合并写缓冲中尚未写库的事件"""
+        progress = self._get_today_progress(user_id)
+        if not progress:
+            return progress
+        return _with_pending_today(progress, self._pending_today(user_id))
+
+    @cached('records')
+    def _get_today_progress(self, user_id):
+        connection = self.get_read_connection(user_id)
         if not connection:
             return {}
 
         try:
-            cursor = connection.cursor(dictionary=True)
+            row = fetch_dict(connection.execute_prepared("""
+                SELECT items_count, total_reviews, correct_count, wrong_count
+                FROM learning_daily_rollup
+                WHERE user_id = %s AND learned_date = CURDATE()
+            """, (user_id,))) or {}
 
-            # 今日学习的不同内容数
-            cursor.execute("""
-                SELECT COUNT(DISTINCT item_id) as count
-                FROM learning_records
-                WHERE learned_date = CURDATE()
-            """)
-            learned_count = cursor.fetchone()['count']
-
-            # 今日复习次数
-            cursor.execute("""
-                SELECT SUM(review_count) as count
-                FROM learning_records
-                WHERE learned_date = CURDATE()
-            """)
-            review_count = cursor.fetchone()['count'] or 0
-
-            # 今日正确率
-            cursor.execute("""
-                SELECT 
-                    SUM(correct_count) as correct,
-                    SUM(wrong_count) as wrong
-                FROM learning_records
-                WHERE learned_date = CURDATE()
-            """)
-            result = cursor.fetchone()
-            correct = result['correct'] or 0
-            wrong = result['wrong'] or 0
-
-            accuracy = 0
-            if correct + wrong > 0:
-                accuracy = round((correct / (correct + wrong)) * 100, 2)
-
-            cursor.close()
+            learned_count = row.get('items_count') or 0
+            review_count = row.get('total_reviews') or 0
+            correct = row.get('correct_count') or 0
+            wrong = row.get('wrong_count') or 0
 
             return {
                 'learned_count': learned_count,
                 'review_count': review_count,
                 'correct_count': correct,
                 'wrong_count': wrong,
-                'accuracy': accuracy
+                'accuracy': _accuracy(correct, wrong)
             }
         except Error as e:
             print(f"获取今日进度出错: {e}")
@@ -549,45 +1755,204 @@ class DatabaseManager:
         finally:
             connection.close()
 
-    def get_learning_streak(self):
-        """获取连续学习天数"""
-        connection = self.get_connection()
+    def get_learning_streak(self, user_id):
+        """获取连续学习天数（今天未学习时当前连续天数为 0）"""
+        empty = {'current_streak': 0, 'longest_streak': 0, 'last_active_date': None}
+        connection = self.get_read_connection(user_id)
         if not connection:
-            return 0
+            return empty
 
         try:
-            cursor = connection.cursor(dictionary=True)
+            row = fetch_dict(connection.execute_prepared("""
+                SELECT current_streak, longest_streak, last_active_date
+                FROM learning_streaks
+                WHERE user_id = %s
+            """, (user_id,)))
 
-            # 获取所有学习日期（倒序）
-            cursor.execute("""
-                SELECT DISTINCT learned_date
-                FROM learning_records
-                ORDER BY learned_date DESC
-            """)
-            dates = cursor.fetchall()
-            cursor.close()
+            if not row:
+                return empty
 
-            if not dates:
-                return 0
+            last_active = row['last_active_date']
+            return {
+                'current_streak': row['current_streak'] if last_active == date.today() else 0,
+                'longest_streak': row['longest_streak'],
+                'last_active_date': last_active.strftime('%Y-%m-%d') if last_active else None
+            }
+        except Error as e:
+            print(f"获取连续学习天数出错: {e}")
+            return empty
+        finally:
+            connection.close()
 
-            # 计算连续天数
-            streak = 0
-            today = date.today()
+    def export_items(self, user_id):
+        """导出用户全部学习内容，返回行元组的迭代器（列为 ITEM_FIELDS），失败返回 None"""
+        connection = self.get_read_connection(user_id)
+        if not connection:
+            return None
+        return self._stream_rows(connection, f"""
+            SELECT {_item_columns(ITEM_FIELDS)} FROM learning_items li
+            WHERE li.user_id = %s
+            ORDER BY li.id
+        """, (user_id,))
+
+    def export_learning_records(self, user_id):
+        """导出用户的全部学习记录，返回行元组的迭代器（列为 LEARNING_EXPORT_COLUMNS），失败返回 None
+
+        保留期内为逐日记录；已压缩的历史每个内容一行汇总（learned_date 为最后学习日），
+        按 learned_date 排序时排在逐日记录之前。
+        """
+        connection = self.get_read_connection(user_id)
+        if not connection:
+            return None
+        return self._stream_rows(connection, """
+            SELECT lis.item_id, li.type, li.english, li.chinese, lis.last_learned AS learned_date,
+                   lis.review_count, lis.correct_count, lis.wrong_count, lis.last_review,
+                   'summary' AS record_type, lis.first_learned, lis.days_count
+            FROM learning_item_summary lis
+            INNER JOIN learning_items li ON li.id = lis.item_id
+            WHERE lis.user_id = %s
+            UNION ALL
+            SELECT lr.item_id, li.type, li.english, li.chinese, lr.learned_date,
+                   lr.review_count, lr.correct_count, lr.wrong_count, lr.last_review,
+                   'daily' AS record_type, lr.learned_date AS first_learned, 1 AS days_count
+            FROM learning_records lr
+            INNER JOIN learning_items li ON li.id = lr.item_id
+            WHERE lr.user_id = %s
+            ORDER BY learned_date, record_type DESC, item_id
+        """, (user_id, user_id))
+
+    def _stream_rows(self, connection, query, params):
+        """在无缓冲游标上执行查询，返回逐批 fetchmany 的 RowStream
+
+        查询在调用时立即执行（出错返回 None）；结果行由服务端逐批发送，
+        内存占用与总行数无关。调用方必须读完或 close() 以归还连接。
+        """
+        try:
+            cursor = connection.cursor(buffered=False)
+            cursor.execute("SET SESSION net_write_timeout = %s", (EXPORT_NET_WRITE_TIMEOUT,))
+            cursor.execute(query, params)
+        except Error as e:
+            print(f"导出查询出错: {e}")
+            connection.close()
+            return None
+        return RowStream(connection, cursor)
+
+    def get_dashboard(self, user_id):
+        """首页看板：一个连接、一条聚合语句
+
+        返回 statistics / detail / today / streak 四部分，与对应单项接口的结构相同，
+        同样合并写缓冲中尚未写库的事件。
+        """
+        data = self._get_dashboard(user_id)
+        pending = self._pending_today(user_id)
+        if not data or not any(pending):
+            return data
+        return dict(
+            data,
+            statistics=dict(data['statistics'], today_learned=data['statistics']['today_learned'] + pending[0]),
+            detail=_with_pending_totals(data['detail'], pending),
+            today=_with_pending_today(data['today'], pending),
+        )
+
+    @cached('items', 'records', 'reviews')
+    def _get_dashboard(self, user_id):
+        connection = self.get_read_connection(user_id)
+        if not connection:
+            return {}
 
-            for i, record in enumerate(dates):
-                expected_date = today - timedelta(days=i)
-                if record['learned_date'] == expected_date:
-                    streak += 1
-                else:
-                    break
+        try:
+            row = fetch_dict(connection.execute_prepared(DASHBOARD_QUERY, (user_id,) * 4))
+            values = {key: int(value or 0) for key, value in row.items() if key != 'last_active_date'}
+
+            today_correct = values['today_correct']
+            today_wrong = values['today_wrong']
+            total_correct = values['total_correct']
+            total_wrong = values['total_wrong']
+            last_active = row['last_active_date']
 
-            return streak
+            return {
+                'statistics': {
+                    'word_count': values['word_count'],
+                    'phrase_count': values['phrase_count'],
+                    'sentence_count': values['sentence_count'],
+                    'today_learned': values['today_items']
+                },
+                'detail': {
+                    'total_reviews': values['total_reviews'],
+                    'total_correct': total_correct,
+                    'total_wrong': total_wrong,
+                    'review_pending': values['review_pending'],
+                    'accuracy': _accuracy(total_correct, total_wrong)
+                },
+                'today': {
+                    'learned_count': values['today_items'],
+                    'review_count': values['today_reviews'],
+                    'correct_count': today_correct,
+                    'wrong_count': today_wrong,
+                    'accuracy': _accuracy(today_correct, today_wrong)
+                },
+                'streak': {
+                    'current_streak': values['current_streak'] if last_active == date.today() else 0,
+                    'longest_streak': values['longest_streak'],
+                    'last_active_date': last_active.strftime('%Y-%m-%d') if last_active else None
+                }
+            }
         except Error as e:
-            print(f"获取连续学习天数出错: {e}")
-            return 0
+            print(f"获取首页看板出错: {e}")
+            return {}
         finally:
             connection.close()
 
+    def rebuild_streaks(self):
+        """从每日汇总回填连续学习状态"""
+        connection = self.get_connection()
+        if not connection:
+            return False
+
+        try:
+            cursor = connection.cursor()
+
+            # 按用户把连续日期分段（日期减去序号相同即为同一段）
+            cursor.execute("""
+                SELECT user_id, MAX(learned_date) AS end_date, COUNT(*) AS days
+                FROM (
+                    SELECT
+                        user_id,
+                        learned_date,
+                        DATE_SUB(learned_date, INTERVAL
+                            ROW_NUMBER() OVER (PARTITION BY user_id ORDER BY learned_date) DAY) AS grp
+                    FROM (
+                        -- 每日汇总覆盖全部学习日（逐日记录可能已被压缩）
+                        SELECT user_id, learned_date
+                        FROM learning_daily_rollup
+                    ) d
+                ) runs
+                GROUP BY user_id, grp
+                ORDER BY user_id, end_date
+            """)
+
+            streaks = {}
+            for user_id, end_date, days in cursor.fetchall():
+                # 按结束日期升序，最后一段即当前连续段
+                longest = streaks[user_id][1] if user_id in streaks else 0
+                streaks[user_id] = (days, max(longest, days), end_date)
+
+            cursor.execute("DELETE FROM learning_streaks")
+            if streaks:
+                cursor.executemany("""
+                    INSERT INTO learning_streaks (user_id, current_streak, longest_streak, last_active_date)
+                    VALUES (%s, %s, %s, %s)
+                """, [(user_id, *state) for user_id, state in streaks.items()])
+            connection.commit()
+            cursor.close()
+            self._invalidate_all()
+            print("连续学习状态回填完成")
+            return True
+        except Error as e:
+            print(f"回填连续学习状态出错: {e}")
+            return False
+        finally:
+            connection.close()
 
     # 用户相关方法
     def create_user(self, username, email, password):
@@ -658,12 +2023,8 @@ class DatabaseManager:
             return None
 
         try:
-            cursor = connection.cursor(dictionary=True)
-            query = "SELECT * FROM users WHERE id = %s"
-            cursor.execute(query, (user_id,))
-            user = cursor.fetchone()
-            cursor.close()
-            return user
+            # 每个登录请求都会查询，走预处理缓存
+            return fetch_dict(connection.execute_prepared("SELECT * FROM users WHERE id = %s", (user_id,)))
         except Error as e:
             print(f"获取用户失败: {e}")
             return None
@@ -771,3 +2132,17 @@ class DatabaseManager:
         """关闭连接池"""
         # 连接池会自动管理连接
         pass
+
+
+_db = None
+_db_lock = threading.Lock()
+
+
+def get_db():
+    """获取进程内共享的 DatabaseManager，建表只执行一次"""
+    global _db
+    if _db is None:
+        with _db_lock:
+            if _db is None:
+                _db = DatabaseManager()
+    return _db
@@ -0,0 +1,311 @@
+import os
+import threading
+import time
+from collections import deque
+
+from mysql.connector import Error
+from config import Config
+
+# 延迟直方图的桶上界（毫秒），最后一个桶收集更慢的查询
+LATENCY_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+# 慢查询日志中 SQL 和参数的最大长度
+MAX_LOGGED_SQL = 2000
+MAX_LOGGED_PARAMS = 500
+
+# 支持 EXPLAIN 的语句
+EXPLAINABLE = ('select', 'with', 'insert', 'update', 'delete', 'replace')
+
+
+def _compact_sql(sql):
+    return ' '.join(str(sql).split())[:MAX_LOGGED_SQL]
+
+
+def _format_params(params, many=False):
+    if params is None:
+        return None
+    if many:
+        params = list(params)
+        text = f"{len(params)} 行，首行 {params[0]!r}" if params else "0 行"
+    else:
+        text = repr(params)
+    if len(text) > MAX_LOGGED_PARAMS:
+        text = text[:MAX_LOGGED_PARAMS] + '...'
+    return text
+
+
+class QueryStats:
+    """按方法名统计查询延迟，记录慢查询
+
+    - 每个标签（DatabaseManager 的方法名）一个延迟直方图
+    - 超过 slow_ms 的语句连同参数写入最近 slow_log_size 条的环形日志
+    - explain 开启时，慢语句在连接归还前补抓 EXPLAIN
+    """
+
+    def __init__(self, slow_ms=200, explain=False, slow_log_size=100):
+        self.slow_ms = slow_ms
+        self.explain = explain
+        self.slow_log_size = slow_log_size
+        self._init_state()
+
+    def _init_state(self):
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+        self._methods = {}
+        self._slow = deque(maxlen=self.slow_log_size)
+        self._since = time.time()
+
+    def reset(self):
+        with self._lock:
+            self._methods = {}
+            self._slow = deque(maxlen=self.slow_log_size)
+            self._since = time.time()
+
+    def observe(self, label, elapsed_ms, error=False):
+        """记录一条语句的耗时，返回是否为慢查询"""
+        with self._lock:
+            stats = self._methods.get(label)
+            if stats is None:
+                stats = self._methods[label] = {
+                    'count': 0,
+                    'errors': 0,
+                    'total_ms': 0.0,
+                    'max_ms': 0.0,
+                    'slow': 0,
+                    'buckets': [0] * (len(LATENCY_BUCKETS_MS) + 1),
+                }
+            stats['count'] += 1
+            stats['total_ms'] += elapsed_ms
+            stats['max_ms'] = max(stats['max_ms'], elapsed_ms)
+            if error:
+                stats['errors'] += 1
+            index = len(LATENCY_BUCKETS_MS)
+            for i, bound in enumerate(LATENCY_BUCKETS_MS):
+                if elapsed_ms <= bound:
+                    index = i
+                    break
+            stats['buckets'][index] += 1
+            slow = elapsed_ms >= self.slow_ms
+            if slow:
+                stats['slow'] += 1
+            return slow
+
+    def log_slow(self, label, sql, params, elapsed_ms, many=False):
+        """记录慢查询，返回日志条目（稍后可补充 EXPLAIN）"""
+        entry = {
+            'method': label,
+            'elapsed_ms': round(elapsed_ms, 2),
+            'sql': _compact_sql(sql),
+            'params': _format_params(params, many),
+            'at': time.strftime('%Y-%m-%d %H:%M:%S'),
+            'explain': None,
+        }
+        with self._lock:
+            self._slow.append(entry)
+        print(f"慢查询 {label} {entry['elapsed_ms']}ms: {entry['sql']} 参数: {entry['params']}")
+        return entry
+
+    def snapshot(self):
+        """指标快照"""
+        with self._lock:
+            methods = {label: dict(stats, buckets=list(stats['buckets']))
+                       for label, stats in self._methods.items()}
+            slow = [dict(entry) for entry in self._slow]
+
+        for stats in methods.values():
+            count = stats['count']
+            buckets = stats.pop('buckets')
+            stats['avg_ms'] = round(stats['total_ms'] / count, 2) if count else 0
+            stats['total_ms'] = round(stats['total_ms'], 2)
+            stats['max_ms'] = round(stats['max_ms'], 2)
+            stats['histogram'] = {
+                f"<={bound}ms": n for bound, n in zip(LATENCY_BUCKETS_MS, buckets)
+            }
+            stats['histogram'][f">{LATENCY_BUCKETS_MS[-1]}ms"] = buckets[-1]
+            for name, q in (('p50_ms', 0.5), ('p95_ms', 0.95), ('p99_ms', 0.99)):
+                stats[name] = self._quantile(buckets, count, q, stats['max_ms'])
+
+        return {
+            'pid': self._pid,
+            'since': time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(self._since)),
+            'slow_ms': self.slow_ms,
+            'explain': self.explain,
+            'methods': dict(sorted(methods.items(), key=lambda kv: kv[1]['total_ms'], reverse=True)),
+            'slow_queries': slow[::-1],
+        }
+
+    @staticmethod
+    def _quantile(buckets, count, q, max_ms):
+        """按直方图估算分位数（取所在桶的上界）"""
+        if not count:
+            return 0
+        target = q * count
+        seen = 0
+        for bound, n in zip(LATENCY_BUCKETS_MS, buckets):
+            seen += n
+            if seen >= target:
+                return min(bound, max_ms)
+        return max_ms
+
+
+class InstrumentedCursor:
+    """游标代理：统计 execute 到结果取完的耗时"""
+
+    def __init__(self, connection, cursor, shared=False):
+        self._connection = connection
+        self._cursor = cursor
+        # 缓存的预处理游标归语句缓存所有，close() 时不关闭
+        self._shared = shared
+        self._current = None  # [sql, params, elapsed_ms, many]
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        return iter(self.fetchone, None)
+
+    def _run(self, fn, sql, params, many, *args, **kwargs):
+        self._finish()
+        start = time.perf_counter()
+        try:
+            result = fn(sql, params, *args, **kwargs)
+        except Error:
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            self._connection.stats.observe(self._connection.label, elapsed_ms, error=True)
+            raise
+        self._current = [sql, params, (time.perf_counter() - start) * 1000, many]
+        return result
+
+    def execute(self, operation, params=None, *args, **kwargs):
+        return self._run(self._cursor.execute, operation, params, False, *args, **kwargs)
+
+    def executemany(self, operation, seq_params, *args, **kwargs):
+        return self._run(self._cursor.executemany, operation, seq_params, True, *args, **kwargs)
+
+    def _timed_fetch(self, fn, *args):
+        start = time.perf_counter()
+        try:
+            return fn(*args)
+        finally:
+            if self._current:
+                self._current[2] += (time.perf_counter() - start) * 1000
+
+    def fetchone(self):
+        return self._timed_fetch(self._cursor.fetchone)
+
+    def fetchmany(self, *args):
+        return self._timed_fetch(self._cursor.fetchmany, *args)
+
+    def fetchall(self):
+        return self._timed_fetch(self._cursor.fetchall)
+
+    def _finish(self):
+        if self._current is None:
+            return
+        sql, params, elapsed_ms, many = self._current
+        self._current = None
+        self._connection.finish_statement(sql, params, elapsed_ms, many)
+
+    def close(self):
+        self._finish()
+        if not self._shared:
+            self._cursor.close()
+
+
+class InstrumentedConnection:
+    """连接代理：游标带计时，慢语句在连接关闭前补抓 EXPLAIN"""
+
+    def __init__(self, connection, label, stats):
+        self._cnx = connection
+        self.label = label
+        self.stats = stats
+        self._cursors = []
+        self._explain_queue = []
+
+    def __getattr__(self, name):
+        return getattr(self._cnx, name)
+
+    def cursor(self, *args, **kwargs):
+        cursor = InstrumentedCursor(self, self._cnx.cursor(*args, **kwargs))
+        self._cursors.append(cursor)
+        return cursor
+
+    def execute_prepared(self, sql, params=None):
+        """带计时的预处理语句执行，返回的游标按普通游标统计取数耗时"""
+        cursor = InstrumentedCursor(self, None, shared=True)
+
+        def run(sql, params):
+            cursor._cursor = self._cnx.execute_prepared(sql, params)
+
+        cursor._run(run, sql, params, False)
+        self._cursors.append(cursor)
+        return cursor
+
+    def finish_statement(self, sql, params, elapsed_ms, many):
+        if not self.stats.observe(self.label, elapsed_ms):
+            return
+        entry = self.stats.log_slow(self.label, sql, params, elapsed_ms, many)
+        if (self.stats.explain and not many
+                and str(sql).lstrip().split(None, 1)[0].lower() in EXPLAINABLE):
+            self._explain_queue.append((entry, sql, params))
+
+    def _capture_explain(self):
+        for entry, sql, params in self._explain_queue:
+            try:
+                cursor = self._cnx.cursor(dictionary=True)
+                cursor.execute(f"EXPLAIN {sql}", params)
+                entry['explain'] = cursor.fetchall()
+                cursor.close()
+            except Error as e:
+                entry['explain'] = f"EXPLAIN 失败: {e}"
+        self._explain_queue = []
+
+    def close(self):
+        for cursor in self._cursors:
+            cursor._finish()
+        self._cursors = []
+        if self._explain_queue:
+            self._capture_explain()
+        self._cnx.close()
+
+    def discard(self):
+        for cursor in self._cursors:
+            cursor._finish()
+        self._cursors = []
+        self._explain_queue = []
+        self._cnx.discard()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+_stats = None
+_stats_lock = threading.Lock()
+
+
+def get_query_stats():
+    """获取进程内唯一的查询统计"""
+    global _stats
+    if _stats is None:
+        with _stats_lock:
+            if _stats is None:
+                _stats = QueryStats(
+                    slow_ms=Config.SLOW_QUERY_MS,
+                    explain=Config.SLOW_QUERY_EXPLAIN,
+                    slow_log_size=Config.SLOW_QUERY_LOG_SIZE,
+                )
+    return _stats
+
+
+def _after_fork_in_child():
+    global _stats_lock
+    _stats_lock = threading.Lock()
+    if _stats is not None:
+        _stats._init_state()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
@@ -0,0 +1,316 @@
+import os
+import threading
+import time
+import weakref
+from collections import deque
+
+import mysql.connector
+from mysql.connector import Error
+from mysql.connector.errors import PoolError
+from config import Config
+from models.statements import StatementCache
+
+
+class PoolExhaustedError(PoolError):
+    """等待超时仍未拿到连接"""
+
+
+class PooledConnection:
+    """连接代理，close() 时归还连接池而不是断开"""
+
+    def __init__(self, pool, cnx):
+        self._pool = pool
+        self._cnx = cnx
+
+    def __getattr__(self, name):
+        if self._cnx is None:
+            raise PoolError("连接已归还连接池")
+        return getattr(self._cnx, name)
+
+    def close(self):
+        if self._cnx is not None:
+            cnx, self._cnx = self._cnx, None
+            self._pool.release(cnx)
+
+    def discard(self):
+        """断开并移出连接池（连接状态不可复用时，如无缓冲结果未读完）"""
+        if self._cnx is not None:
+            cnx, self._cnx = self._cnx, None
+            self._pool.release(cnx, discard=True)
+
+    def execute_prepared(self, sql, params=None):
+        """用服务端预处理语句执行 sql，语句句柄随物理连接缓存
+
+        返回的游标归缓存所有，调用方取完结果即可，不要 close()。
+        连接池关闭预处理时退回普通文本协议游标。
+        """
+        if self._cnx is None:
+            raise PoolError("连接已归还连接池")
+        if not self._pool.prepared:
+            cursor = self._cnx.cursor()
+            cursor.execute(sql, params)
+            return cursor
+        return self._pool.statement_cache(self._cnx).execute(sql, params)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class ConnectionPool:
+    """进程内共享的 MySQL 连接池
+
+    - min_size 个连接预先建立，按需增长到 max_size
+    - 池满时在 timeout 秒内排队等待，超时抛出 PoolExhaustedError
+    - fork 之后子进程丢弃继承来的连接，重新建立（gunicorn --preload）
+    - prepared 开启时每个物理连接缓存最多 statement_cache_size 条预处理语句
+    """
+
+    dialect = 'mysql'
+
+    def __init__(self, db_config, min_size=2, max_size=10, timeout=5.0, ping_interval=30.0,
+                 prepared=True, statement_cache_size=32):
+        self.db_config = db_config
+        self.min_size = max(0, min(min_size, max_size))
+        self.max_size = max_size
+        self.timeout = timeout
+        self.ping_interval = ping_interval
+        self.prepared = prepared
+        self.statement_cache_size = statement_cache_size
+        self._init_state()
+
+    def _init_state(self):
+        self._pid = os.getpid()
+        self._cond = threading.Condition()
+        self._idle = deque()  # (cnx, last_used)
+        self._size = 0
+        self._in_use = 0
+        self._waiting = 0
+        self._statement_caches = weakref.WeakKeyDictionary()
+        self._stats = {
+            'checkouts': 0,
+            'waits': 0,
+            'wait_time_ms': 0.0,
+            'max_wait_ms': 0.0,
+            'exhausted': 0,
+            'created': 0,
+            'discarded': 0,
+        }
+
+    def prefill(self):
+        """预先建立 min_size 个连接"""
+        while True:
+            with self._cond:
+                if self._size >= self.min_size:
+                    return
+                self._size += 1
+            try:
+                cnx = self._connect()
+            except Error:
+                with self._cond:
+                    self._size -= 1
+                raise
+            with self._cond:
+                self._idle.append((cnx, time.monotonic()))
+                self._cond.notify()
+
+    def create_database(self):
+        """数据库不存在时创建"""
+        temp_config = self.db_config.copy()
+        temp_config.pop('database', None)
+
+        connection = mysql.connector.connect(**temp_config)
+        cursor = connection.cursor()
+        cursor.execute(
+            f"CREATE DATABASE IF NOT EXISTS {self.db_config['database']} CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci")
+        cursor.close()
+        connection.close()
+
+    def _connect(self):
+        cnx = mysql.connector.connect(**self.db_config)
+        with self._cond:
+            self._stats['created'] += 1
+        return cnx
+
+    def _check_pid(self):
+        if self._pid != os.getpid():
+            self.reset_after_fork()
+
+    def reset_after_fork(self):
+        """子进程中丢弃父进程的连接（不能 close，会断开父进程的会话）"""
+        self._init_state()
+
+    def close_idle(self):
+        """关闭所有空闲连接"""
+        with self._cond:
+            idle = list(self._idle)
+            self._idle.clear()
+            self._size -= len(idle)
+            self._cond.notify_all()
+        for cnx, _ in idle:
+            try:
+                cnx.close()
+            except Error:
+                pass
+
+    def get_connection(self, timeout=None):
+        """获取连接，池满时最多等待 timeout 秒"""
+        self._check_pid()
+        if timeout is None:
+            timeout = self.timeout
+
+        start = time.monotonic()
+        deadline = start + timeout
+        waited = False
+        cnx = None
+
+        with self._cond:
+            while True:
+                if self._idle:
+                    cnx, last_used = self._idle.pop()
+                    break
+                if self._size < self.max_size:
+                    self._size += 1
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._stats['exhausted'] += 1
+                    raise PoolExhaustedError(
+                        f"连接池已满（{self.max_size}），等待 {timeout}s 超时")
+                waited = True
+                self._waiting += 1
+                try:
+                    self._cond.wait(remaining)
+                finally:
+                    self._waiting -= 1
+
+            wait_ms = (time.monotonic() - start) * 1000
+            if waited:
+                self._stats['waits'] += 1
+                self._stats['wait_time_ms'] += wait_ms
+                self._stats['max_wait_ms'] = max(self._stats['max_wait_ms'], wait_ms)
+
+        try:
+            if cnx is None:
+                cnx = self._connect()
+            elif time.monotonic() - last_used > self.ping_interval:
+                # 空闲较久的连接可能已被服务端断开
+                cnx.ping(reconnect=True, attempts=1)
+        except Error:
+            with self._cond:
+                self._size -= 1
+                self._stats['discarded'] += 1
+                self._cond.notify()
+            raise
+
+        with self._cond:
+            self._in_use += 1
+            self._stats['checkouts'] += 1
+        return PooledConnection(self, cnx)
+
+    def statement_cache(self, cnx):
+        """物理连接对应的预处理语句缓存（连接丢弃后随之回收）"""
+        cache = self._statement_caches.get(cnx)
+        if cache is None:
+            cache = self._statement_caches[cnx] = StatementCache(cnx, self.statement_cache_size)
+        return cache
+
+    def release(self, cnx, discard=False):
+        """归还连接，回滚未提交的事务；discard 时直接断开"""
+        if self._pid != os.getpid():
+            return
+
+        healthy = not discard
+        try:
+            if healthy and cnx.in_transaction:
+                cnx.rollback()
+        except Error:
+            healthy = False
+
+        with self._cond:
+            self._in_use -= 1
+            if healthy:
+                self._idle.append((cnx, time.monotonic()))
+            else:
+                self._size -= 1
+                self._stats['discarded'] += 1
+            self._cond.notify()
+
+        if not healthy:
+            try:
+                cnx.close()
+            except Error:
+                pass
+
+    def stats(self):
+        """连接池指标"""
+        with self._cond:
+            stats = dict(self._stats)
+            stats.update({
+                'pid': self._pid,
+                'min_size': self.min_size,
+                'max_size': self.max_size,
+                'size': self._size,
+                'in_use': self._in_use,
+                'idle': len(self._idle),
+                'waiting': self._waiting,
+                'prepared': self.prepared,
+                'statement_prepares': sum(c.prepares for c in self._statement_caches.values()),
+                'statement_hits': sum(c.hits for c in self._statement_caches.values()),
+            })
+        stats['avg_wait_ms'] = round(stats['wait_time_ms'] / stats['waits'], 2) if stats['waits'] else 0
+        stats['wait_time_ms'] = round(stats['wait_time_ms'], 2)
+        stats['max_wait_ms'] = round(stats['max_wait_ms'], 2)
+        return stats
+
+
+def db_config():
+    """数据库连接参数"""
+    return {
+        'host': Config.DB_HOST,
+        'user': Config.DB_USER,
+        'password': Config.DB_PASSWORD,
+        'database': Config.DB_DATABASE,
+        'charset': 'utf8mb4',
+        'collation': 'utf8mb4_unicode_ci'
+    }
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """获取进程内唯一的连接池"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(
+                    db_config(),
+                    min_size=Config.DB_POOL_MIN_SIZE,
+                    max_size=Config.DB_POOL_MAX_SIZE,
+                    timeout=Config.DB_POOL_TIMEOUT,
+                    prepared=Config.DB_PREPARED_STATEMENTS,
+                    statement_cache_size=Config.DB_STATEMENT_CACHE_SIZE,
+                )
+    return _pool
+
+
+def _before_fork():
+    # 父进程的空闲连接不带进子进程
+    if _pool is not None:
+        _pool.close_idle()
+
+
+def _after_fork_in_child():
+    global _pool_lock
+    _pool_lock = threading.Lock()
+    if _pool is not None:
+        _pool.reset_after_fork()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(before=_before_fork, after_in_child=_after_fork_in_child)
@@ -0,0 +1,260 @@
+import contextvars
+import os
+import threading
+import time
+
+from mysql.connector import Error
+from config import Config
+from models.pool import ConnectionPool, PoolExhaustedError, db_config
+
+# 进程内记录的最近写入用户数超过该值时清理过期项
+RECENT_WRITES_PRUNE_AT = 10000
+
+# 当前请求的读己之写状态：[会话中的主库固定截止时间, 本请求是否写入]
+_request_state = contextvars.ContextVar('read_your_writes', default=None)
+
+
+def begin_request(primary_until=None):
+    """请求开始：带入会话中记录的主库固定截止时间（跨 worker 生效）"""
+    _request_state.set([primary_until or 0, False])
+
+
+def end_request(window):
+    """请求结束：本请求有写入时返回新的主库固定截止时间，供写回会话"""
+    state = _request_state.get()
+    _request_state.set(None)
+    if state and state[1]:
+        return time.time() + window
+    return None
+
+
+class Replica:
+    """一个从库及其健康状态"""
+
+    def __init__(self, name, pool):
+        self.name = name
+        self.pool = pool
+        self.healthy = True
+        self.next_check = 0.0
+        self.lag = None
+        self.error = None
+        self.reads = 0
+        self.failures = 0
+
+
+class ReplicaRouter:
+    """只读查询的从库路由
+
+    - 健康的从库之间轮询；取连接失败的从库标记为不可用，check_interval 秒后再试
+    - max_lag 大于 0 时每隔 check_interval 秒检查复制延迟，超过的从库暂不使用
+      （需要 REPLICATION CLIENT 权限）
+    - 读己之写：用户写入后 window 秒内的读请求走主库。进程内按 user_id 记录，
+      并通过 begin_request / end_request 写入会话，其他 worker 同样生效
+    - 没有可用从库时返回 None，调用方改用主库
+    """
+
+    def __init__(self, replicas, check_interval=5.0, max_lag=0, window=5.0):
+        self.replicas = [Replica(name, pool) for name, pool in replicas]
+        self.check_interval = check_interval
+        self.max_lag = max_lag
+        self.window = window
+        self._init_state()
+
+    def _init_state(self):
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+        self._next = 0
+        self._recent_writes = {}  # user_id -> 写入时间
+        self._stats = {
+            'replica_reads': 0,
+            'pinned_reads': 0,
+            'fallback_reads': 0,
+        }
+
+    def reset_after_fork(self):
+        self._init_state()
+        for replica in self.replicas:
+            replica.pool.reset_after_fork()
+
+    def close_idle(self):
+        for replica in self.replicas:
+            replica.pool.close_idle()
+
+    # ---- 读己之写 ----
+
+    def note_write(self, user_id):
+        """用户写入已提交"""
+        now = time.time()
+        with self._lock:
+            self._recent_writes[user_id] = now
+            if len(self._recent_writes) > RECENT_WRITES_PRUNE_AT:
+                cutoff = now - self.window
+                self._recent_writes = {
+                    uid: at for uid, at in self._recent_writes.items() if at > cutoff}
+        state = _request_state.get()
+        if state is not None:
+            state[1] = True
+
+    def is_pinned(self, user_id):
+        """该用户的读请求是否需要走主库"""
+        now = time.time()
+        state = _request_state.get()
+        if state is not None and state[0] > now:
+            return True
+        with self._lock:
+            written_at = self._recent_writes.get(user_id)
+        return written_at is not None and now - written_at < self.window
+
+    # ---- 从库选择 ----
+
+    def _mark_down(self, replica, error):
+        with self._lock:
+            replica.healthy = False
+            replica.error = str(error)
+            replica.failures += 1
+            replica.next_check = time.monotonic() + self.check_interval
+        print(f"从库 {replica.name} 不可用: {error}")
+
+    def _check_lag(self, replica, connection):
+        """检查复制延迟，返回是否可用"""
+        cursor = connection.cursor(dictionary=True)
+        try:
+            cursor.execute("SHOW REPLICA STATUS")
+            status = cursor.fetchone()
+        finally:
+            cursor.close()
+        lag = status.get('Seconds_Behind_Source') if status else None
+        replica.lag = lag
+        if lag is None:
+            raise Error(msg="复制未运行")
+        return lag <= self.max_lag
+
+    def get_connection(self, user_id):
+        """按轮询取一个健康从库的连接；用户在读己之写窗口内或没有可用从库时返回 None"""
+        if self._pid != os.getpid():
+            self.reset_after_fork()
+        if user_id is not None and self.is_pinned(user_id):
+            with self._lock:
+                self._stats['pinned_reads'] += 1
+            return None
+
+        with self._lock:
+            start = self._next
+            self._next = (self._next + 1) % len(self.replicas)
+
+        for offset in range(len(self.replicas)):
+            replica = self.replicas[(start + offset) % len(self.replicas)]
+            now = time.monotonic()
+            if not replica.healthy and now < replica.next_check:
+                continue
+            check_due = now >= replica.next_check
+            try:
+                connection = replica.pool.get_connection()
+            except PoolExhaustedError:
+                # 从库繁忙不代表不可用，换下一个
+                continue
+            except Error as e:
+                self._mark_down(replica, e)
+                continue
+
+            if check_due:
+                try:
+                    usable = self._check_lag(replica, connection) if self.max_lag > 0 else True
+                except Error as e:
+                    connection.close()
+                    self._mark_down(replica, e)
+                    continue
+                with self._lock:
+                    replica.next_check = now + self.check_interval
+                    replica.healthy = usable
+                    replica.error = None if usable else f"复制延迟 {replica.lag}s"
+                if not usable:
+                    connection.close()
+                    continue
+
+            with self._lock:
+                replica.reads += 1
+                self._stats['replica_reads'] += 1
+            return connection
+
+        with self._lock:
+            self._stats['fallback_reads'] += 1
+        return None
+
+    def stats(self):
+        """路由与各从库指标"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['pinned_users'] = len(self._recent_writes)
+            replicas = [{
+                'name': replica.name,
+                'healthy': replica.healthy,
+                'lag': replica.lag,
+                'error': replica.error,
+                'reads': replica.reads,
+                'failures': replica.failures,
+            } for replica in self.replicas]
+        for replica, info in zip(self.replicas, replicas):
+            info['pool'] = replica.pool.stats()
+        stats.update({
+            'window': self.window,
+            'max_lag': self.max_lag,
+            'replicas': replicas,
+        })
+        return stats
+
+
+def replica_config(address):
+    """'host[:port]' -> 从库连接参数（账号、库名与主库相同，可单独覆盖账号）"""
+    config = db_config()
+    host, _, port = address.strip().partition(':')
+    config['host'] = host
+    if port:
+        config['port'] = int(port)
+    config['user'] = Config.DB_REPLICA_USER or config['user']
+    config['password'] = Config.DB_REPLICA_PASSWORD or config['password']
+    return config
+
+
+_router = None
+_router_lock = threading.Lock()
+
+
+def get_replica_router():
+    """按配置创建进程内唯一的从库路由；未配置从库或非 MySQL 后端时返回 None"""
+    global _router
+    if not Config.DB_REPLICAS or Config.DB_BACKEND != 'mysql':
+        return None
+    if _router is None:
+        with _router_lock:
+            if _router is None:
+                _router = ReplicaRouter(
+                    [(address, ConnectionPool(
+                        replica_config(address),
+                        min_size=0,
+                        max_size=Config.DB_REPLICA_POOL_MAX_SIZE,
+                        timeout=Config.DB_REPLICA_POOL_TIMEOUT,
+                        prepared=Config.DB_PREPARED_STATEMENTS,
+                        statement_cache_size=Config.DB_STATEMENT_CACHE_SIZE,
+                    )) for address in Config.DB_REPLICAS],
+                    check_interval=Config.DB_REPLICA_CHECK_INTERVAL,
+                    max_lag=Config.DB_REPLICA_MAX_LAG,
+                    window=Config.READ_YOUR_WRITES_SECONDS,
+                )
+    return _router
+
+
+def _before_fork():
+    if _router is not None:
+        _router.close_idle()
+
+
+def _after_fork_in_child():
+    global _router_lock
+    _router_lock = threading.Lock()
+    if _router is not None:
+        _router.reset_after_fork()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(before=_before_fork, after_in_child=_after_fork_in_child)
@@ -0,0 +1,667 @@
+import os
+import re
+import sqlite3
+import threading
+import weakref
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+
+from mysql.connector import errors
+from config import Config
+
+# 需要 UPSERT 省略冲突目标（3.35+）和生成列（3.31+）
+MIN_SQLITE_VERSION = (3, 35, 0)
+
+# 与 MySQL 建表语句（DatabaseManager._create_mysql_tables）对应的表结构
+# - AUTO_INCREMENT -> INTEGER PRIMARY KEY（对外暴露 id 的表加 AUTOINCREMENT，不复用已删除的 id）
+# - ENUM -> CHECK 约束；日期、时间按 ISO 文本存储
+# - SQLite 的索引名全库唯一，统一加表名前缀
+# - ON UPDATE CURRENT_TIMESTAMP 没有对应写法，写入方都会显式更新需要的时间列
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    username VARCHAR(50) NOT NULL UNIQUE,
+    email VARCHAR(100) NOT NULL UNIQUE,
+    password VARCHAR(255) NOT NULL,
+    avatar VARCHAR(500),
+    token VARCHAR(100),
+    created_at TIMESTAMP DEFAULT (DATETIME('now', 'localtime')),
+    last_login TIMESTAMP NULL
+);
+
+CREATE TABLE IF NOT EXISTS learning_items (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INT REFERENCES users(id) ON DELETE CASCADE,
+    type TEXT NOT NULL CHECK (type IN ('word', 'phrase', 'sentence')),
+    english TEXT NOT NULL,
+    chinese TEXT NOT NULL,
+    pronunciation VARCHAR(200),
+    example_en TEXT,
+    example_zh TEXT,
+    audio_path VARCHAR(500),
+    created_at TIMESTAMP DEFAULT (DATETIME('now', 'localtime'))
+);
+CREATE INDEX IF NOT EXISTS idx_learning_items_user_type ON learning_items (user_id, type);
+CREATE INDEX IF NOT EXISTS idx_learning_items_user_created_id ON learning_items (user_id, created_at, id);
+CREATE INDEX IF NOT EXISTS idx_learning_items_user_type_created_id
+    ON learning_items (user_id, type, created_at, id);
+CREATE INDEX IF NOT EXISTS idx_learning_items_user_id ON learning_items (user_id, id);
+
+CREATE TABLE IF NOT EXISTS learning_records (
+    id INTEGER PRIMARY KEY,
+    item_id INT NOT NULL REFERENCES learning_items(id) ON DELETE CASCADE,
+    user_id INT,
+    learned_date DATE NOT NULL,
+    review_count INT DEFAULT 0,
+    correct_count INT DEFAULT 0,
+    wrong_count INT DEFAULT 0,
+    last_review TIMESTAMP DEFAULT (DATETIME('now', 'localtime')),
+    UNIQUE (item_id, learned_date)
+);
+CREATE INDEX IF NOT EXISTS idx_learning_records_learned_date ON learning_records (learned_date);
+CREATE INDEX IF NOT EXISTS idx_learning_records_user_date ON learning_records (user_id, learned_date);
+
+CREATE TABLE IF NOT EXISTS review_items (
+    id INTEGER PRIMARY KEY,
+    item_id INT NOT NULL REFERENCES learning_items(id) ON DELETE CASCADE,
+    user_id INT,
+    added_date TIMESTAMP DEFAULT (DATETIME('now', 'localtime')),
+    reviewed BOOLEAN DEFAULT FALSE,
+    reviewed_date TIMESTAMP NULL,
+    pending TINYINT NULL DEFAULT 1
+);
+CREATE UNIQUE INDEX IF NOT EXISTS uniq_review_items_pending_item ON review_items (item_id, pending);
+CREATE INDEX IF NOT EXISTS idx_review_items_item_reviewed ON review_items (item_id, reviewed);
+CREATE INDEX IF NOT EXISTS idx_review_items_added_date ON review_items (added_date);
+CREATE INDEX IF NOT EXISTS idx_review_items_user_reviewed_added_id
+    ON review_items (user_id, reviewed, added_date, id);
+
+CREATE TABLE IF NOT EXISTS item_counters (
+    user_id INT NOT NULL PRIMARY KEY,
+    word_count INT NOT NULL DEFAULT 0,
+    phrase_count INT NOT NULL DEFAULT 0,
+    sentence_count INT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT (DATETIME('now', 'localtime'))
+);
+
+CREATE TABLE IF NOT EXISTS learning_daily_rollup (
+    user_id INT NOT NULL,
+    learned_date DATE NOT NULL,
+    items_count INT NOT NULL DEFAULT 0,
+    total_reviews INT NOT NULL DEFAULT 0,
+    correct_count INT NOT NULL DEFAULT 0,
+    wrong_count INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, learned_date)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS learning_streaks (
+    user_id INT NOT NULL PRIMARY KEY,
+    current_streak INT NOT NULL DEFAULT 0,
+    longest_streak INT NOT NULL DEFAULT 0,
+    last_active_date DATE NULL
+);
+
+CREATE TABLE IF NOT EXISTS learning_event_keys (
+    user_id INT NOT NULL,
+    idempotency_key VARCHAR(64) NOT NULL,
+    created_at TIMESTAMP DEFAULT (DATETIME('now', 'localtime')),
+    PRIMARY KEY (user_id, idempotency_key)
+);
+CREATE INDEX IF NOT EXISTS idx_learning_event_keys_created ON learning_event_keys (created_at);
+
+CREATE TABLE IF NOT EXISTS learning_item_summary (
+    item_id INT NOT NULL PRIMARY KEY REFERENCES learning_items(id) ON DELETE CASCADE,
+    user_id INT,
+    days_count INT NOT NULL DEFAULT 0,
+    review_count INT NOT NULL DEFAULT 0,
+    correct_count INT NOT NULL DEFAULT 0,
+    wrong_count INT NOT NULL DEFAULT 0,
+    first_learned DATE NOT NULL,
+    last_learned DATE NOT NULL,
+    last_review TIMESTAMP NULL
+);
+CREATE INDEX IF NOT EXISTS idx_learning_item_summary_user ON learning_item_summary (user_id);
+
+CREATE TABLE IF NOT EXISTS learning_compaction (
+    id TINYINT NOT NULL PRIMARY KEY,
+    compacted_before DATE NOT NULL,
+    updated_at TIMESTAMP DEFAULT (DATETIME('now', 'localtime'))
+);
+"""
+
+# 查询结果按列名还原类型（SQLite 没有日期类型；本项目的别名与列名保持一致）
+DATE_COLUMNS = frozenset(re.findall(r'^\s+(\w+) DATE\b', SCHEMA, re.M))
+TIMESTAMP_COLUMNS = frozenset(re.findall(r'^\s+(\w+) TIMESTAMP\b', SCHEMA, re.M))
+
+
+# ---- MySQL 方言转换 ----
+#
+# DatabaseManager 只写一份 MySQL 语句，在这里转换为等价的 SQLite 语句：
+#   %s                         -> ?
+#   CURDATE() / NOW() / CURRENT_TIMESTAMP -> 本地时间的 DATE()/DATETIME()
+#   IF / GREATEST / LEAST       -> IIF / MAX / MIN
+#   DATE_SUB(x, INTERVAL n DAY) -> DATE_SUB(x, n)（Python 函数，WEEKDAY/DAYOFMONTH 同）
+#   INSERT IGNORE               -> INSERT OR IGNORE
+#   ON DUPLICATE KEY UPDATE     -> ON CONFLICT DO UPDATE SET，VALUES(col) -> excluded.col
+#   SELECT ... FOR UPDATE       -> 去掉（写事务以 BEGIN IMMEDIATE 开始，整库串行）
+#   DELETE ... LIMIT n          -> 按 rowid 子查询限量
+#   (SELECT ...) UNION ALL (...) -> 每段改为 SELECT * FROM (...)
+#   EXPLAIN                     -> EXPLAIN QUERY PLAN
+#   SET SESSION ...             -> 忽略
+# UPDATE ... JOIN、information_schema 等只用于升级 MySQL 旧表结构的语句不做转换。
+
+
+def _split_call(sql, start):
+    """sql[start] 为左括号，返回 (顶层参数列表, 右括号之后的位置)"""
+    depth = 0
+    args = []
+    begin = start + 1
+    quote = None
+    for i in range(start, len(sql)):
+        ch = sql[i]
+        if quote:
+            if ch == quote:
+                quote = None
+            continue
+        if ch in ("'", '"'):
+            quote = ch
+        elif ch == '(':
+            depth += 1
+        elif ch == ')':
+            depth -= 1
+            if depth == 0:
+                args.append(sql[begin:i])
+                return args, i + 1
+        elif ch == ',' and depth == 1:
+            args.append(sql[begin:i])
+            begin = i + 1
+    raise ValueError(f"括号不匹配: {sql}")
+
+
+def _rewrite_date_sub(sql):
+    """DATE_SUB(x, INTERVAL n DAY) -> DATE_SUB(x, n)，支持嵌套"""
+    pattern = re.compile(r'\bDATE_SUB\s*\(', re.I)
+    out = []
+    pos = 0
+    while True:
+        match = pattern.search(sql, pos)
+        if not match:
+            out.append(sql[pos:])
+            return ''.join(out)
+        args, end = _split_call(sql, match.end() - 1)
+        if len(args) != 2:
+            raise ValueError(f"DATE_SUB 参数个数不对: {sql}")
+        value = _rewrite_date_sub(args[0].strip())
+        interval = re.fullmatch(r'\s*INTERVAL\s+(.+?)\s+DAY\s*', args[1], re.I | re.S)
+        if not interval:
+            raise ValueError(f"只支持按天的 INTERVAL: {args[1]}")
+        days = _rewrite_date_sub(interval.group(1))
+        out.append(f"{sql[pos:match.start()]}DATE_SUB({value}, ({days}))")
+        pos = end
+
+
+_DELETE_LIMIT = re.compile(r'^\s*DELETE\s+FROM\s+(\w+)\s+WHERE\s+(.+?)\s+LIMIT\s+(\S+)\s*$', re.I | re.S)
+_SUBSTITUTIONS = [
+    (re.compile(r'\bCURDATE\(\)', re.I), "DATE('now', 'localtime')"),
+    (re.compile(r'\bNOW\(\)', re.I), "DATETIME('now', 'localtime')"),
+    (re.compile(r'\bCURRENT_TIMESTAMP\b', re.I), "DATETIME('now', 'localtime')"),
+    (re.compile(r'\bIF\s*\(', re.I), 'IIF('),
+    (re.compile(r'\bGREATEST\s*\(', re.I), 'MAX('),
+    (re.compile(r'\bLEAST\s*\(', re.I), 'MIN('),
+    (re.compile(r'\bINSERT\s+IGNORE\b', re.I), 'INSERT OR IGNORE'),
+    (re.compile(r'\s+FOR\s+UPDATE\b', re.I), ''),
+]
+_ON_DUPLICATE = re.compile(r'\bON\s+DUPLICATE\s+KEY\s+UPDATE\b', re.I)
+_VALUES_REF = re.compile(r'\bVALUES\s*\(\s*(\w+)\s*\)', re.I)
+
+
+@lru_cache(maxsize=1024)
+def translate(sql):
+    """MySQL 语句 -> (SQLite 语句, 是否为 upsert)；无需执行的语句返回 (None, False)"""
+    text = sql.strip()
+    head = text[:20].upper()
+    if head.startswith('SET SESSION'):
+        # 会话变量（如导出的 net_write_timeout）在 SQLite 中没有对应
+        return None, False
+    if head.startswith('EXPLAIN'):
+        inner, _ = translate(text[len('EXPLAIN'):])
+        return f"EXPLAIN QUERY PLAN {inner}", False
+
+    if text.startswith('(') and re.search(r'\)\s+UNION\s+ALL\s+\(', text, re.I):
+        # SQLite 的复合查询各段不能带括号（也不能单独 ORDER BY / LIMIT），包成子查询
+        text = 'SELECT * FROM ' + re.sub(r'\)\s+UNION\s+ALL\s+\(', ') UNION ALL SELECT * FROM (', text, flags=re.I)
+
+    delete = _DELETE_LIMIT.match(text)
+    if delete:
+        table, where, limit = delete.groups()
+        text = f"DELETE FROM {table} WHERE rowid IN (SELECT rowid FROM {table} WHERE {where} LIMIT {limit})"
+
+    text = _rewrite_date_sub(text)
+    for pattern, replacement in _SUBSTITUTIONS:
+        text = pattern.sub(replacement, text)
+
+    upsert = False
+    match = _ON_DUPLICATE.search(text)
+    if match:
+        upsert = True
+        updates = _VALUES_REF.sub(r'excluded.\1', text[match.end():])
+        text = f"{text[:match.start()]}ON CONFLICT DO UPDATE SET{updates}"
+
+    return text.replace('%s', '?'), upsert
+
+
+# ---- MySQL 专有函数 ----
+
+def _parse_temporal(value):
+    if isinstance(value, str) and len(value) > 10:
+        return datetime.fromisoformat(value)
+    return date.fromisoformat(value)
+
+
+def _date_sub(value, days):
+    if value is None or days is None:
+        return None
+    result = _parse_temporal(value) - timedelta(days=days)
+    return result.isoformat(' ') if isinstance(result, datetime) else result.isoformat()
+
+
+def _weekday(value):
+    return None if value is None else _parse_temporal(value).weekday()
+
+
+def _dayofmonth(value):
+    return None if value is None else _parse_temporal(value).day
+
+
+# ---- 参数、结果类型与异常 ----
+
+def _adapt(params):
+    if params is None:
+        return ()
+    if isinstance(params, dict):
+        raise errors.ProgrammingError(msg="SQLite 后端只支持位置参数 %s")
+    return [
+        value.isoformat(' ') if isinstance(value, datetime)
+        else value.isoformat() if isinstance(value, date)
+        else value
+        for value in params
+    ]
+
+
+def _converters(description):
+    """按列名返回 [(列序号, 转换函数)]"""
+    converters = []
+    for index, column in enumerate(description or ()):
+        name = column[0]
+        if name in DATE_COLUMNS:
+            converters.append((index, date.fromisoformat))
+        elif name in TIMESTAMP_COLUMNS:
+            converters.append((index, datetime.fromisoformat))
+    return converters
+
+
+_ERRORS = (
+    (sqlite3.IntegrityError, errors.IntegrityError),
+    (sqlite3.OperationalError, errors.OperationalError),
+    (sqlite3.ProgrammingError, errors.ProgrammingError),
+    (sqlite3.NotSupportedError, errors.NotSupportedError),
+)
+
+
+def _wrap_error(e):
+    """转为 mysql.connector 的异常类型，DatabaseManager 的 except Error 照常生效"""
+    for sqlite_type, mysql_type in _ERRORS:
+        if isinstance(e, sqlite_type):
+            return mysql_type(msg=str(e))
+    return errors.DatabaseError(msg=str(e))
+
+
+class SQLiteCursor:
+    """按 mysql.connector 游标接口包装的 SQLite 游标
+
+    - 执行前转换 MySQL 方言，日期参数转为 ISO 文本，结果按列名还原日期类型
+    - dictionary=True 时返回字典行
+    - upsert 的 rowcount 与 MySQL 一致：新插入计 1，更新计 2
+    """
+
+    def __init__(self, connection, dictionary=False):
+        self._connection = connection
+        self._cursor = connection.raw.cursor()
+        self._dictionary = dictionary
+        self._converters = []
+        self._columns = None
+        self.rowcount = -1
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    @property
+    def lastrowid(self):
+        return self._cursor.lastrowid
+
+    def _run(self, method, operation, params):
+        sql, upsert = translate(operation)
+        self._converters = []
+        self._columns = None
+        if sql is None:
+            self.rowcount = 0
+            return
+        self._connection.inserts.value = 0
+        try:
+            method(sql, params)
+        except sqlite3.Error as e:
+            raise _wrap_error(e) from e
+        self.rowcount = self._cursor.rowcount
+        if upsert:
+            inserted = self._connection.inserts.value
+            self.rowcount = inserted + 2 * (self.rowcount - inserted)
+        if self._cursor.description:
+            self._converters = _converters(self._cursor.description)
+            self._columns = [column[0] for column in self._cursor.description]
+
+    def execute(self, operation, params=None):
+        self._run(self._cursor.execute, operation, _adapt(params))
+
+    def executemany(self, operation, seq_params):
+        self._run(self._cursor.executemany, operation, [_adapt(params) for params in seq_params])
+
+    def _row(self, row):
+        if self._converters:
+            row = list(row)
+            for index, convert in self._converters:
+                if isinstance(row[index], str):
+                    row[index] = convert(row[index])
+            row = tuple(row)
+        return dict(zip(self._columns, row)) if self._dictionary else row
+
+    def _fetch(self, method, *args):
+        try:
+            return method(*args)
+        except sqlite3.Error as e:
+            raise _wrap_error(e) from e
+
+    def fetchone(self):
+        row = self._fetch(self._cursor.fetchone)
+        return None if row is None else self._row(row)
+
+    def fetchmany(self, size=1):
+        return [self._row(row) for row in self._fetch(self._cursor.fetchmany, size)]
+
+    def fetchall(self):
+        return [self._row(row) for row in self._fetch(self._cursor.fetchall)]
+
+    def __iter__(self):
+        return iter(self.fetchone, None)
+
+    def close(self):
+        self._cursor.close()
+
+
+class InsertCounter:
+    """临时触发器调用的插入计数（不引用连接，避免 连接 -> 函数 -> 连接 的循环引用）"""
+
+    __slots__ = ('value',)
+
+    def __init__(self):
+        self.value = 0
+
+    def increment(self):
+        self.value += 1
+
+
+class SQLiteConnection:
+    """线程独占的物理连接"""
+
+    def __init__(self, raw):
+        self.raw = raw
+        self.inserts = InsertCounter()
+        self.checkouts = 0
+
+
+class PooledSQLiteConnection:
+    """按 mysql.connector 连接接口包装的 SQLite 连接（同线程的多次获取共用一个物理连接）"""
+
+    def __init__(self, pool, cnx):
+        self._pool = pool
+        self._cnx = cnx
+
+    def _check(self):
+        if self._cnx is None:
+            raise errors.PoolError("连接已归还连接池")
+        return self._cnx
+
+    @property
+    def connection_id(self):
+        return id(self._check().raw)
+
+    @property
+    def in_transaction(self):
+        return self._check().raw.in_transaction
+
+    def cursor(self, dictionary=False, buffered=None, prepared=None):
+        # SQLite 游标本就按需逐行读取，语句由 sqlite3 自带的语句缓存复用
+        return SQLiteCursor(self._check(), dictionary=dictionary)
+
+    def execute_prepared(self, sql, params=None):
+        cursor = self.cursor()
+        cursor.execute(sql, params)
+        return cursor
+
+    def start_transaction(self):
+        # 事务开始即取写锁，之后的读（原 FOR UPDATE）不会与其他写事务交错
+        cnx = self._check()
+        if not cnx.raw.in_transaction:
+            self._execute(cnx, "BEGIN IMMEDIATE")
+
+    def commit(self):
+        self._execute(self._check(), None, 'commit')
+
+    def rollback(self):
+        self._execute(self._check(), None, 'rollback')
+
+    @staticmethod
+    def _execute(cnx, sql, method=None):
+        try:
+            if method:
+                getattr(cnx.raw, method)()
+            else:
+                cnx.raw.execute(sql)
+        except sqlite3.Error as e:
+            raise _wrap_error(e) from e
+
+    def ping(self, reconnect=False, attempts=1, delay=0):
+        pass
+
+    def is_connected(self):
+        return self._cnx is not None
+
+    def close(self):
+        if self._cnx is not None:
+            cnx, self._cnx = self._cnx, None
+            self._pool.release(cnx)
+
+    def discard(self):
+        if self._cnx is not None:
+            cnx, self._cnx = self._cnx, None
+            self._pool.release(cnx, discard=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class SQLitePool:
+    """嵌入式 SQLite 存储后端，接口与 ConnectionPool 相同
+
+    - 每个线程一个物理连接（WAL 下读写互不阻塞，写事务整库串行）
+    - 连接建立时设置 WAL、synchronous=NORMAL 等参数并确保表结构存在
+    - 同一线程内嵌套获取连接时共用物理连接，最外层归还时回滚未提交的事务
+    """
+
+    dialect = 'sqlite'
+
+    def __init__(self, path, timeout=5.0, cache_mb=64, mmap_mb=256):
+        if sqlite3.sqlite_version_info < MIN_SQLITE_VERSION:
+            raise errors.NotSupportedError(
+                msg=f"SQLite 版本过低（{sqlite3.sqlite_version}），需要 3.35 以上")
+        self.path = path
+        self.db_config = {'database': path}
+        self.timeout = timeout
+        self.cache_mb = cache_mb
+        self.mmap_mb = mmap_mb
+        # 与 ConnectionPool 保持相同的属性；sqlite3 自带语句缓存
+        self.prepared = False
+        self._init_state()
+
+    def _init_state(self):
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        # 线程结束后其连接随 threading.local 回收，这里只做弱引用计数
+        self._connections = weakref.WeakSet()
+        self._schema_ready = False
+        self._stats = {
+            'checkouts': 0,
+            'created': 0,
+            'discarded': 0,
+        }
+
+    def create_database(self):
+        """建立数据库文件所在目录（文件在首次连接时创建）"""
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+
+    def _connect(self):
+        try:
+            raw = sqlite3.connect(self.path, timeout=self.timeout, cached_statements=256)
+            raw.execute("PRAGMA journal_mode = WAL")
+            raw.execute("PRAGMA synchronous = NORMAL")
+            raw.execute("PRAGMA foreign_keys = ON")
+            raw.execute("PRAGMA temp_store = MEMORY")
+            raw.execute(f"PRAGMA cache_size = {-self.cache_mb * 1024}")
+            raw.execute(f"PRAGMA mmap_size = {self.mmap_mb * 1024 * 1024}")
+            if not self._schema_ready:
+                raw.executescript(SCHEMA)
+                self._schema_ready = True
+        except sqlite3.Error as e:
+            raise _wrap_error(e) from e
+
+        cnx = SQLiteConnection(raw)
+        raw.create_function('DATE_SUB', 2, _date_sub, deterministic=True)
+        raw.create_function('WEEKDAY', 1, _weekday, deterministic=True)
+        raw.create_function('DAYOFMONTH', 1, _dayofmonth, deterministic=True)
+        # 新插入的行由临时触发器计数，用于还原 upsert 的 MySQL 式 rowcount
+        raw.create_function('_count_insert', 0, cnx.inserts.increment)
+        tables = [row[0] for row in raw.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'")]
+        for table in tables:
+            raw.execute(f"""
+                CREATE TEMP TRIGGER IF NOT EXISTS count_insert_{table}
+                AFTER INSERT ON main.{table} BEGIN SELECT _count_insert(); END
+            """)
+        with self._lock:
+            self._stats['created'] += 1
+            self._connections.add(cnx)
+        return cnx
+
+    def _check_pid(self):
+        # fork 出的子进程不能沿用父进程的 SQLite 连接
+        if self._pid != os.getpid():
+            self.reset_after_fork()
+
+    def reset_after_fork(self):
+        self._init_state()
+
+    def prefill(self):
+        """建立当前线程的连接（同时建表），数据库不可用时尽早报错"""
+        self.get_connection().close()
+
+    def get_connection(self, timeout=None):
+        self._check_pid()
+        cnx = getattr(self._local, 'cnx', None)
+        if cnx is None:
+            cnx = self._local.cnx = self._connect()
+        cnx.checkouts += 1
+        with self._lock:
+            self._stats['checkouts'] += 1
+        return PooledSQLiteConnection(self, cnx)
+
+    def release(self, cnx, discard=False):
+        """归还连接：最外层归还时回滚未提交的事务；discard 时断开"""
+        if self._pid != os.getpid():
+            return
+        cnx.checkouts -= 1
+        healthy = not discard
+        if healthy and cnx.checkouts == 0:
+            try:
+                if cnx.raw.in_transaction:
+                    cnx.raw.rollback()
+            except sqlite3.Error:
+                healthy = False
+        if healthy:
+            return
+
+        if getattr(self._local, 'cnx', None) is cnx:
+            self._local.cnx = None
+        with self._lock:
+            self._connections.discard(cnx)
+            self._stats['discarded'] += 1
+        try:
+            cnx.raw.close()
+        except sqlite3.Error:
+            pass
+
+    def close_idle(self):
+        """关闭当前线程的连接（其他线程的连接随线程结束回收）"""
+        cnx = getattr(self._local, 'cnx', None)
+        if cnx is not None and cnx.checkouts == 0:
+            self._local.cnx = None
+            with self._lock:
+                self._connections.discard(cnx)
+            cnx.raw.close()
+
+    def stats(self):
+        """连接指标"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats.update({
+                'pid': self._pid,
+                'dialect': self.dialect,
+                'path': self.path,
+                'open': len(self._connections),
+                'sqlite_version': sqlite3.sqlite_version,
+            })
+        return stats
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_sqlite_pool():
+    """获取进程内唯一的 SQLite 后端"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = SQLitePool(
+                    Config.SQLITE_PATH,
+                    timeout=Config.DB_POOL_TIMEOUT,
+                    cache_mb=Config.SQLITE_CACHE_MB,
+                    mmap_mb=Config.SQLITE_MMAP_MB,
+                )
+    return _pool
+
+
+def _after_fork_in_child():
+    global _pool_lock
+    _pool_lock = threading.Lock()
+    if _pool is not None:
+        _pool.reset_after_fork()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
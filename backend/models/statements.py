@@ -0,0 +1,91 @@
+from collections import OrderedDict
+
+from mysql.connector import Error, errorcode
+
+
+class StatementCache:
+    """单个连接上的服务端预处理语句缓存
+
+    每条 SQL 对应一个 prepared 游标（游标内保存语句句柄），按 LRU 淘汰。
+    连接重连后服务端句柄全部失效：按 connection_id 检测并整体丢弃，
+    下次执行时重新 prepare。
+
+    mysql-connector 的 prepared 游标按对象身份判断是否是同一条语句
+    （operation is not self._executed 时重新 prepare），而调用方常用 f-string
+    每次拼出内容相同的新字符串，所以缓存项同时保存首次 prepare 时的 SQL 对象，
+    执行时总是传入这个对象。
+    """
+
+    def __init__(self, cnx, max_size=32):
+        self._cnx = cnx
+        self.max_size = max_size
+        self._cursors = OrderedDict()  # sql -> (游标, prepare 时的 sql 对象)
+        self._connection_id = None
+        self.prepares = 0
+        self.hits = 0
+
+    def _check_connection(self):
+        connection_id = self._cnx.connection_id
+        if connection_id != self._connection_id:
+            # 旧句柄随旧会话一起失效，无需也无法 DEALLOCATE
+            self._cursors.clear()
+            self._connection_id = connection_id
+
+    def _entry(self, sql):
+        self._check_connection()
+        entry = self._cursors.get(sql)
+        if entry is not None:
+            self._cursors.move_to_end(sql)
+            self.hits += 1
+            return entry
+
+        entry = self._cursors[sql] = (self._cnx.cursor(prepared=True), sql)
+        self.prepares += 1
+        if len(self._cursors) > self.max_size:
+            _, (evicted, _) = self._cursors.popitem(last=False)
+            self._close(evicted)
+        return entry
+
+    def cursor(self, sql):
+        """取 sql 对应的 prepared 游标"""
+        return self._entry(sql)[0]
+
+    def discard(self, sql):
+        entry = self._cursors.pop(sql, None)
+        if entry is not None:
+            self._close(entry[0])
+
+    @staticmethod
+    def _close(cursor):
+        try:
+            cursor.close()
+        except Error:
+            pass
+
+    def execute(self, sql, params=None):
+        """执行预处理语句，句柄失效时重新 prepare 一次"""
+        cursor, sql = self._entry(sql)
+        try:
+            cursor.execute(sql, params or ())
+        except Error as e:
+            if e.errno != errorcode.ER_UNKNOWN_STMT_HANDLER:
+                raise
+            self._cursors.pop(sql, None)
+            cursor, sql = self._entry(sql)
+            cursor.execute(sql, params or ())
+        return cursor
+
+
+def fetch_dicts(cursor):
+    """取完结果并转成字典行（prepared 游标不支持 dictionary=True）"""
+    rows = cursor.fetchall()
+    if not cursor.description:
+        return []
+    columns = [column[0] for column in cursor.description]
+    return [dict(zip(columns, row)) for row in rows]
+
+
+def fetch_dict(cursor):
+    """取第一行字典；总是取完结果，避免连接上残留未读结果"""
+    rows = fetch_dicts(cursor)
+    return rows[0] if rows else None
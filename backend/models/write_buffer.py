@@ -0,0 +1,171 @@
+import atexit
+import fcntl
+import json
+import os
+import threading
+from datetime import date
+from pathlib import Path
+
+
+class LearningWriteBuffer:
+    """学习记录的写缓冲（write-behind）
+
+    答题事件先按 (user_id, item_id, 日期) 在进程内合并，达到 max_events 条或每隔
+    flush_interval 秒由后台线程调用 flush_fn 批量写库。
+
+    设置 log_dir 后每条事件同时追加到本进程的日志文件（持有 flock），
+    写库成功后删除；进程异常退出留下的日志由下一个启动的进程接管重放。
+    """
+
+    def __init__(self, flush_fn, max_events=500, flush_interval=2.0, log_dir=None):
+        self.flush_fn = flush_fn
+        self.max_events = max_events
+        self.flush_interval = flush_interval
+        self.log_dir = Path(log_dir) if log_dir else None
+        self._pid = None
+        self._started = False
+        self._start_lock = threading.Lock()
+        atexit.register(self.flush)
+
+    def _init_state(self):
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._events = {}  # (user_id, item_id, date) -> [reviews, correct, wrong]
+        self._count = 0
+        self._log = None
+        self._started = False
+
+    def _ensure_started(self):
+        # 子进程不继承父进程的缓冲和线程，首次使用时再启动
+        if self._started and self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._started and self._pid == os.getpid():
+                return
+            self._init_state()
+            if self.log_dir:
+                self.log_dir.mkdir(parents=True, exist_ok=True)
+                self._recover_orphans()
+                self._log = self._open_log()
+                # 接管的事件记入本进程日志
+                for (user_id, item_id, learned_date), counts in self._events.items():
+                    self._write_log(user_id, item_id, learned_date, *counts)
+            threading.Thread(target=self._run, name='learning-write-buffer', daemon=True).start()
+            self._started = True
+
+    def _log_path(self, suffix):
+        return self.log_dir / f"{self._pid}.{suffix}"
+
+    def _open_log(self):
+        """先以临时名建好并加锁，再改名为正式日志，避免被其他进程误接管"""
+        tmp = self._log_path('tmp')
+        log = open(tmp, 'w', encoding='utf-8')
+        fcntl.flock(log, fcntl.LOCK_EX)
+        os.replace(tmp, self._log_path('log'))
+        return log
+
+    def _write_log(self, user_id, item_id, learned_date, reviews, correct, wrong):
+        self._log.write(json.dumps([user_id, item_id, learned_date.isoformat(), reviews, correct, wrong]) + '\n')
+        self._log.flush()
+
+    def _recover_orphans(self):
+        """接管已退出进程遗留的日志（含同 pid 的上一个进程）"""
+        for path in sorted(self.log_dir.glob('*.log')) + sorted(self.log_dir.glob('*.flushing')):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    try:
+                        fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    except OSError:
+                        # 属主进程仍在运行
+                        continue
+                    if os.fstat(f.fileno()).st_nlink == 0:
+                        # 拿到锁之前已被属主写库并删除
+                        continue
+                    lines = f.readlines()
+                    for line in lines:
+                        try:
+                            user_id, item_id, learned_date, reviews, correct, wrong = json.loads(line)
+                        except ValueError:
+                            # 包括旧格式（无 user_id）的日志行
+                            continue
+                        self._merge(user_id, item_id, date.fromisoformat(learned_date), reviews, correct, wrong)
+                    path.unlink()
+                print(f"已接管写缓冲日志 {path.name}（{len(lines)} 条）")
+            except OSError as e:
+                print(f"接管写缓冲日志失败 {path.name}: {e}")
+
+    def _merge(self, user_id, item_id, learned_date, reviews, correct, wrong):
+        with self._lock:
+            counts = self._events.setdefault((user_id, item_id, learned_date), [0, 0, 0])
+            counts[0] += reviews
+            counts[1] += correct
+            counts[2] += wrong
+            self._count += reviews
+            if self._log:
+                self._write_log(user_id, item_id, learned_date, reviews, correct, wrong)
+            return self._count
+
+    def add(self, user_id, item_id, is_correct, learned_date=None):
+        """追加一条答题事件"""
+        self._ensure_started()
+        correct = 1 if is_correct else 0
+        count = self._merge(user_id, item_id, learned_date or date.today(), 1, correct, 1 - correct)
+        if count >= self.max_events:
+            self._wakeup.set()
+
+    def pending(self, user_id, learned_date=None):
+        """用户未写库的事件 {item_id: [reviews, correct, wrong]}，仅本进程可见"""
+        if not self._started or self._pid != os.getpid():
+            return {}
+        learned_date = learned_date or date.today()
+        with self._lock:
+            return {item_id: list(counts) for (uid, item_id, d), counts in self._events.items()
+                    if uid == user_id and d == learned_date}
+
+    def flush(self):
+        """立即写库"""
+        if not self._started or self._pid != os.getpid():
+            return True
+
+        with self._flush_lock:
+            with self._lock:
+                if not self._events:
+                    return True
+                events, self._events = self._events, {}
+                self._count = 0
+                flushing = None
+                if self._log:
+                    # 轮换日志：旧日志改名后仍持有锁，写库结束后删除
+                    flushing = self._log_path('flushing')
+                    os.replace(self._log_path('log'), flushing)
+                    old_log, self._log = self._log, self._open_log()
+
+            ok = False
+            try:
+                ok = self.flush_fn(events)
+            except Exception as e:
+                print(f"写缓冲刷新出错: {e}")
+
+            if not ok:
+                # 写库失败，事件放回缓冲并重新记入新日志
+                for (user_id, item_id, learned_date), (reviews, correct, wrong) in events.items():
+                    self._merge(user_id, item_id, learned_date, reviews, correct, wrong)
+            if flushing:
+                # 先删除再释放锁
+                flushing.unlink()
+                old_log.close()
+            return ok
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+
+    def stats(self):
+        if not self._started or self._pid != os.getpid():
+            return {'pending_events': 0, 'pending_keys': 0}
+        with self._lock:
+            return {'pending_events': self._count, 'pending_keys': len(self._events)}
@@ -0,0 +1,20 @@
+"""从每日汇总（learning_daily_rollup）回填连续学习状态（learning_streaks）
+
+用法（在 backend 目录下）：
+    python -m scripts.backfill_streaks
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.database import get_db  # noqa: E402
+
+
+def main():
+    if not get_db().rebuild_streaks():
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
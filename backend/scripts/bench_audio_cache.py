@@ -0,0 +1,129 @@
+"""音频接口各缓存层的命中率与服务延迟
+
+在进程内启动 TTS 替身服务（见 fake_tts_server），用 Flask 测试客户端按 Zipf 分布播放单词
+（少数入门词占大部分播放）。与前端一样，每个单词首次播放时 POST /api/audio/generate 取得 URL，
+之后每次播放 GET 该 URL（模拟没有浏览器缓存的播放，即真正到达 Flask 的请求）。
+按响应头 X-Audio-Cache 统计内存层、磁盘层和未命中（首次播放，含合成）的占比与延迟分位。
+每种模式使用独立的临时缓存目录，从冷缓存开始，播放序列相同。
+
+模式：
+    disk    只有磁盘层，文件经 send_file 发送
+    memory  内存热点层 + 磁盘层
+    accel   内存热点层 + 磁盘层，磁盘命中只返回 X-Accel-Redirect（不含 nginx 发送文件的耗时）
+
+用法（在 backend 目录下）：
+    python -m scripts.bench_audio_cache
+    python -m scripts.bench_audio_cache --requests 50000 --words 5000 --zipf 1.2 --memory-mb 16
+"""
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from http.server import ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# 导入 api.audio 时会创建 TTSManager 并扫描缓存目录，不碰正式的 audio_cache
+os.environ['AUDIO_CACHE_DIR'] = tempfile.mkdtemp(prefix='bench_audio_')
+
+from flask import Flask  # noqa: E402
+from config import Config  # noqa: E402
+from api import audio  # noqa: E402
+from scripts.fake_tts_server import make_handler  # noqa: E402
+from utils.tts import TTSManager  # noqa: E402
+
+TIERS = ('memory', 'disk', 'miss')
+
+
+def start_fake_tts(latency_ms, size):
+    handler = make_handler(argparse.Namespace(
+        latency_ms=latency_ms, error_rate=0, fail_first=0, error_status=503, retry_after=None, size=size,
+        verbose=False))
+    server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_address[1]}/cognitiveservices/v1"
+
+
+def zipf_sequence(words, requests, exponent, seed):
+    weights = [1 / (rank + 1) ** exponent for rank in range(words)]
+    return random.Random(seed).choices(range(words), weights, k=requests)
+
+
+def percentile(sorted_values, q):
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * q))] * 1000
+
+
+def run_mode(mode, client, sequence, memory_mb):
+    Config.AUDIO_CACHE_DIR = tempfile.mkdtemp(prefix=f'bench_audio_{mode}_')
+    Config.AUDIO_MEMORY_CACHE_MB = 0 if mode == 'disk' else memory_mb
+    Config.AUDIO_ACCEL_PREFIX = '/_audio/' if mode == 'accel' else ''
+    audio.tts = TTSManager()
+
+    latencies = {tier: [] for tier in TIERS}
+    urls = {}
+    start = time.perf_counter()
+    for word in sequence:
+        began = time.perf_counter()
+        url = urls.get(word)
+        tier = None
+        if url is None:
+            response = client.post('/api/audio/generate', json={'text': f'word{word}'})
+            if response.status_code != 200:
+                raise SystemExit(f"生成失败: {response.status_code} {response.get_data(as_text=True)}")
+            url = urls[word] = response.get_json()['data']['url']
+            tier = 'miss'
+        response = client.get(url)
+        response.get_data()
+        response.close()
+        elapsed = time.perf_counter() - began
+        if response.status_code != 200:
+            raise SystemExit(f"请求失败: {response.status_code} {response.get_data(as_text=True)}")
+        latencies[tier or response.headers['X-Audio-Cache']].append(elapsed)
+    total = time.perf_counter() - start
+
+    everything = sorted(v for values in latencies.values() for v in values)
+    print(f"\n[{mode}] {len(sequence) / total:.0f} req/s  "
+          f"总体 p50={percentile(everything, 0.5):.3f}ms  p99={percentile(everything, 0.99):.3f}ms")
+    for tier in TIERS:
+        values = sorted(latencies[tier])
+        if not values:
+            continue
+        print(f"  {tier:<7} {len(values):>7} 次  {len(values) / len(sequence):7.2%}  "
+              f"p50={percentile(values, 0.5):8.3f}ms  p99={percentile(values, 0.99):8.3f}ms")
+    memory = audio.tts.memory.stats()
+    print(f"  内存层 {memory['entries']} 个 / {memory['bytes'] / 1024 / 1024:.1f} MB，"
+          f"磁盘层 {audio.tts.cache.stats()['files']} 个文件")
+    shutil.rmtree(Config.AUDIO_CACHE_DIR, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--modes', default='disk,memory,accel', help='逗号分隔：disk,memory,accel')
+    parser.add_argument('--requests', type=int, default=20000)
+    parser.add_argument('--words', type=int, default=2000, help='不同单词数')
+    parser.add_argument('--zipf', type=float, default=1.1, help='Zipf 分布指数，越大越集中')
+    parser.add_argument('--size', type=int, default=30 * 1024, help='每个音频的字节数')
+    parser.add_argument('--memory-mb', type=int, default=Config.AUDIO_MEMORY_CACHE_MB)
+    parser.add_argument('--tts-latency-ms', type=float, default=20, help='替身 TTS 服务的合成延迟')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    Config.TTS_ENDPOINT = start_fake_tts(args.tts_latency_ms, args.size)
+    app = Flask(__name__)
+    app.register_blueprint(audio.bp, url_prefix='/api/audio')
+    client = app.test_client()
+
+    sequence = zipf_sequence(args.words, args.requests, args.zipf, args.seed)
+    print(f"{args.requests} 次请求，{args.words} 个单词（实际出现 {len(set(sequence))} 个），"
+          f"Zipf {args.zipf}，音频 {args.size} 字节，内存层 {args.memory_mb} MB")
+    for mode in args.modes.split(','):
+        run_mode(mode, client, sequence, args.memory_mb)
+    shutil.rmtree(os.environ['AUDIO_CACHE_DIR'], ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+"""MySQL 与嵌入式 SQLite 后端在高频接口上的吞吐对比
+
+在各自的基准库中创建同样的用户和内容，依次压测答题、看板、学习列表、
+复习列表、测试抽样和统计对应的 DatabaseManager 方法，输出吞吐与延迟分位。
+结果缓存、写缓冲和查询统计均关闭，只比较存储后端本身。
+
+用法（在 backend 目录下）：
+    python -m scripts.bench_backends                          # 两种后端
+    python -m scripts.bench_backends --backends sqlite        # 没有 MySQL 时只测 SQLite
+    BENCH_DATABASE=english_learning_bench BENCH_SQLITE_PATH=/tmp/bench.db \\
+        python -m scripts.bench_backends --ops 2000 --threads 4 --items 2000
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ['DB_DATABASE'] = os.getenv('BENCH_DATABASE', 'english_learning_bench')
+os.environ['RECORD_WRITE_BEHIND'] = 'False'
+os.environ['QUERY_STATS_ENABLED'] = 'False'
+os.environ['RESULT_CACHE_ENABLED'] = 'False'
+
+from config import Config  # noqa: E402
+from models.database import DatabaseManager  # noqa: E402
+from models.pool import ConnectionPool, db_config  # noqa: E402
+from models.sqlite_backend import SQLitePool  # noqa: E402
+
+BENCH_USERNAME = 'bench_backends'
+BENCH_SQLITE_PATH = os.getenv('BENCH_SQLITE_PATH', os.path.join(tempfile.gettempdir(), 'english_learning_bench.db'))
+
+
+def create_pool(backend, threads):
+    if backend == 'sqlite':
+        return SQLitePool(BENCH_SQLITE_PATH, timeout=Config.DB_POOL_TIMEOUT,
+                          cache_mb=Config.SQLITE_CACHE_MB, mmap_mb=Config.SQLITE_MMAP_MB)
+    return ConnectionPool(db_config(), min_size=threads, max_size=threads,
+                          timeout=Config.DB_POOL_TIMEOUT, prepared=Config.DB_PREPARED_STATEMENTS,
+                          statement_cache_size=Config.DB_STATEMENT_CACHE_SIZE)
+
+
+def prepare_data(db, items):
+    """创建基准用户并补齐 items 条内容，返回 (user_id, item_ids)"""
+    user = db.get_user_by_username(BENCH_USERNAME)
+    user_id = user['id'] if user else db.create_user(BENCH_USERNAME, f'{BENCH_USERNAME}@example.com', '-')
+
+    missing = items - len(list(db.export_items(user_id)))
+    if missing > 0:
+        types = ('word', 'phrase', 'sentence')
+        rows = ((i, (types[i % 3], f'bench{i}', '基准', '', '', '', '')) for i in range(missing))
+        db.add_items_bulk(user_id, rows)
+
+    item_ids = [row[0] for row in db.export_items(user_id)][:items]
+    # 部分内容进入复习库，复习列表和测试抽样都有数据
+    db.add_to_review(user_id, [{'id': item_id} for item_id in random.sample(item_ids, len(item_ids) // 10)])
+    return user_id, item_ids
+
+
+def scenarios(db, user_id, item_ids):
+    return {
+        'record_learning': lambda: db.record_learning(user_id, random.choice(item_ids), random.random() < 0.7),
+        'get_dashboard': lambda: db.get_dashboard(user_id),
+        'get_items_for_learning': lambda: db.get_items_for_learning(user_id, limit=50),
+        'get_review_items': lambda: db.get_review_items(user_id, limit=50),
+        'get_items_for_test': lambda: db.get_items_for_test(user_id, limit=20),
+        'get_statistics': lambda: db.get_statistics(user_id),
+    }
+
+
+def run(fn, ops, threads):
+    """并发执行 ops 次 fn，返回 (耗时秒, 每次延迟列表)"""
+    latencies = []
+    lock = threading.Lock()
+    per_thread = ops // threads
+
+    def worker():
+        local = []
+        for _ in range(per_thread):
+            start = time.perf_counter()
+            fn()
+            local.append(time.perf_counter() - start)
+        with lock:
+            latencies.extend(local)
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    start = time.perf_counter()
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    return time.perf_counter() - start, latencies
+
+
+def summarize(backend, name, elapsed, latencies):
+    latencies = sorted(latencies)
+    p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+    print(f"{backend:<7} {name:<24} {len(latencies) / elapsed:10.1f} ops/s  "
+          f"p50={statistics.median(latencies) * 1000:7.2f}ms  p95={p95 * 1000:7.2f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--backends', default='mysql,sqlite', help='逗号分隔：mysql,sqlite')
+    parser.add_argument('--ops', type=int, default=1000, help='每个接口的调用次数')
+    parser.add_argument('--threads', type=int, default=1)
+    parser.add_argument('--items', type=int, default=1000)
+    args = parser.parse_args()
+
+    for backend in args.backends.split(','):
+        pool = create_pool(backend, args.threads)
+        if backend == 'sqlite':
+            pool.create_database()
+        db = DatabaseManager(pool)
+        user_id, item_ids = prepare_data(db, args.items)
+
+        for name, fn in scenarios(db, user_id, item_ids).items():
+            # 预热连接和语句缓存
+            run(fn, min(100, args.ops), args.threads)
+            summarize(backend, name, *run(fn, args.ops, args.threads))
+        print(f"{backend} 连接: {db.pool_stats()}")
+
+
+if __name__ == '__main__':
+    main()
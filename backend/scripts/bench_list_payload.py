@@ -0,0 +1,80 @@
+"""列表接口的响应体积与内存对比：字典行 + jsonify 与投影后的紧凑行
+
+用合成的 learning_items 行（不连数据库）模拟 500 条的 /api/items/list，
+分别统计响应字节数、构造行和序列化期间的内存峰值、耗时。
+
+用法（在 backend 目录下）：
+    python -m scripts.bench_list_payload
+    python -m scripts.bench_list_payload --rows 500 --fields english,chinese
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask, jsonify  # noqa: E402
+from models.database import ITEM_FIELDS  # noqa: E402
+from utils.rows import make_rows, parse_fields, rows_response  # noqa: E402
+
+
+def synthetic_tuples(n):
+    now = datetime(2024, 1, 1)
+    return [(
+        i, 'sentence', f'This is example sentence number {i} for the learning list.',
+        f'这是学习列表中的第 {i} 个例句。', '/ðɪs ɪz/',
+        f'An additional example sentence that goes with item {i}, usually fairly long.',
+        f'与第 {i} 条内容配套的例句，通常比较长。', f'audio_cache/{i:08d}.mp3',
+        now - timedelta(minutes=i),
+    ) for i in range(n)]
+
+
+def body_size(response):
+    """模拟 WSGI 服务器逐块写出响应体，返回总字节数"""
+    return sum(len(chunk) for chunk in response.response)
+
+
+def measure(label, build, runs=20):
+    start = time.perf_counter()
+    for _ in range(runs):
+        body = build()
+    elapsed = (time.perf_counter() - start) / runs
+
+    # 内存单独测量（tracemalloc 本身会拖慢执行）
+    tracemalloc.start()
+    build()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<28} {body:>9} 字节  峰值内存 {peak / 1024:8.1f} KiB  {elapsed * 1000:7.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=500)
+    parser.add_argument('--fields', default='english,chinese')
+    args = parser.parse_args()
+
+    app = Flask(__name__)
+    tuples = synthetic_tuples(args.rows)
+    fields = parse_fields(args.fields, ITEM_FIELDS, required=('id', 'created_at'))
+    projected = [tuple(row[ITEM_FIELDS.index(f)] for f in fields) for row in tuples]
+
+    with app.app_context():
+        measure('字典行 + jsonify（全部列）', lambda: body_size(jsonify({
+            'success': True,
+            'data': [dict(zip(ITEM_FIELDS, row)) for row in tuples],
+            'next_cursor': None
+        })))
+        measure('紧凑行（全部列）', lambda: body_size(rows_response(
+            make_rows(ITEM_FIELDS, tuples), next_cursor=None)))
+        measure(f'紧凑行（{",".join(fields)}）', lambda: body_size(rows_response(
+            make_rows(fields, projected), next_cursor=None)))
+        measure(f'compact 格式（{",".join(fields)}）', lambda: body_size(rows_response(
+            make_rows(fields, projected), compact=True, next_cursor=None)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+"""答题记录（/api/learning/record 路径）文本协议与服务端预处理语句的吞吐对比
+
+在独立的基准库中创建基准用户和内容，分别以文本协议和预处理语句
+调用 DatabaseManager.record_learning，输出吞吐与延迟分位。
+
+用法（在 backend 目录下）：
+    BENCH_DATABASE=english_learning_bench python -m scripts.bench_prepared_statements
+    python -m scripts.bench_prepared_statements --ops 5000 --threads 4 --items 1000
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ['DB_DATABASE'] = os.getenv('BENCH_DATABASE', 'english_learning_bench')
+# 只比较协议差异：关闭写缓冲和查询统计
+os.environ['RECORD_WRITE_BEHIND'] = 'False'
+os.environ['QUERY_STATS_ENABLED'] = 'False'
+
+from models.database import DatabaseManager  # noqa: E402
+
+BENCH_USERNAME = 'bench_prepared'
+
+
+def prepare_data(db, items):
+    """创建基准用户并补齐 items 条内容，返回 (user_id, item_ids)"""
+    user = db.get_user_by_username(BENCH_USERNAME)
+    user_id = user['id'] if user else db.create_user(BENCH_USERNAME, f'{BENCH_USERNAME}@example.com', '-')
+
+    connection = db.get_connection()
+    cursor = connection.cursor()
+    cursor.execute("SELECT id FROM learning_items WHERE user_id = %s", (user_id,))
+    item_ids = [row[0] for row in cursor.fetchall()]
+    cursor.close()
+    connection.close()
+
+    missing = items - len(item_ids)
+    if missing > 0:
+        rows = ((i, ('word', f'bench{i}', '基准', '', '', '', '')) for i in range(missing))
+        db.add_items_bulk(user_id, rows)
+        return prepare_data(db, items)
+    return user_id, item_ids[:items]
+
+
+def run(db, user_id, item_ids, ops, threads):
+    """并发执行 ops 次 record_learning，返回 (耗时秒, 每次延迟列表)"""
+    latencies = []
+    lock = threading.Lock()
+    per_thread = ops // threads
+
+    def worker():
+        local = []
+        for _ in range(per_thread):
+            start = time.perf_counter()
+            db.record_learning(user_id, random.choice(item_ids), random.random() < 0.7)
+            local.append(time.perf_counter() - start)
+        with lock:
+            latencies.extend(local)
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    start = time.perf_counter()
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    return time.perf_counter() - start, latencies
+
+
+def summarize(label, elapsed, latencies):
+    latencies = sorted(latencies)
+    p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+    print(f"{label:<10} {len(latencies) / elapsed:10.1f} ops/s  "
+          f"p50={statistics.median(latencies) * 1000:7.2f}ms  p95={p95 * 1000:7.2f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--ops', type=int, default=2000)
+    parser.add_argument('--threads', type=int, default=1)
+    parser.add_argument('--items', type=int, default=500)
+    parser.add_argument('--rounds', type=int, default=3, help='两种模式交替运行的轮数')
+    args = parser.parse_args()
+
+    db = DatabaseManager()
+    user_id, item_ids = prepare_data(db, args.items)
+
+    # 预热连接池和语句缓存
+    for prepared in (False, True):
+        db.pool.prepared = prepared
+        run(db, user_id, item_ids, min(200, args.ops), args.threads)
+
+    for round_no in range(1, args.rounds + 1):
+        print(f"第 {round_no} 轮（{args.ops} 次，{args.threads} 线程）")
+        for label, prepared in (('text', False), ('prepared', True)):
+            db.pool.prepared = prepared
+            summarize(label, *run(db, user_id, item_ids, args.ops, args.threads))
+
+    print(f"连接池: {db.pool_stats()}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,133 @@
+"""测试抽样基准：ORDER BY RAND() 与 id 区间探测的延迟对比
+
+在独立的基准库中逐级填充 learning_items（默认 1万 / 100万 / 1000万），
+每一级分别计时旧查询和 DatabaseManager.get_items_for_test。
+
+用法（在 backend 目录下）：
+    BENCH_DATABASE=english_learning_bench python -m scripts.bench_test_sampler
+    python -m scripts.bench_test_sampler --sizes 10000 1000000 --runs 20
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ['DB_DATABASE'] = os.getenv('BENCH_DATABASE', 'english_learning_bench')
+
+from models.database import DatabaseManager  # noqa: E402
+
+# 基准数据都归属该用户
+BENCH_USERNAME = 'bench_sampler'
+
+LEGACY_QUERY = """
+    (SELECT li.* FROM learning_items li
+    INNER JOIN review_items ri ON li.id = ri.item_id
+    WHERE ri.reviewed = FALSE
+    ORDER BY ri.added_date ASC
+    LIMIT %s)
+    UNION
+    (SELECT li.* FROM learning_items li
+    WHERE li.id NOT IN (SELECT item_id FROM review_items WHERE reviewed = FALSE)
+    ORDER BY RAND()
+    LIMIT %s)
+    LIMIT %s
+"""
+
+
+def bench_user(db):
+    """基准用户的 id，不存在时创建"""
+    user = db.get_user_by_username(BENCH_USERNAME)
+    return user['id'] if user else db.create_user(BENCH_USERNAME, f'{BENCH_USERNAME}@example.com', '-')
+
+
+def fill_items(db, user_id, target):
+    """把基准用户的内容填充到 target 行（按倍增 INSERT ... SELECT），再重建计数表
+
+    抽样按 item_counters 中的内容数选择策略，计数表不准时测到的是全量抽样而不是 id 探测。
+    """
+    connection = db.get_connection()
+    cursor = connection.cursor()
+    cursor.execute("SELECT COUNT(*) FROM learning_items WHERE user_id = %s", (user_id,))
+    count = cursor.fetchone()[0]
+    if count == 0:
+        cursor.execute(
+            "INSERT INTO learning_items (user_id, type, english, chinese) VALUES (%s, 'word', 'seed', '种子')",
+            (user_id,))
+        connection.commit()
+        count = 1
+    while count < target:
+        batch = min(count, target - count)
+        cursor.execute("""
+            INSERT INTO learning_items (user_id, type, english, chinese, example_en, example_zh)
+            SELECT user_id, type, CONCAT('w', id), chinese, example_en, example_zh
+            FROM learning_items WHERE user_id = %s LIMIT %s
+        """, (user_id, batch))
+        connection.commit()
+        count += batch
+    cursor.close()
+    connection.close()
+    db.rebuild_counters()
+    return count
+
+
+def add_reviews(db, user_id, n=20):
+    connection = db.get_connection()
+    cursor = connection.cursor()
+    cursor.execute("SELECT COUNT(*) FROM review_items WHERE user_id = %s AND reviewed = FALSE", (user_id,))
+    if cursor.fetchone()[0] < n:
+        cursor.execute("""
+            INSERT IGNORE INTO review_items (item_id, user_id)
+            SELECT id, user_id FROM learning_items WHERE user_id = %s ORDER BY id LIMIT %s
+        """, (user_id, n))
+        connection.commit()
+    cursor.close()
+    connection.close()
+
+
+def time_legacy(db, limit):
+    connection = db.get_connection()
+    cursor = connection.cursor(dictionary=True)
+    start = time.perf_counter()
+    cursor.execute(LEGACY_QUERY, (limit // 2, limit // 2, limit))
+    cursor.fetchall()
+    elapsed = time.perf_counter() - start
+    cursor.close()
+    connection.close()
+    return elapsed
+
+
+def time_sampler(db, user_id, limit):
+    start = time.perf_counter()
+    items = db.get_items_for_test(user_id, limit)
+    elapsed = time.perf_counter() - start
+    assert len({item.id for item in items}) == len(items), "抽样结果有重复"
+    return elapsed
+
+
+def summarize(samples):
+    samples = sorted(samples)
+    p95 = samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+    return f"p50={statistics.median(samples) * 1000:8.2f}ms  p95={p95 * 1000:8.2f}ms"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 1_000_000, 10_000_000])
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--limit', type=int, default=20)
+    args = parser.parse_args()
+
+    db = DatabaseManager()
+    user_id = bench_user(db)
+    for size in sorted(args.sizes):
+        rows = fill_items(db, user_id, size)
+        add_reviews(db, user_id)
+        legacy = [time_legacy(db, args.limit) for _ in range(args.runs)]
+        sampler = [time_sampler(db, user_id, args.limit) for _ in range(args.runs)]
+        print(f"{rows:>10} items  ORDER BY RAND(): {summarize(legacy)}   id 探测: {summarize(sampler)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,33 @@
+"""把超过保留期的逐日学习记录压缩为按内容的终身汇总（learning_item_summary）
+
+分批处理，每批一个短事务；每日汇总和连续学习天数不受影响。可定时执行。
+
+用法（在 backend 目录下）：
+    python -m scripts.compact_learning_records                      # 保留 RECORD_RETENTION_DAYS 天
+    python -m scripts.compact_learning_records --days 180 --batch-size 2000 --pause 0.1
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config  # noqa: E402
+from models.database import get_db  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--days', type=int, default=Config.RECORD_RETENTION_DAYS, help='逐日记录保留天数')
+    parser.add_argument('--batch-size', type=int, default=Config.COMPACTION_BATCH_SIZE, help='每批处理的行数')
+    parser.add_argument('--pause', type=float, default=0.0, help='批次之间暂停的秒数')
+    args = parser.parse_args()
+
+    compacted = get_db().compact_learning_records(args.days, args.batch_size, args.pause)
+    if compacted is None:
+        sys.exit(1)
+    print(f"完成，共压缩 {compacted} 条学习记录")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+"""本地 TTS 替身服务：模拟 Azure 合成接口，用于在没有 Azure 密钥时验证重试、熔断与缓存
+
+收到 SSML 后返回按内容生成的伪 MP3 数据。可注入延迟和按比例返回的错误状态码，
+退出时（Ctrl+C）输出请求数与新建连接数，可据此确认后端复用了 keep-alive 连接。
+
+用法（在 backend 目录下）：
+    python -m scripts.fake_tts_server --port 8765
+    python -m scripts.fake_tts_server --latency-ms 200 --error-rate 0.3 --error-status 503
+    python -m scripts.fake_tts_server --fail-first 2 --error-status 503
+然后以 TTS_ENDPOINT=http://127.0.0.1:8765/cognitiveservices/v1 启动后端。
+"""
+import argparse
+import hashlib
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+counters = {'requests': 0, 'connections': 0, 'errors': 0}
+counters_lock = threading.Lock()
+
+
+def fake_mp3(ssml, size):
+    """按 SSML 内容生成确定的伪音频：ID3 头 + 重复的摘要字节"""
+    digest = hashlib.sha256(ssml).digest()
+    body = digest * (size // len(digest) + 1)
+    return b'ID3\x03\x00\x00\x00\x00\x00\x00' + body[:size]
+
+
+def make_handler(args):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+        # 响应头和响应体分两次写出，不关 Nagle 会与客户端的延迟 ACK 叠加出约 40ms 的等待
+        disable_nagle_algorithm = True
+
+        def setup(self):
+            super().setup()
+            with counters_lock:
+                counters['connections'] += 1
+
+        def log_message(self, format, *log_args):
+            if args.verbose:
+                super().log_message(format, *log_args)
+
+        def do_POST(self):
+            ssml = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+            with counters_lock:
+                counters['requests'] += 1
+                number = counters['requests']
+            if args.latency_ms:
+                time.sleep(args.latency_ms / 1000)
+
+            if number <= args.fail_first or random.random() < args.error_rate:
+                with counters_lock:
+                    counters['errors'] += 1
+                self.send_response(args.error_status)
+                if args.retry_after is not None:
+                    self.send_header('Retry-After', str(args.retry_after))
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+
+            body = fake_mp3(ssml, args.size)
+            self.send_response(200)
+            self.send_header('Content-Type', 'audio/mpeg')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency-ms', type=float, default=0, help='每个请求的处理延迟')
+    parser.add_argument('--error-rate', type=float, default=0, help='返回错误状态码的比例（0~1）')
+    parser.add_argument('--fail-first', type=int, default=0, help='前 N 个请求固定返回错误状态码')
+    parser.add_argument('--error-status', type=int, default=503)
+    parser.add_argument('--retry-after', type=float, default=None, help='错误响应附带的 Retry-After 秒数')
+    parser.add_argument('--size', type=int, default=16 * 1024, help='返回的音频字节数')
+    parser.add_argument('--verbose', action='store_true', help='输出每个请求的访问日志')
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(args))
+    server.daemon_threads = True
+    print(f"TTS 替身服务: http://{args.host}:{args.port}/cognitiveservices/v1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(f"请求 {counters['requests']}，新建连接 {counters['connections']}，错误 {counters['errors']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,30 @@
+"""回填学习记录、复习记录的 user_id，并重建计数表和连续学习状态
+
+升级后首次启动会自动执行一次；无归属内容（learning_items.user_id 为空）
+需要手动指定归属用户。
+
+用法（在 backend 目录下）：
+    python -m scripts.migrate_user_scope
+    python -m scripts.migrate_user_scope --assign-orphans-to 1
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.database import get_db  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--assign-orphans-to', type=int, metavar='USER_ID',
+                        help='把无归属的学习内容分配给该用户')
+    args = parser.parse_args()
+
+    if not get_db().backfill_user_scope(args.assign_orphans_to):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,27 @@
+"""清理过期的答题事件幂等键（learning_event_keys），建议每天定时执行
+
+用法（在 backend 目录下）：
+    python -m scripts.purge_idempotency_keys
+    python -m scripts.purge_idempotency_keys --days 3
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config  # noqa: E402
+from models.database import get_db  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--days', type=int, default=Config.IDEMPOTENCY_KEY_TTL_DAYS)
+    args = parser.parse_args()
+
+    deleted = get_db().purge_idempotency_keys(args.days)
+    print(f"已删除 {deleted} 个过期幂等键")
+
+
+if __name__ == '__main__':
+    main()
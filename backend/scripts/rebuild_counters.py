@@ -0,0 +1,28 @@
+"""从 learning_items / learning_records 重建计数表（item_counters、learning_daily_rollup）
+
+用法（在 backend 目录下）：
+    python -m scripts.rebuild_counters             # 全量重建
+    python -m scripts.rebuild_counters --days 7    # 只重算最近 7 天中已结束的日期（可定时执行）
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.database import get_db  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--days', type=int, help='只重算最近 N 天的每日汇总')
+    args = parser.parse_args()
+
+    db = get_db()
+    ok = db.compact_daily_rollup(args.days) if args.days else db.rebuild_counters()
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
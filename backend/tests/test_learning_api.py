@@ -0,0 +1,41 @@
+"""学习接口：批量补传答题事件的参数校验"""
+import pytest
+from flask import Flask
+
+from api import learning
+
+
+@pytest.fixture
+def client(db, user_id, monkeypatch):
+    monkeypatch.setattr(learning, 'db', db)
+    app = Flask(__name__)
+    app.secret_key = 'test'
+    app.register_blueprint(learning.bp, url_prefix='/api/learning')
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['user_id'] = user_id
+    return client
+
+
+@pytest.fixture
+def item_id(db, user_id):
+    db.add_item(user_id, 'word', 'apple', '苹果')
+    return db.get_items_for_learning(user_id, limit=1)[0].id
+
+
+@pytest.mark.parametrize('client_ts', [1e20, 10 ** 30, -10 ** 30])
+def test_batch_rejects_out_of_range_client_ts(client, item_id, client_ts):
+    response = client.post('/api/learning/record/batch', json={'events': [
+        {'item_id': item_id, 'is_correct': True, 'idempotency_key': 'ok'},
+        {'item_id': item_id, 'is_correct': True, 'idempotency_key': 'bad', 'client_ts': client_ts},
+    ]})
+    assert response.status_code == 400
+    assert '第 2 条' in response.get_json()['error']
+
+
+def test_batch_accepts_millisecond_client_ts(client, item_id, db, user_id):
+    response = client.post('/api/learning/record/batch', json={'events': [
+        {'item_id': item_id, 'is_correct': True, 'idempotency_key': 'k', 'client_ts': 1700000000000},
+    ]})
+    assert response.status_code == 200
+    assert response.get_json()['data'] == {'applied': 1, 'duplicates': 0}
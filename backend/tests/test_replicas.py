@@ -0,0 +1,122 @@
+"""从库路由：以同一 SQLite 文件上的多个连接池充当从库，外加一个总是连接失败的从库"""
+import time
+
+import pytest
+from mysql.connector import Error
+
+from models.database import DatabaseManager
+from models.pool import PoolExhaustedError
+from models.replicas import ReplicaRouter, begin_request, end_request
+from models.sqlite_backend import SQLitePool
+
+
+class DownPool:
+    """取连接总是失败的从库"""
+
+    def __init__(self, error=None):
+        self.error = error or Error(msg='connection refused')
+        self.calls = 0
+
+    def get_connection(self, timeout=None):
+        self.calls += 1
+        raise self.error
+
+    def stats(self):
+        return {}
+
+    def reset_after_fork(self):
+        pass
+
+    def close_idle(self):
+        pass
+
+
+@pytest.fixture
+def down():
+    return DownPool()
+
+
+@pytest.fixture
+def routed(sqlite_path, down):
+    db = DatabaseManager(SQLitePool(sqlite_path))
+    db.replicas = ReplicaRouter(
+        [('r1', SQLitePool(sqlite_path)), ('down', down), ('r2', SQLitePool(sqlite_path))],
+        check_interval=0.2, window=0.2)
+    return db
+
+
+def replica_reads(db):
+    return {r['name']: r['reads'] for r in db.replicas.stats()['replicas']}
+
+
+def test_reads_round_robin_and_skip_down_replica(routed, down):
+    user_id = routed.create_user('u', 'u@example.com', 'pw')
+    time.sleep(0.25)  # 等注册写入的读己之写窗口过去
+    for _ in range(6):
+        assert routed.get_statistics(user_id)['word_count'] == 0
+
+    stats = routed.replicas.stats()
+    assert stats['replica_reads'] == 6 and stats['fallback_reads'] == 0
+    reads = replica_reads(routed)
+    assert reads['down'] == 0 and reads['r1'] + reads['r2'] == 6 and reads['r1'] and reads['r2']
+    # 标记不可用后 check_interval 内不再尝试
+    assert down.calls == 1
+    assert not next(r for r in stats['replicas'] if r['name'] == 'down')['healthy']
+
+    time.sleep(0.25)
+    for _ in range(3):
+        routed.get_statistics(user_id)
+    assert down.calls == 2
+
+
+def test_read_your_writes_pins_user_to_primary(routed):
+    user_id = routed.create_user('u', 'u@example.com', 'pw')
+    assert routed.add_item(user_id, 'word', 'apple', '苹果')
+    assert routed.replicas.is_pinned(user_id)
+    assert routed.get_statistics(user_id)['word_count'] == 1
+    assert routed.replicas.stats()['pinned_reads'] == 1
+    # 其他用户不受影响
+    assert routed.replicas.get_connection(user_id + 1) is not None
+
+    time.sleep(0.25)
+    assert not routed.replicas.is_pinned(user_id)
+
+
+def test_session_pin_crosses_workers(routed):
+    user_id = routed.create_user('u', 'u@example.com', 'pw')
+    time.sleep(0.25)
+
+    begin_request(None)
+    routed.get_statistics(user_id)
+    assert end_request(routed.replicas.window) is None
+
+    begin_request(None)
+    routed.add_item(user_id, 'word', 'apple', '苹果')
+    primary_until = end_request(routed.replicas.window)
+    assert primary_until is not None
+
+    # 另一个 worker 的路由器没有该用户的写入记录，凭会话中的截止时间走主库
+    other = ReplicaRouter([('r1', SQLitePool(routed.pool.path))], window=0.2)
+    begin_request(primary_until)
+    assert other.get_connection(user_id) is None
+    end_request(0.2)
+    assert other.stats()['pinned_reads'] == 1
+
+
+def test_falls_back_to_primary_when_no_replica(sqlite_path):
+    db = DatabaseManager(SQLitePool(sqlite_path))
+    db.replicas = ReplicaRouter([('down', DownPool())], check_interval=10)
+    user_id = db.create_user('u', 'u@example.com', 'pw')
+    db.add_item(user_id, 'word', 'apple', '苹果')
+    db.replicas.window = 0
+    assert db.get_statistics(user_id)['word_count'] == 1
+    assert db.replicas.stats()['fallback_reads'] == 1
+
+
+def test_busy_replica_is_not_marked_down():
+    busy = DownPool(PoolExhaustedError('busy'))
+    router = ReplicaRouter([('busy', busy)], check_interval=10)
+    assert router.get_connection(None) is None
+    assert router.get_connection(None) is None
+    assert busy.calls == 2
+    assert router.stats()['replicas'][0]['healthy']
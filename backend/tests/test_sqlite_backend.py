@@ -0,0 +1,263 @@
+"""存储后端：DatabaseManager 的主要读写路径在 SQLite 与 MySQL（设置 TEST_MYSQL_DSN 时）上行为一致"""
+import threading
+from datetime import date, timedelta
+
+import models.database as database
+from models.cache import ResultCache
+from models.database import LEARNING_EXPORT_COLUMNS, DatabaseManager
+from models.write_buffer import LearningWriteBuffer
+from models.sqlite_backend import SQLitePool, translate
+
+
+def add_words(db, user_id, n):
+    result = db.add_items_bulk(
+        user_id, ((i, ('phrase' if i % 2 else 'word', f'w{i}', 'c', '', '', '', '')) for i in range(n)))
+    assert result['errors'] == []
+    return result['count']
+
+
+def test_translate_mysql_dialect():
+    sql, _ = translate("INSERT IGNORE INTO t (a) VALUES (%s)")
+    assert sql.startswith("INSERT OR IGNORE INTO t")
+    assert '?' in sql and '%s' not in sql
+
+
+def test_users(db, user_id):
+    assert user_id
+    assert db.get_user_by_id(user_id)['username'] == 'alice'
+    assert db.update_user_token(user_id, 't')
+    assert db.get_user_by_username('alice')['token'] == 't'
+    assert db.update_user_profile(user_id, email='b@example.com')
+    assert db.get_user_by_email('b@example.com')['id'] == user_id
+    # 用户名唯一约束映射为与 MySQL 相同的错误处理：返回 None
+    assert db.create_user('alice', 'c@example.com', 'pw') is None
+
+
+def test_items_counters_and_keyset_paging(db, user_id):
+    assert db.add_item(user_id, 'word', 'apple', '苹果')
+    assert add_words(db, user_id, 30) == 30
+    stats = db.get_statistics(user_id)
+    assert (stats['word_count'], stats['phrase_count']) == (16, 15)
+
+    first = db.get_items_for_learning(user_id, limit=5)
+    second = db.get_items_for_learning(user_id, limit=5, after=(first[-1].created_at, first[-1].id))
+    assert len(first) == len(second) == 5
+    assert not {i.id for i in first} & {i.id for i in second}
+    assert max(i.id for i in second) < min(i.id for i in first)
+
+    words = db.get_items_for_learning(user_id, limit=50, item_type='word', fields=('id', 'type'))
+    assert len(words) == 16 and {i.type for i in words} == {'word'}
+
+
+def test_review_queue(db, user_id):
+    add_words(db, user_id, 10)
+    ids = [i.id for i in db.get_items_for_learning(user_id, limit=3)]
+    assert db.add_to_review(user_id, [{'id': i} for i in ids]) == {'queued': 3, 'already_pending': 0, 'not_found': 0}
+    assert db.add_to_review(user_id, [{'id': i} for i in ids]) == {'queued': 0, 'already_pending': 3, 'not_found': 0}
+    assert [r.id for r in db.get_review_items(user_id)] == sorted(ids)
+
+    assert db.mark_as_reviewed(user_id, ids[0])
+    assert len(db.get_review_items(user_id)) == 2
+    # 复习过的内容可以再次加入
+    assert db.add_to_review(user_id, [{'id': ids[0]}]) == {'queued': 1, 'already_pending': 0, 'not_found': 0}
+    # 不存在或其他用户的内容不计入已在复习库
+    other = db.create_user('bob', 'bob@example.com', 'pw')
+    add_words(db, other, 1)
+    other_id = db.get_items_for_learning(other, limit=1)[0].id
+    assert db.add_to_review(user_id, [{'id': ids[1]}, {'id': other_id}, {'id': 10 ** 6}]) == {
+        'queued': 0, 'already_pending': 1, 'not_found': 2}
+
+    test_items = db.get_items_for_test(user_id, limit=10)
+    assert len(test_items) == 10
+    assert len({i.id for i in test_items}) == 10
+
+
+def test_sampler_fills_quota_from_sparse_ids_without_counters(db, user_id, monkeypatch):
+    """用户的 id 夹在大量其他用户的 id 之间、且没有计数行时，探测不足的名额按区间补齐"""
+    monkeypatch.setattr(database, 'SAMPLE_SCAN_THRESHOLD', 0)
+    other = db.create_user('bob', 'bob@example.com', 'pw')
+    for n in range(10):
+        add_words(db, user_id, 1)
+        add_words(db, other, 200)
+    pending = [i.id for i in db.get_items_for_learning(user_id, limit=3)]
+    db.add_to_review(user_id, [{'id': i} for i in pending])
+    conn = db.get_connection()
+    cursor = conn.cursor(dictionary=True)
+    try:
+        cursor.execute("DELETE FROM item_counters WHERE user_id = %s", (user_id,))
+        conn.commit()
+        for _ in range(5):
+            ids = db._sample_item_ids(cursor, user_id, 5, set(pending[:1]))
+            assert len(ids) == len(set(ids)) == 5
+            assert not set(ids) & set(pending)
+        assert len(db._sample_item_ids(cursor, user_id, 20, set())) == 7
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def test_record_learning_progress_and_streak(db, user_id):
+    add_words(db, user_id, 5)
+    ids = [i.id for i in db.get_items_for_learning(user_id, limit=2)]
+    assert db.record_learning(user_id, ids[0], True)
+    assert db.record_learning(user_id, ids[0], False)
+    assert db.record_learning(user_id, ids[1], True)
+    # 不属于该用户的内容不记录
+    assert not db.record_learning(user_id + 1, ids[0], True)
+
+    today = db.get_today_progress(user_id)
+    assert (today['learned_count'], today['review_count'], today['correct_count']) == (2, 3, 2)
+    assert db.get_learning_streak(user_id)['current_streak'] == 1
+    detail = db.get_detailed_statistics(user_id)
+    assert (detail['total_reviews'], detail['total_wrong']) == (3, 1)
+
+
+def test_learning_events_are_idempotent(db, user_id):
+    add_words(db, user_id, 5)
+    item_id = db.get_items_for_learning(user_id, limit=1)[0].id
+    yesterday = date.today() - timedelta(days=1)
+    events = [{'item_id': item_id, 'is_correct': True, 'learned_date': yesterday, 'idempotency_key': 'k1'}]
+    assert db.record_learning_events(user_id, events) == {'applied': 1, 'duplicates': 0}
+    assert db.record_learning_events(user_id, events) == {'applied': 0, 'duplicates': 1}
+    history = db.get_learning_history(user_id, days=7)
+    assert [(h['learned_date'], h['total_reviews']) for h in history] == [(yesterday.isoformat(), 1)]
+
+
+def test_idempotency_keys_are_per_user(db, user_id):
+    other = db.create_user('bob', 'bob@example.com', 'pw')
+    add_words(db, user_id, 1)
+    add_words(db, other, 1)
+    today = date.today()
+    for uid in (user_id, other):
+        item_id = db.get_items_for_learning(uid, limit=1)[0].id
+        events = [{'item_id': item_id, 'is_correct': True, 'learned_date': today, 'idempotency_key': '1'}]
+        assert db.record_learning_events(uid, events) == {'applied': 1, 'duplicates': 0}
+        assert db.record_learning_events(uid, events) == {'applied': 0, 'duplicates': 1}
+        assert db.get_today_progress(uid)['review_count'] == 1
+
+
+def test_events_before_compaction_watermark_count_on_watermark_day(db, user_id):
+    add_words(db, user_id, 1)
+    item_id = db.get_items_for_learning(user_id, limit=1)[0].id
+    assert db.compact_learning_records(7) == 0
+    watermark = date.today() - timedelta(days=7)
+    assert db.record_learning_events(user_id, [
+        {'item_id': item_id, 'is_correct': True, 'learned_date': watermark - timedelta(days=30),
+         'idempotency_key': 'old'},
+        {'item_id': item_id, 'is_correct': False, 'learned_date': watermark, 'idempotency_key': 'edge'},
+    ]) == {'applied': 2, 'duplicates': 0}
+    history = db.get_learning_history(user_id, days=30)
+    assert [(h['learned_date'], h['total_reviews']) for h in history] == [(watermark.isoformat(), 2)]
+    assert db.get_item_lifetime_stats(user_id, [item_id])[item_id]['days'] == 1
+
+
+def test_rebuild_counters_matches_incremental(db, user_id):
+    add_words(db, user_id, 8)
+    for item in db.get_items_for_learning(user_id, limit=4):
+        db.record_learning(user_id, item.id, item.id % 2 == 0)
+    before = db.get_dashboard(user_id)
+    assert db.rebuild_counters()
+    assert db.get_dashboard(user_id) == before
+
+
+def test_export_items_streams_all_rows(db, user_id):
+    add_words(db, user_id, 12)
+    assert len(list(db.export_items(user_id))) == 12
+    # 提前关闭生成器时连接归还连接池
+    rows = db.export_items(user_id)
+    next(rows)
+    rows.close()
+    assert db.get_statistics(user_id)['word_count'] == 6
+
+
+def test_concurrent_writers(db, user_id):
+    add_words(db, user_id, 40)
+    ids = [i.id for i in db.get_items_for_learning(user_id, limit=40)]
+    errors = []
+
+    def work(n):
+        try:
+            for i in range(20):
+                assert db.record_learning(user_id, ids[(n * 20 + i) % len(ids)], i % 3 == 0)
+        except Exception as e:  # noqa: BLE001
+            errors.append(e)
+
+    threads = [threading.Thread(target=work, args=(n,)) for n in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert errors == []
+    assert db.get_today_progress(user_id)['review_count'] == 80
+
+
+def test_export_learning_records_includes_compacted_history(db, user_id):
+    add_words(db, user_id, 3)
+    ids = [i.id for i in db.get_items_for_learning(user_id, limit=2)]
+    today = date.today()
+    old = today - timedelta(days=30)
+    db.record_learning_events(user_id, [
+        {'item_id': ids[0], 'is_correct': True, 'learned_date': old, 'idempotency_key': 'k1'},
+        {'item_id': ids[0], 'is_correct': False, 'learned_date': old + timedelta(days=1), 'idempotency_key': 'k2'},
+    ])
+    db.record_learning(user_id, ids[0], True)
+    db.record_learning(user_id, ids[1], True)
+    assert db.compact_learning_records(7) == 2
+
+    rows = [dict(zip(LEARNING_EXPORT_COLUMNS, row)) for row in db.export_learning_records(user_id)]
+    assert [(r['record_type'], r['item_id']) for r in rows] == [
+        ('summary', ids[0]), ('daily', min(ids)), ('daily', max(ids))]
+    summary = rows[0]
+    assert (summary['first_learned'], summary['learned_date'], summary['days_count']) == (
+        old, old + timedelta(days=1), 2)
+    assert (summary['review_count'], summary['correct_count'], summary['wrong_count']) == (2, 1, 1)
+    assert all(r['days_count'] == 1 and r['first_learned'] == today for r in rows[1:])
+    assert sum(r['review_count'] for r in rows) == 4
+
+
+def test_write_behind_events_visible_in_dashboard_and_item_stats(db, user_id):
+    add_words(db, user_id, 3)
+    ids = [i.id for i in db.get_items_for_learning(user_id, limit=2)]
+    db.record_learning(user_id, ids[0], True)
+    db.write_buffer = LearningWriteBuffer(db.record_learning_batch, max_events=1000, flush_interval=60)
+    db.record_learning(user_id, ids[0], False)
+    db.record_learning(user_id, ids[1], True)
+
+    def snapshot():
+        dashboard = db.get_dashboard(user_id)
+        assert dashboard['detail'] == db.get_detailed_statistics(user_id)
+        assert dashboard['today'] == db.get_today_progress(user_id)
+        assert dashboard['statistics'] == db.get_statistics(user_id)
+        return dashboard['today'], dashboard['detail']['total_reviews'], db.get_item_lifetime_stats(user_id, ids)
+
+    buffered = snapshot()
+    today, total_reviews, stats = buffered
+    assert (today['learned_count'], today['review_count'], total_reviews) == (2, 3, 3)
+    assert (stats[ids[0]]['days'], stats[ids[0]]['review_count'], stats[ids[0]]['wrong_count']) == (1, 2, 1)
+    assert (stats[ids[1]]['days'], stats[ids[1]]['review_count']) == (1, 1)
+
+    assert db.write_buffer.flush()
+    assert snapshot() == buffered
+
+
+def test_shared_result_cache_does_not_hide_own_buffered_events(sqlite_path, tmp_path):
+    """另一个 worker 写入共享缓存的统计不含本 worker 缓冲中的事件，读取时仍要合并"""
+    shared = str(tmp_path / 'cache.db')
+    workers = []
+    for _ in range(2):
+        worker = DatabaseManager(SQLitePool(sqlite_path))
+        worker.result_cache = ResultCache(shared_path=shared)
+        workers.append(worker)
+    writer, other = workers
+    user_id = writer.create_user('alice', 'alice@example.com', 'pw')
+    add_words(writer, user_id, 2)
+    item_id = writer.get_items_for_learning(user_id, limit=1)[0].id
+    writer.write_buffer = LearningWriteBuffer(writer.record_learning_batch, max_events=1000, flush_interval=60)
+    writer.record_learning(user_id, item_id, True)
+
+    assert other.get_today_progress(user_id)['review_count'] == 0
+    assert other.get_dashboard(user_id)['today']['review_count'] == 0
+    assert writer.get_today_progress(user_id)['review_count'] == 1
+    assert writer.get_dashboard(user_id)['today']['review_count'] == 1
+    assert writer.get_statistics(user_id)['today_learned'] == 1
+    assert writer.result_cache.stats()['shared_hits'] >= 2
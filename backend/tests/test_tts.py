@@ -0,0 +1,250 @@
+"""TTSManager 的重试与熔断
+
+- 假会话代替 requests.Session，按脚本返回响应或抛出异常，覆盖各种错误分支
+- 本地 TTS 替身服务（scripts/fake_tts_server.py）监听临时端口，经真实的 keep-alive 会话验证重试、熔断与连接复用
+"""
+import argparse
+import os
+import threading
+import time
+from http.server import ThreadingHTTPServer
+
+import pytest
+import requests
+
+from config import Config
+from scripts import fake_tts_server
+from utils.tts import CircuitBreaker, TTSManager, TTSUnavailableError
+
+
+class FakeResponse:
+    def __init__(self, status_code, content=b'', headers=None):
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers or {}
+
+
+class FakeSession:
+    """依次返回 script 中的响应；元素为异常时抛出，脚本用完后重复最后一个"""
+
+    def __init__(self, *script):
+        self.script = list(script)
+        self.calls = 0
+
+    def post(self, url, data=None, timeout=None):
+        step = self.script[min(self.calls, len(self.script) - 1)]
+        self.calls += 1
+        if isinstance(step, Exception):
+            raise step
+        return step
+
+
+OK = FakeResponse(200, b'ID3 audio')
+UNAVAILABLE = FakeResponse(503)
+
+
+def make_tts(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, 'AUDIO_CACHE_DIR', str(tmp_path / 'audio'))
+    monkeypatch.setattr(Config, 'TTS_MAX_RETRIES', 2)
+    monkeypatch.setattr(Config, 'TTS_BACKOFF_MAX', 2)
+    monkeypatch.setattr(Config, 'TTS_BREAKER_THRESHOLD', 2)
+    monkeypatch.setattr(Config, 'TTS_BREAKER_COOLDOWN', 0.05)
+    manager = TTSManager()
+    # 重试不等待
+    monkeypatch.setattr(manager, '_backoff', lambda attempt: 0)
+    return manager
+
+
+@pytest.fixture
+def tts(tmp_path, monkeypatch):
+    return make_tts(tmp_path, monkeypatch)
+
+
+@pytest.fixture
+def server(monkeypatch):
+    """在临时端口启动 TTS 替身服务，返回其参数（测试中可修改），TTS_ENDPOINT 指向它"""
+    args = argparse.Namespace(latency_ms=0, error_rate=0, fail_first=0, error_status=503, retry_after=None,
+                              size=1024, verbose=False)
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), fake_tts_server.make_handler(args))
+    httpd.daemon_threads = True
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    monkeypatch.setattr(Config, 'TTS_ENDPOINT', f"http://127.0.0.1:{httpd.server_address[1]}/cognitiveservices/v1")
+    with fake_tts_server.counters_lock:
+        fake_tts_server.counters.update(requests=0, connections=0, errors=0)
+    yield args
+    httpd.shutdown()
+    httpd.server_close()
+
+
+@pytest.fixture
+def live_tts(server, tmp_path, monkeypatch):
+    """连接替身服务的 TTSManager，使用真实的 requests.Session"""
+    manager = make_tts(tmp_path, monkeypatch)
+    yield manager
+    manager.session.close()
+
+
+def use_session(tts, session):
+    tts._session = session
+    tts._pid = os.getpid()
+    return session
+
+
+def generate(tts, text='hello'):
+    return tts.generate_audio(text, 'en-US-JennyNeural')
+
+
+def test_success_after_transient_errors(tts):
+    session = use_session(tts, FakeSession(UNAVAILABLE, requests.ConnectionError('reset'), OK))
+    path = generate(tts)
+    assert path and open(path, 'rb').read() == OK.content
+    assert session.calls == 3
+    stats = tts.stats()
+    assert (stats['requests'], stats['retries'], stats['failures']) == (3, 2, 0)
+    assert stats['breaker']['state'] == 'closed'
+
+
+def test_retry_limit(tts):
+    session = use_session(tts, FakeSession(UNAVAILABLE))
+    assert generate(tts) is None
+    assert session.calls == Config.TTS_MAX_RETRIES + 1
+    stats = tts.stats()
+    assert (stats['retries'], stats['failures']) == (2, 1)
+    assert stats['breaker']['consecutive_failures'] == 1
+
+
+@pytest.mark.parametrize('status', [400, 401, 404])
+def test_no_retry_on_client_error(tts, status):
+    session = use_session(tts, FakeSession(FakeResponse(status)))
+    for _ in range(Config.TTS_BREAKER_THRESHOLD + 1):
+        assert generate(tts) is None
+    # 每次只请求一次，且请求本身的错误不计入熔断
+    assert session.calls == Config.TTS_BREAKER_THRESHOLD + 1
+    assert tts.stats()['retries'] == 0
+    assert tts.breaker.state() == 'closed'
+
+
+def test_no_retry_on_read_timeout(tts):
+    session = use_session(tts, FakeSession(requests.ReadTimeout('slow')))
+    assert generate(tts) is None
+    assert session.calls == 1
+
+
+def test_long_retry_after_gives_up(tts):
+    session = use_session(tts, FakeSession(FakeResponse(429, headers={'Retry-After': '60'})))
+    assert generate(tts) is None
+    assert session.calls == 1
+    assert tts.stats()['failures'] == 1
+
+
+def test_breaker_open_half_open_closed(tts):
+    session = use_session(tts, FakeSession(UNAVAILABLE))
+    for text in ('a', 'b'):
+        assert generate(tts, text) is None
+    assert tts.breaker.state() == 'open'
+
+    # 熔断中不请求上游
+    calls = session.calls
+    with pytest.raises(TTSUnavailableError) as excinfo:
+        generate(tts, 'c')
+    assert excinfo.value.retry_after >= 1
+    assert session.calls == calls
+
+    # 冷却结束放行一个探测请求，失败后重新熔断
+    time.sleep(Config.TTS_BREAKER_COOLDOWN + 0.01)
+    assert tts.breaker.state() == 'half_open'
+    assert generate(tts, 'd') is None
+    assert tts.breaker.state() == 'open'
+    assert tts.breaker.trips == 2
+
+    # 探测成功后恢复
+    time.sleep(Config.TTS_BREAKER_COOLDOWN + 0.01)
+    session.script = [OK]
+    assert generate(tts, 'e')
+    assert tts.breaker.state() == 'closed'
+    assert generate(tts, 'f')
+
+
+def test_half_open_admits_single_probe():
+    breaker = CircuitBreaker(threshold=1, cooldown=0.01)
+    breaker.record_failure()
+    assert breaker.before_call() is not None
+    time.sleep(0.02)
+    assert breaker.before_call() is None
+    # 探测进行中，其他请求仍被拒绝
+    assert breaker.before_call() is not None
+    breaker.record_success()
+    assert breaker.before_call() is None
+    assert breaker.stats()['rejected'] == 2
+
+
+def served():
+    with fake_tts_server.counters_lock:
+        return dict(fake_tts_server.counters)
+
+
+def test_server_retries_then_succeeds(live_tts, server):
+    server.fail_first = 2
+    path = generate(live_tts)
+    assert path and open(path, 'rb').read().startswith(b'ID3')
+    assert served() == {'requests': 3, 'connections': 1, 'errors': 2}
+    stats = live_tts.stats()
+    assert (stats['requests'], stats['retries'], stats['failures']) == (3, 2, 0)
+
+
+def test_server_long_retry_after_gives_up(live_tts, server):
+    server.error_rate, server.error_status, server.retry_after = 1, 429, 60
+    assert generate(live_tts) is None
+    assert served()['requests'] == 1
+    assert live_tts.stats()['failures'] == 1
+
+
+def test_server_breaker_opens_and_recovers(live_tts, server):
+    server.error_rate = 1
+    for text in ('a', 'b'):
+        assert generate(live_tts, text) is None
+    assert served()['requests'] == 2 * (Config.TTS_MAX_RETRIES + 1)
+    assert live_tts.breaker.state() == 'open'
+
+    # 熔断中的请求不到达上游
+    with pytest.raises(TTSUnavailableError):
+        generate(live_tts, 'c')
+    assert served()['requests'] == 2 * (Config.TTS_MAX_RETRIES + 1)
+
+    server.error_rate = 0
+    time.sleep(Config.TTS_BREAKER_COOLDOWN + 0.01)
+    assert generate(live_tts, 'c')
+    assert live_tts.breaker.state() == 'closed'
+
+
+def test_server_connections_are_reused(live_tts, server):
+    # 顺序请求（含重试）共用一个 keep-alive 连接
+    server.fail_first = 2
+    for n in range(10):
+        assert generate(live_tts, f'word{n}')
+    assert served() == {'requests': 12, 'connections': 1, 'errors': 2}
+
+
+def test_server_concurrent_connections_bounded_by_pool(tmp_path, monkeypatch, server):
+    monkeypatch.setattr(Config, 'TTS_POOL_SIZE', 4)
+    manager = make_tts(tmp_path, monkeypatch)
+    server.latency_ms = 20
+    errors = []
+
+    def work(n):
+        try:
+            for i in range(5):
+                assert manager.generate_audio(f'word{n}-{i}', 'en-US-JennyNeural')
+        except Exception as e:  # noqa: BLE001
+            errors.append(e)
+
+    threads = [threading.Thread(target=work, args=(n,)) for n in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    manager.session.close()
+    assert errors == []
+    # 并发数不超过连接池大小时，每个线程的连接一直复用
+    assert served()['requests'] == 20
+    assert served()['connections'] <= Config.TTS_POOL_SIZE
@@ -0,0 +1,491 @@
+import fcntl
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+
+# 分片目录取缓存键（十六进制哈希）的前几位，2 位即 256 个子目录
+SHARD_CHARS = 2
+# 每批取出的淘汰候选数
+EVICT_BATCH = 200
+# 超过这么多秒的临时文件视为写入中途崩溃的残留
+STALE_TMP_SECONDS = 3600
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS audio_files (
+    key TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    voice TEXT,
+    created_at REAL NOT NULL,
+    last_access REAL NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_audio_files_lru ON audio_files (last_access);
+CREATE INDEX IF NOT EXISTS idx_audio_files_lfu ON audio_files (hits, last_access);
+
+CREATE TABLE IF NOT EXISTS audio_totals (
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    files INTEGER NOT NULL,
+    bytes INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO audio_totals (id, files, bytes) VALUES (0, 0, 0);
+
+CREATE TRIGGER IF NOT EXISTS audio_files_insert AFTER INSERT ON audio_files BEGIN
+    UPDATE audio_totals SET files = files + 1, bytes = bytes + NEW.size WHERE id = 0;
+END;
+CREATE TRIGGER IF NOT EXISTS audio_files_delete AFTER DELETE ON audio_files BEGIN
+    UPDATE audio_totals SET files = files - 1, bytes = bytes - OLD.size WHERE id = 0;
+END;
+CREATE TRIGGER IF NOT EXISTS audio_files_resize AFTER UPDATE OF size ON audio_files BEGIN
+    UPDATE audio_totals SET bytes = bytes + NEW.size - OLD.size WHERE id = 0;
+END;
+"""
+
+
+def file_etag(st):
+    """按文件的 stat 结果生成强 ETag，格式与 nginx 对静态文件的 ETag 相同（修改时间-大小，十六进制），
+    各缓存层和 X-Accel-Redirect 交给 nginx 发送时得到同一个值"""
+    return f"{int(st.st_mtime):x}-{st.st_size:x}"
+
+
+EVICTION_ORDER = {
+    'lru': 'last_access',
+    'lfu': 'hits, last_access',
+}
+
+
+class AudioCache:
+    """TTS 音频的磁盘缓存
+
+    - 文件按缓存键前 SHARD_CHARS 位分到子目录：<root>/ab/abcdef....mp3
+    - 元数据（大小、发音人、最近访问、命中次数）存在 <root>/.index.db（SQLite，WAL），
+      同机所有 worker 共用；命中按索引判断，不再逐次 stat 文件
+    - 命中计数先在进程内累积，每隔 touch_interval 秒合并写入索引
+    - 总大小超过 max_bytes 时按 LRU 或 LFU 淘汰到 max_bytes * evict_to 以下
+    - scan() 在启动时对齐索引与磁盘，并把旧版平铺在根目录的文件迁入分片目录
+    """
+
+    def __init__(self, root, max_bytes=0, policy='lru', evict_to=0.9, touch_interval=5.0):
+        if policy not in EVICTION_ORDER:
+            raise ValueError(f"未知的淘汰策略: {policy}，可选: {', '.join(EVICTION_ORDER)}")
+        self.root = Path(root).resolve()
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.index_path = self.root / '.index.db'
+        self.max_bytes = max_bytes
+        self.policy = policy
+        self.evict_to = evict_to
+        self.touch_interval = touch_interval
+        self._init_state()
+
+    def _init_state(self):
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._touches = {}  # key -> [命中次数, 最近访问时间]
+        self._touched_at = time.monotonic()
+        self._last_scan = None
+        self._stats = {
+            'hits': 0,
+            'misses': 0,
+            'adopted': 0,
+            'stored': 0,
+            'evictions': 0,
+            'evicted_bytes': 0,
+            'index_errors': 0,
+        }
+
+    def _check_pid(self):
+        # fork 出的 worker 不沿用父进程的锁和 SQLite 连接
+        if self._pid != os.getpid():
+            self._init_state()
+
+    def _index(self):
+        """本线程的索引连接"""
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            db = sqlite3.connect(self.index_path, timeout=1.0, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            db.executescript(SCHEMA)
+            self._local.db = db
+        return db
+
+    def _index_error(self, e):
+        with self._lock:
+            self._stats['index_errors'] += 1
+        print(f"音频缓存索引出错: {e}")
+
+    def _count(self, name, n=1):
+        with self._lock:
+            self._stats[name] += n
+
+    def path_for(self, key):
+        return self.root / key[:SHARD_CHARS] / f"{key}.mp3"
+
+    # ---- 查找 ----
+
+    def lookup(self, key, count=True):
+        """命中返回文件路径，否则返回 None；count=False 时不计入命中率"""
+        self._check_pid()
+        path = self.path_for(key)
+        try:
+            row = self._index().execute("SELECT 1 FROM audio_files WHERE key = ?", (key,)).fetchone()
+        except sqlite3.Error as e:
+            self._index_error(e)
+            # 索引不可用时退回按文件判断
+            row = path.exists() or None
+        if row is None:
+            # 未入索引的文件（如启动扫描尚未完成时的旧版文件）按需登记
+            row = self._adopt(key, path)
+        if row is None:
+            if count:
+                self._count('misses')
+            return None
+        if count:
+            self._count('hits')
+        self.touch(key)
+        return path
+
+    def _adopt(self, key, path):
+        legacy = self.root / f"{key}.mp3"
+        try:
+            if not path.exists():
+                if not legacy.exists():
+                    return None
+                path.parent.mkdir(exist_ok=True)
+                os.replace(legacy, path)
+            size = path.stat().st_size
+        except FileNotFoundError:
+            # 同时被其他 worker 迁移或淘汰
+            return None
+        now = time.time()
+        try:
+            self._index().execute("""
+                INSERT OR IGNORE INTO audio_files (key, size, voice, created_at, last_access, hits)
+                VALUES (?, ?, NULL, ?, ?, 0)
+            """, (key, size, now, now))
+        except sqlite3.Error as e:
+            self._index_error(e)
+        self._count('adopted')
+        return True
+
+    def touch(self, key):
+        """记录一次访问，按 touch_interval 合并写入索引"""
+        now = time.time()
+        with self._lock:
+            touch = self._touches.setdefault(key, [0, now])
+            touch[0] += 1
+            touch[1] = now
+            due = time.monotonic() - self._touched_at >= self.touch_interval
+        if due:
+            self.flush_touches()
+
+    def flush_touches(self):
+        with self._lock:
+            touches, self._touches = self._touches, {}
+            self._touched_at = time.monotonic()
+        if not touches:
+            return
+        try:
+            self._index().executemany("""
+                UPDATE audio_files SET hits = hits + ?, last_access = MAX(last_access, ?)
+                WHERE key = ?
+            """, [(hits, at, key) for key, (hits, at) in touches.items()])
+        except sqlite3.Error as e:
+            # 只影响淘汰顺序，丢弃即可
+            self._index_error(e)
+
+    # ---- 写入与淘汰 ----
+
+    def put(self, key, content, voice=None):
+        """原子写入音频并登记索引，超出预算时淘汰，返回文件路径"""
+        self._check_pid()
+        path = self.path_for(key)
+        path.parent.mkdir(exist_ok=True)
+        # 先写同目录的临时文件再改名，读者只会看到完整的文件
+        fd, tmp = tempfile.mkstemp(dir=path.parent, prefix='.', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(content)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+        now = time.time()
+        try:
+            self._index().execute("""
+                INSERT INTO audio_files (key, size, voice, created_at, last_access, hits)
+                VALUES (?, ?, ?, ?, ?, 1)
+                ON CONFLICT(key) DO UPDATE SET
+                    size = excluded.size, voice = excluded.voice, last_access = excluded.last_access
+            """, (key, len(content), voice, now, now))
+        except sqlite3.Error as e:
+            # 文件已落盘，下次查找时按需登记
+            self._index_error(e)
+            return path
+        self._count('stored')
+        self.evict(keep=key)
+        return path
+
+    def total_bytes(self):
+        return self._index().execute("SELECT bytes FROM audio_totals WHERE id = 0").fetchone()[0]
+
+    @contextmanager
+    def _try_lock(self, name):
+        """跨 worker 的非阻塞锁，已被占用时得到 False"""
+        with open(self.root / name, 'a') as f:
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                yield False
+                return
+            yield True
+
+    def evict(self, keep=None):
+        """总大小超过预算时按策略淘汰，返回淘汰的文件数；keep 为刚写入、即将返回的键，不淘汰"""
+        if not self.max_bytes:
+            return 0
+        try:
+            if self.total_bytes() <= self.max_bytes:
+                return 0
+        except sqlite3.Error as e:
+            self._index_error(e)
+            return 0
+
+        with self._try_lock('.evict.lock') as locked:
+            if not locked:
+                # 其他 worker 正在淘汰
+                return 0
+            self.flush_touches()
+            db = self._index()
+            target = self.max_bytes * self.evict_to
+            evicted = freed = 0
+            try:
+                total = self.total_bytes()
+                while total > target:
+                    rows = db.execute(f"""
+                        SELECT key, size FROM audio_files WHERE key != ?
+                        ORDER BY {EVICTION_ORDER[self.policy]} LIMIT ?
+                    """, (keep or '', EVICT_BATCH)).fetchall()
+                    if not rows:
+                        break
+                    for key, size in rows:
+                        # 先删索引再删文件：有索引就一定有文件
+                        if db.execute("DELETE FROM audio_files WHERE key = ?", (key,)).rowcount:
+                            try:
+                                os.unlink(self.path_for(key))
+                            except FileNotFoundError:
+                                pass
+                            evicted += 1
+                            freed += size
+                            total -= size
+                        if total <= target:
+                            break
+            except sqlite3.Error as e:
+                self._index_error(e)
+        with self._lock:
+            self._stats['evictions'] += evicted
+            self._stats['evicted_bytes'] += freed
+        return evicted
+
+    # ---- 启动扫描 ----
+
+    def scan(self):
+        """对齐索引与磁盘：迁移根目录下的旧版文件、登记未入索引的文件、
+        删除文件已丢失的索引和残留的临时文件，然后按预算淘汰
+
+        同一时刻只有一个 worker 执行，其他 worker 直接返回 None。
+        """
+        self._check_pid()
+        with self._try_lock('.scan.lock') as locked:
+            if not locked:
+                return None
+            start = time.perf_counter()
+            result = {'migrated': 0, 'added': 0, 'removed': 0, 'stale_tmp': 0}
+            try:
+                db = self._index()
+                indexed = {key for (key,) in db.execute("SELECT key FROM audio_files")}
+
+                for path in self.root.glob('*.mp3'):
+                    target = self.path_for(path.stem)
+                    target.parent.mkdir(exist_ok=True)
+                    os.replace(path, target)
+                    result['migrated'] += 1
+
+                found = {}
+                stale_before = time.time() - STALE_TMP_SECONDS
+                for shard in os.scandir(self.root):
+                    if not shard.is_dir() or len(shard.name) != SHARD_CHARS:
+                        continue
+                    for entry in os.scandir(shard.path):
+                        if entry.name.endswith('.tmp'):
+                            if entry.stat().st_mtime < stale_before:
+                                os.unlink(entry.path)
+                                result['stale_tmp'] += 1
+                        elif entry.name.endswith('.mp3'):
+                            st = entry.stat()
+                            found[entry.name[:-4]] = (st.st_size, st.st_mtime)
+
+                added = [(key, size, mtime, mtime) for key, (size, mtime) in found.items() if key not in indexed]
+                db.executemany("""
+                    INSERT OR IGNORE INTO audio_files (key, size, voice, created_at, last_access, hits)
+                    VALUES (?, ?, NULL, ?, ?, 0)
+                """, added)
+                # 扫描期间新写入的文件不在 indexed 中，不会被误删
+                removed = [(key,) for key in indexed if key not in found]
+                db.executemany("DELETE FROM audio_files WHERE key = ?", removed)
+                result['added'] = len(added)
+                result['removed'] = len(removed)
+            except (sqlite3.Error, OSError) as e:
+                print(f"扫描音频缓存出错: {e}")
+                result['error'] = str(e)
+
+        result['evicted'] = self.evict()
+        result['elapsed_ms'] = round((time.perf_counter() - start) * 1000, 2)
+        result['at'] = time.strftime('%Y-%m-%d %H:%M:%S')
+        with self._lock:
+            self._last_scan = result
+        print(f"音频缓存扫描完成: {result}")
+        return result
+
+    def warm_start(self):
+        """后台执行启动扫描，不阻塞进程启动；扫描完成前的旧版文件由 lookup 按需迁移"""
+        threading.Thread(target=self.scan, name='audio-cache-scan', daemon=True).start()
+
+    # ---- 统计 ----
+
+    def stats(self):
+        self._check_pid()
+        with self._lock:
+            stats = dict(self._stats)
+            stats['pending_touches'] = len(self._touches)
+            last_scan = self._last_scan
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = round(stats['hits'] / lookups, 4) if lookups else 0
+        stats.update({
+            'pid': self._pid,
+            'root': str(self.root),
+            'policy': self.policy,
+            'max_bytes': self.max_bytes,
+            'last_scan': last_scan,
+        })
+        try:
+            db = self._index()
+            stats['files'], stats['bytes'] = db.execute(
+                "SELECT files, bytes FROM audio_totals WHERE id = 0").fetchone()
+            stats['voices'] = [
+                {'voice': voice, 'files': files, 'bytes': size}
+                for voice, files, size in db.execute("""
+                    SELECT voice, COUNT(*), SUM(size) FROM audio_files
+                    GROUP BY voice ORDER BY SUM(size) DESC
+                """)
+            ]
+            stats['top'] = [
+                {'key': key, 'hits': hits, 'size': size}
+                for key, hits, size in db.execute(
+                    "SELECT key, hits, size FROM audio_files ORDER BY hits DESC LIMIT 10")
+            ]
+        except sqlite3.Error as e:
+            self._index_error(e)
+        return stats
+
+
+class MemoryTier:
+    """热点小音频的进程内缓存（按字节数限额的 LRU），位于磁盘层之上
+
+    - 只收录不超过 max_item_bytes 的文件，且在磁盘层命中 admit_hits 次后才载入，
+      一次性访问的内容不占内存
+    - 值是不可变的 bytes 及其 ETag，响应直接引用，不再复制
+    """
+
+    # 等待收录的候选键最多记录这么多个
+    MAX_CANDIDATES = 4096
+
+    def __init__(self, max_bytes, max_item_bytes=256 * 1024, admit_hits=2):
+        self.max_bytes = max_bytes
+        self.max_item_bytes = max_item_bytes
+        self.admit_hits = admit_hits
+        self._init_state()
+
+    def _init_state(self):
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (bytes, ETag)
+        self._size = 0
+        self._candidates = OrderedDict()  # key -> 磁盘层命中次数
+        self._stats = {
+            'hits': 0,
+            'misses': 0,
+            'admitted': 0,
+            'evictions': 0,
+        }
+
+    def _check_pid(self):
+        if self._pid != os.getpid():
+            self._init_state()
+
+    def get(self, key):
+        """命中返回 (bytes, ETag)，否则返回 None"""
+        if not self.max_bytes:
+            return None
+        self._check_pid()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._stats['misses'] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats['hits'] += 1
+            return entry
+
+    def offer(self, key, path):
+        """磁盘层命中后调用；达到收录条件时读入内存并返回 (bytes, ETag)，否则返回 None"""
+        if not self.max_bytes:
+            return None
+        self._check_pid()
+        with self._lock:
+            seen = self._candidates.pop(key, 0) + 1
+            if seen < self.admit_hits:
+                self._candidates[key] = seen
+                while len(self._candidates) > self.MAX_CANDIDATES:
+                    self._candidates.popitem(last=False)
+                return None
+        try:
+            with open(path, 'rb') as f:
+                st = os.fstat(f.fileno())
+                if st.st_size > self.max_item_bytes:
+                    return None
+                entry = (f.read(), file_etag(st))
+        except OSError:
+            return None
+        with self._lock:
+            if key not in self._entries:
+                self._entries[key] = entry
+                self._size += len(entry[0])
+                self._stats['admitted'] += 1
+                while self._size > self.max_bytes:
+                    _, (evicted, _) = self._entries.popitem(last=False)
+                    self._size -= len(evicted)
+                    self._stats['evictions'] += 1
+        return entry
+
+    def stats(self):
+        self._check_pid()
+        with self._lock:
+            stats = dict(self._stats)
+            stats.update({'entries': len(self._entries), 'bytes': self._size})
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = round(stats['hits'] / lookups, 4) if lookups else 0
+        stats.update({
+            'max_bytes': self.max_bytes,
+            'max_item_bytes': self.max_item_bytes,
+            'admit_hits': self.admit_hits,
+        })
+        return stats
@@ -0,0 +1,46 @@
+import csv
+import io
+import json
+from datetime import date
+
+from utils.rows import chunked
+
+
+def _json_default(value):
+    # 导出用于备份/迁移，日期统一为 ISO 8601
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, (bytes, bytearray)):
+        return value.decode('utf-8')
+    raise TypeError(f"无法序列化 {type(value).__name__}")
+
+
+_encode = json.JSONEncoder(ensure_ascii=False, default=_json_default).encode
+
+
+def iter_ndjson(columns, rows):
+    """每行一个 JSON 对象，按块产出 bytes"""
+    return chunked(_encode(dict(zip(columns, row))) + '\n' for row in rows)
+
+
+def iter_csv(columns, rows):
+    """首行为表头的 CSV，按块产出 bytes"""
+    def lines():
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(columns)
+        for row in rows:
+            writer.writerow(value.isoformat() if isinstance(value, date) else value for value in row)
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        yield buffer.getvalue()
+    # 带 BOM，Excel 打开时按 UTF-8 识别中文；导入接口以 utf-8-sig 读取
+    yield '\ufeff'.encode('utf-8')
+    yield from chunked(lines())
+
+
+EXPORT_FORMATS = {
+    'ndjson': (iter_ndjson, 'application/x-ndjson', 'ndjson'),
+    'csv': (iter_csv, 'text/csv; charset=utf-8', 'csv'),
+}
@@ -0,0 +1,69 @@
+import csv
+import io
+import json
+
+ITEM_TYPES = ('word', 'phrase', 'sentence')
+
+
+def iter_json_items(data):
+    """解析 JSON 请求体 {type, items: [...]}，逐条产出 (行号, item)"""
+    default_type = data.get('type')
+    for i, item in enumerate(data.get('items', []), 1):
+        if isinstance(item, dict):
+            item.setdefault('type', default_type)
+        yield i, item
+
+
+def iter_ndjson_items(stream, default_type=None):
+    """流式解析 NDJSON，每行一个 JSON 对象"""
+    text = io.TextIOWrapper(stream, encoding='utf-8', errors='replace')
+    for i, line in enumerate(text, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            item = json.loads(line)
+        except ValueError as e:
+            yield i, {'_error': f'JSON 解析失败: {e}'}
+            continue
+        if isinstance(item, dict):
+            item.setdefault('type', default_type)
+        yield i, item
+
+
+def iter_csv_items(stream, default_type=None):
+    """流式解析 CSV，首行为表头（english,chinese,...）"""
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', errors='replace', newline='')
+    reader = csv.DictReader(text)
+    for row in reader:
+        if not row.get('type'):
+            row['type'] = default_type
+        # 表头占第 1 行
+        yield reader.line_num, row
+
+
+def validate_item(item):
+    """校验单条内容，返回 (行数据元组, 错误信息)"""
+    if not isinstance(item, dict):
+        return None, '格式错误，应为对象'
+    if item.get('_error'):
+        return None, item['_error']
+
+    item_type = item.get('type')
+    if item_type not in ITEM_TYPES:
+        return None, f'类型无效: {item_type}'
+
+    english = (item.get('english') or '').strip()
+    chinese = (item.get('chinese') or '').strip()
+    if not english or not chinese:
+        return None, '英文和中文不能为空'
+
+    return (
+        item_type,
+        english,
+        chinese,
+        item.get('pronunciation') or '',
+        item.get('example_en') or '',
+        item.get('example_zh') or '',
+        item.get('audio_path') or '',
+    ), None
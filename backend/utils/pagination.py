@@ -0,0 +1,27 @@
+import base64
+import json
+from datetime import datetime
+
+
+def encode_cursor(timestamp, row_id):
+    """把 (时间, id) 编码为不透明的游标字符串"""
+    raw = json.dumps([timestamp.isoformat(), row_id])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """解码游标，无效时抛出 ValueError"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        timestamp, row_id = json.loads(base64.urlsafe_b64decode(padded))
+        return datetime.fromisoformat(timestamp), int(row_id)
+    except (TypeError, ValueError) as e:
+        raise ValueError(f'无效的游标: {cursor}') from e
+
+
+def paginate(rows, limit, key):
+    """rows 按 limit + 1 查询，返回 (本页数据, 下一页游标)；key 取行的 (时间, id)"""
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor(*key(rows[-1]))
@@ -0,0 +1,110 @@
+import json
+from collections import namedtuple
+from datetime import date
+from functools import lru_cache
+
+from flask import Response
+from werkzeug.http import http_date
+
+
+def _rebuild_row(fields, values):
+    return row_type(fields)._make(values)
+
+
+@lru_cache(maxsize=64)
+def row_type(fields):
+    """按列名元组生成紧凑的行类型（namedtuple，无实例 __dict__）
+
+    动态生成的类无法按模块路径找到，pickle 时改存 (列名, 值)，
+    读回时按列名取回同一个行类型，结果缓存的共享存储可以保存这些行。
+    """
+    cls = namedtuple('Row', fields, rename=True)
+    cls.__reduce__ = lambda row: (_rebuild_row, (fields, tuple(row)))
+    return cls
+
+
+def make_rows(fields, tuples):
+    """把游标返回的元组转为行对象"""
+    make = row_type(tuple(fields))._make
+    return [make(values) for values in tuples]
+
+
+def parse_fields(value, allowed, required=()):
+    """解析 ?fields=a,b,c；未指定时返回全部允许的列，未知列抛出 ValueError
+
+    required 中的列（id、分页所需列）总会包含在结果中。
+    """
+    if not value:
+        return tuple(allowed)
+    fields = [field.strip() for field in value.split(',') if field.strip()]
+    unknown = [field for field in fields if field not in allowed]
+    if unknown:
+        raise ValueError(f"未知字段: {', '.join(unknown)}，可选: {', '.join(allowed)}")
+    return tuple(dict.fromkeys(list(required) + fields))
+
+
+def _json_default(value):
+    # 与 Flask 默认的 JSON 序列化保持一致
+    if isinstance(value, date):
+        return http_date(value)
+    if isinstance(value, (bytes, bytearray)):
+        return value.decode('utf-8')
+    raise TypeError(f"无法序列化 {type(value).__name__}")
+
+
+_encode = json.JSONEncoder(ensure_ascii=False, default=_json_default).encode
+
+
+# 流式响应每块的大约字节数
+CHUNK_SIZE = 32 * 1024
+
+
+def iter_rows_json(rows, compact=False):
+    """把行对象逐行编码为 JSON 文本片段，不构造整页的字典或字符串
+
+    compact=False: [{"id": 1, ...}, ...]
+    compact=True:  {"columns": ["id", ...], "rows": [[1, ...], ...]}
+    """
+    if not rows:
+        yield '{"columns": [], "rows": []}' if compact else '[]'
+        return
+    fields = rows[0]._fields
+    if compact:
+        yield f'{{"columns": {_encode(list(fields))}, "rows": ['
+        encode_row = _encode
+    else:
+        yield '['
+
+        def encode_row(row):
+            return _encode(dict(zip(fields, row)))
+    for index, row in enumerate(rows):
+        yield (', ' if index else '') + encode_row(row)
+    yield ']}' if compact else ']'
+
+
+def chunked(parts):
+    buffer = []
+    size = 0
+    for part in parts:
+        buffer.append(part)
+        size += len(part)
+        if size >= CHUNK_SIZE:
+            yield ''.join(buffer).encode('utf-8')
+            buffer = []
+            size = 0
+    if buffer:
+        yield ''.join(buffer).encode('utf-8')
+
+
+def rows_response(rows, compact=False, **extra):
+    """列表接口的响应：{"success": true, "data": <rows>, **extra}
+
+    按约 CHUNK_SIZE 字节分块流式输出，整页 JSON 不会同时驻留内存。
+    """
+    def parts():
+        yield '{"success": true, "data": '
+        yield from iter_rows_json(rows, compact)
+        for key, value in extra.items():
+            yield f', {_encode(key)}: {_encode(value)}'
+        yield '}'
+    return Response(chunked(parts()), mimetype='application/json')
@@ -1,65 +1,345 @@
 import requests
+import fcntl
 import hashlib
-from pathlib import Path
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from requests.adapters import HTTPAdapter
 from config import Config
+from utils.audio_cache import AudioCache, MemoryTier, file_etag
+
+# 可重试的上游状态码
+RETRY_STATUS = frozenset({429, 500, 502, 503, 504})
+
+
+class TTSUnavailableError(Exception):
+    """TTS 上游熔断中，retry_after 秒后再试"""
+
+    def __init__(self, retry_after):
+        super().__init__(f"TTS 服务暂不可用，{retry_after:.0f} 秒后重试")
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """熔断器
+
+    - 连续 threshold 次失败（重试用尽）后熔断，cooldown 秒内的请求直接拒绝
+    - 冷却结束后放行一个探测请求（半开），成功则恢复，失败则重新熔断
+    """
+
+    def __init__(self, threshold=5, cooldown=30.0):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self._init_state()
+
+    def _init_state(self):
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._probing = False
+        self.trips = 0
+        self.rejected = 0
+
+    def before_call(self):
+        """放行返回 None，拒绝时返回建议等待的秒数"""
+        with self._lock:
+            if self._opened_at is None:
+                return None
+            remaining = self._opened_at + self.cooldown - time.monotonic()
+            if remaining <= 0 and not self._probing:
+                self._probing = True
+                return None
+            self.rejected += 1
+            return max(remaining, 1.0)
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._probing or (self._opened_at is None and self._failures >= self.threshold):
+                self._opened_at = time.monotonic()
+                self.trips += 1
+                print(f"TTS 熔断 {self.cooldown:.0f} 秒（连续失败 {self._failures} 次）")
+            self._probing = False
+
+    def state(self):
+        with self._lock:
+            if self._opened_at is None:
+                return 'closed'
+            if self._probing or time.monotonic() >= self._opened_at + self.cooldown:
+                return 'half_open'
+            return 'open'
+
+    def stats(self):
+        state = self.state()
+        with self._lock:
+            return {
+                'state': state,
+                'consecutive_failures': self._failures,
+                'trips': self.trips,
+                'rejected': self.rejected,
+            }
+
+
+def _lock_file(path):
+    """打开并独占锁定 path，返回文件对象；锁到的是已被删除的旧文件时重新打开"""
+    while True:
+        f = open(path, 'a')
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            if os.fstat(f.fileno()).st_ino == os.stat(path).st_ino:
+                return f
+        except FileNotFoundError:
+            pass
+        f.close()
+
+
+def _retry_after(response):
+    """解析秒数形式的 Retry-After 响应头"""
+    try:
+        return max(float(response.headers.get('Retry-After', '')), 0.0)
+    except ValueError:
+        return None
 
 
 class TTSManager:
     def __init__(self):
-        self.audio_dir = Path("audio_cache")
-        self.audio_dir.mkdir(exist_ok=True)
+        self.cache = AudioCache(
+            Config.AUDIO_CACHE_DIR,
+            max_bytes=Config.AUDIO_CACHE_MAX_MB * 1024 * 1024,
+            policy=Config.AUDIO_CACHE_POLICY,
+            evict_to=Config.AUDIO_CACHE_EVICT_TO,
+        )
+        self.memory = MemoryTier(
+            Config.AUDIO_MEMORY_CACHE_MB * 1024 * 1024,
+            max_item_bytes=Config.AUDIO_MEMORY_MAX_ITEM_KB * 1024,
+            admit_hits=Config.AUDIO_MEMORY_ADMIT_HITS,
+        )
+        self.lock_dir = self.cache.root / ".locks"
+        self.lock_dir.mkdir(exist_ok=True)
         self.api_key = Config.AZURE_TTS_KEY
         self.region = Config.AZURE_TTS_REGION
-        self.endpoint = f"https://{self.region}.tts.speech.microsoft.com/cognitiveservices/v1"
+        self.endpoint = Config.TTS_ENDPOINT or f"https://{self.region}.tts.speech.microsoft.com/cognitiveservices/v1"
+        self.timeout = (Config.TTS_CONNECT_TIMEOUT, Config.TTS_READ_TIMEOUT)
+        self.max_retries = Config.TTS_MAX_RETRIES
+        self.backoff_base = Config.TTS_BACKOFF_BASE
+        self.backoff_max = Config.TTS_BACKOFF_MAX
+        self.breaker = CircuitBreaker(Config.TTS_BREAKER_THRESHOLD, Config.TTS_BREAKER_COOLDOWN)
+        self._session_lock = threading.Lock()
+        self._session = None
+        self._pid = None
+        self._stats_lock = threading.Lock()
+        self._stats = {'requests': 0, 'retries': 0, 'failures': 0, 'coalesced': 0}
+        self._inflight_lock = threading.Lock()
+        self._inflight = {}  # 缓存键 -> [锁, 等待者数]
 
-    def generate_audio(self, text, voice_name, speech_rate=1.0):
-        """生成音频文件"""
-        # 生成唯一文件名
+    @property
+    def session(self):
+        """keep-alive 会话，连接数与进程内并发请求数一致；fork 后的子进程重建，不共用父进程的套接字"""
+        if self._session is None or self._pid != os.getpid():
+            with self._session_lock:
+                if self._session is None or self._pid != os.getpid():
+                    session = requests.Session()
+                    # 重试由 _post 负责（带抖动退避并计入熔断），连接池不再自动重试
+                    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=Config.TTS_POOL_SIZE, max_retries=0)
+                    session.mount('https://', adapter)
+                    session.mount('http://', adapter)
+                    session.headers.update({
+                        'Ocp-Apim-Subscription-Key': self.api_key or '',
+                        'Content-Type': 'application/ssml+xml',
+                        'X-Microsoft-OutputFormat': 'audio-16khz-128kbitrate-mono-mp3'
+                    })
+                    self._session = session
+                    self._pid = os.getpid()
+        return self._session
+
+    def _count(self, name):
+        with self._stats_lock:
+            self._stats[name] += 1
+
+    def _backoff(self, attempt):
+        # 全抖动指数退避，避免各 worker 同时重试
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def _post(self, ssml):
+        """请求 Azure 合成语音，429/5xx 与连接错误有限次重试；返回音频内容，失败返回 None"""
+        error = None
+        for attempt in range(self.max_retries + 1):
+            delay = None
+            self._count('requests')
+            try:
+                response = self.session.post(self.endpoint, data=ssml, timeout=self.timeout)
+            except requests.ConnectionError as e:
+                # 含连接超时和被服务端关闭的空闲连接
+                error = e
+            except requests.RequestException as e:
+                # 读超时等：上游已经很慢或响应异常，重试只会加重负担
+                error = e
+                break
+            else:
+                if response.status_code == 200:
+                    self.breaker.record_success()
+                    return response.content
+                if response.status_code not in RETRY_STATUS:
+                    # 请求本身的问题（如 400/401），上游是健康的
+                    self.breaker.record_success()
+                    print(f"TTS API错误: {response.status_code}")
+                    return None
+                error = f"HTTP {response.status_code}"
+                delay = _retry_after(response)
+
+            if attempt == self.max_retries:
+                break
+            if delay is None:
+                delay = self._backoff(attempt)
+            if delay > self.backoff_max:
+                # 上游要求等待太久，不占着 worker 等
+                break
+            self._count('retries')
+            time.sleep(delay)
+
+        self._count('failures')
+        self.breaker.record_failure()
+        print(f"TTS API错误: {error}")
+        return None
+
+    @staticmethod
+    def cache_key(text, voice_name, speech_rate=1.0):
         key = f"{text}_{voice_name}_{speech_rate}"
-        filename = hashlib.md5(key.encode()).hexdigest() + ".mp3"
-        audio_path = self.audio_dir / filename
+        return hashlib.md5(key.encode()).hexdigest()
 
-        # 如果已存在，直接返回
-        if audio_path.exists():
-            return str(audio_path)
+    def open_cached(self, name):
+        """按缓存键依次查内存层、磁盘层，不合成
+
+        返回 (缓存层, 音频 bytes, 文件路径, ETag)：内存层命中或刚载入内存时 bytes 不为 None，
+        否则由调用方按路径发送文件；不在缓存中时缓存层为 None。
+        """
+        entry = self.memory.get(name)
+        if entry is not None:
+            # 内存层命中同样计入磁盘层的访问记录，热点文件不会被按 LRU 淘汰
+            self.cache.touch(name)
+            return 'memory', entry[0], None, entry[1]
 
+        audio_path = self.cache.lookup(name)
+        if audio_path is None:
+            return None, None, None, None
+        entry = self.memory.offer(name, audio_path)
+        if entry is not None:
+            return 'disk', entry[0], str(audio_path), entry[1]
         try:
-            rate_percent = int((speech_rate - 1.0) * 100)
-            rate_str = f"{rate_percent:+d}%" if rate_percent != 0 else "0%"
+            etag = file_etag(os.stat(audio_path))
+        except FileNotFoundError:
+            # 刚被其他 worker 淘汰
+            return None, None, None, None
+        return 'disk', None, str(audio_path), etag
 
-            headers = {
-                'Ocp-Apim-Subscription-Key': self.api_key,
-                'Content-Type': 'application/ssml+xml',
-                'X-Microsoft-OutputFormat': 'audio-16khz-128kbitrate-mono-mp3'
-            }
+    def generate_audio(self, text, voice_name, speech_rate=1.0):
+        """生成音频文件；上游熔断中抛出 TTSUnavailableError"""
+        name = self.cache_key(text, voice_name, speech_rate)
+
+        # 如果已存在，直接返回
+        audio_path = self.cache.lookup(name)
+        if audio_path:
+            return str(audio_path)
+        return self._generate(name, text, voice_name, speech_rate)
 
-            ssml = f"""
-            <speak version='1.0' xml:lang='en-US'>
-                <voice xml:lang='en-US' name='{voice_name}'>
-                    <prosody rate='{rate_str}'>
-                        {text}
-                    </prosody>
-                </voice>
-            </speak>
-            """
-
-            response = requests.post(
-                self.endpoint,
-                headers=headers,
-                data=ssml.encode('utf-8'),
-                timeout=10
-            )
-
-            if response.status_code == 200:
-                with open(audio_path, 'wb') as f:
-                    f.write(response.content)
+    def _generate(self, name, text, voice_name, speech_rate):
+        with self._single_flight(name):
+            # 等锁期间其他线程或 worker 可能已经生成
+            audio_path = self.cache.lookup(name, count=False)
+            if audio_path:
+                self._count('coalesced')
                 return str(audio_path)
-            else:
-                print(f"TTS API错误: {response.status_code}")
+
+            retry_after = self.breaker.before_call()
+            if retry_after is not None:
+                raise TTSUnavailableError(retry_after)
+
+            try:
+                rate_percent = int((speech_rate - 1.0) * 100)
+                rate_str = f"{rate_percent:+d}%" if rate_percent != 0 else "0%"
+
+                ssml = f"""
+                <speak version='1.0' xml:lang='en-US'>
+                    <voice xml:lang='en-US' name='{voice_name}'>
+                        <prosody rate='{rate_str}'>
+                            {text}
+                        </prosody>
+                    </voice>
+                </speak>
+                """
+
+                content = self._post(ssml.encode('utf-8'))
+                if content is None:
+                    return None
+                return str(self.cache.put(name, content, voice=voice_name))
+
+            except Exception as e:
+                print(f"生成音频出错: {e}")
                 return None
 
-        except Exception as e:
-            print(f"生成音频出错: {e}")
-            return None
+    @contextmanager
+    def _single_flight(self, name):
+        """同一缓存键同时只有一个合成：进程内按键加锁，跨 worker 用 flock 锁文件"""
+        with self._inflight_lock:
+            entry = self._inflight.get(name)
+            if entry is None:
+                entry = self._inflight[name] = [threading.Lock(), 0]
+            entry[1] += 1
+        try:
+            with entry[0]:
+                lock_path = self.lock_dir / f"{name}.lock"
+                lock_file = _lock_file(lock_path)
+                try:
+                    yield
+                finally:
+                    # 持锁时删除，后来者会发现已删除的锁文件并重新打开（见 _lock_file）
+                    os.unlink(lock_path)
+                    lock_file.close()
+        finally:
+            with self._inflight_lock:
+                entry[1] -= 1
+                if entry[1] == 0:
+                    del self._inflight[name]
+
+    def stats(self):
+        """上游请求与熔断指标（当前进程）"""
+        with self._stats_lock:
+            stats = dict(self._stats)
+        return dict(stats, breaker=self.breaker.stats(), endpoint=self.endpoint)
+
+
+_tts = None
+_tts_lock = threading.Lock()
+
+
+def get_tts():
+    """获取进程内唯一的 TTSManager"""
+    global _tts
+    if _tts is None:
+        with _tts_lock:
+            if _tts is None:
+                _tts = TTSManager()
+    return _tts
+
+
+def _after_fork_in_child():
+    global _tts_lock
+    _tts_lock = threading.Lock()
+    if _tts is not None:
+        _tts.breaker._init_state()
+        _tts._session_lock = threading.Lock()
+        _tts._stats_lock = threading.Lock()
+        _tts._inflight_lock = threading.Lock()
+        _tts._inflight = {}
 
 
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
@@ -2,16 +2,25 @@ import axios from 'axios'
 
 const API_BASE = import.meta.env.VITE_API_URL
 
+// (文本, 发音人, 语速) -> 音频 URL；URL 按内容寻址、可长期缓存，重复播放不再请求后端生成
+const audioUrls = new Map()
+
 export const generateAudio = async (text, voiceName, speechRate) => {
+    const cacheKey = JSON.stringify([text, voiceName, speechRate])
+    if (audioUrls.has(cacheKey)) {
+        return audioUrls.get(cacheKey)
+    }
     const response = await axios.post(
         `${API_BASE}/audio/generate`,
-        { text, voice_name: voiceName, speech_rate: speechRate },
-        { responseType: 'blob' }
+        { text, voice_name: voiceName, speech_rate: speechRate }
     )
-    return URL.createObjectURL(response.data)
+    // 后端返回 /api/audio/files/<key>.mp3，按 API 地址补全协议和主机
+    const url = new URL(response.data.data.url, new URL(API_BASE, window.location.href)).href
+    audioUrls.set(cacheKey, url)
+    return url
 }
 
 export const getVoices = async () => {
     const response = await axios.get(`${API_BASE}/audio/voices`)
     return response.data
-}
\ No newline at end of file
+}
@@ -0,0 +1,10 @@
+import axios from 'axios'
+
+const API_BASE = import.meta.env.VITE_API_URL
+
+// 首页看板：统计、详细统计、今日进度、连续天数一次取回
+// 浏览器按 ETag 自动重新验证，数据未变时服务端返回 304
+export const getDashboard = async () => {
+    const response = await axios.get(`${API_BASE}/dashboard`)
+    return response.data
+}
@@ -6,13 +6,16 @@ export const getStatistics = async () => {
     return response.data
 }
 
-export const getItemsForLearning = async (limit = 50) => {
-    const response = await axios.get(`${API_BASE}/items/list`, { params: { limit } })
+export const getItemsForLearning = async (limit = 50, cursor = null) => {
+    const params = cursor ? { limit, cursor } : { limit }
+    const response = await axios.get(`${API_BASE}/items/list`, { params })
     return response.data
 }
 
-export const getItemsForTest = async (limit = 20) => {
-    const response = await axios.get(`${API_BASE}/items/test`, { params: { limit } })
+// fields: 逗号分隔的列名，只取页面用到的列
+export const getItemsForTest = async (limit = 20, fields = null) => {
+    const params = fields ? { limit, fields } : { limit }
+    const response = await axios.get(`${API_BASE}/items/test`, { params })
     return response.data
 }
 
@@ -38,21 +38,88 @@ CREATE TABLE IF NOT EXISTS learning_items (
 CREATE TABLE IF NOT EXISTS learning_records (
     id INT AUTO_INCREMENT PRIMARY KEY,
     item_id INT NOT NULL,
+    user_id INT,
     learned_date DATE NOT NULL,
     review_count INT DEFAULT 0,
     correct_count INT DEFAULT 0,
     wrong_count INT DEFAULT 0,
     last_review TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     FOREIGN KEY (item_id) REFERENCES learning_items(id) ON DELETE CASCADE,
-    INDEX idx_item_date (item_id, learned_date)
+    UNIQUE KEY unique_item_date (item_id, learned_date),
+    INDEX idx_item_date (item_id, learned_date),
+    INDEX idx_user_date (user_id, learned_date)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
 -- 复习内容表
 CREATE TABLE IF NOT EXISTS review_items (
     id INT AUTO_INCREMENT PRIMARY KEY,
     item_id INT NOT NULL,
+    user_id INT,
     added_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     reviewed BOOLEAN DEFAULT FALSE,
+    reviewed_date TIMESTAMP NULL,
+    pending TINYINT NULL DEFAULT 1,  -- 未复习为 1，复习后置 NULL；配合唯一键保证每个内容只有一条未复习记录
+    FOREIGN KEY (item_id) REFERENCES learning_items(id) ON DELETE CASCADE,
+    UNIQUE KEY uniq_pending_item (item_id, pending),
+    INDEX idx_item_reviewed (item_id, reviewed),
+    INDEX idx_user_reviewed_added_id (user_id, reviewed, added_date, id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- 内容计数表
+CREATE TABLE IF NOT EXISTS item_counters (
+    user_id INT NOT NULL PRIMARY KEY,
+    word_count INT NOT NULL DEFAULT 0,
+    phrase_count INT NOT NULL DEFAULT 0,
+    sentence_count INT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- 每日学习汇总表
+CREATE TABLE IF NOT EXISTS learning_daily_rollup (
+    user_id INT NOT NULL,
+    learned_date DATE NOT NULL,
+    items_count INT NOT NULL DEFAULT 0,
+    total_reviews INT NOT NULL DEFAULT 0,
+    correct_count INT NOT NULL DEFAULT 0,
+    wrong_count INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, learned_date)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- 连续学习状态表
+CREATE TABLE IF NOT EXISTS learning_streaks (
+    user_id INT NOT NULL PRIMARY KEY,
+    current_streak INT NOT NULL DEFAULT 0,
+    longest_streak INT NOT NULL DEFAULT 0,
+    last_active_date DATE NULL
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- 答题事件幂等键表
+CREATE TABLE IF NOT EXISTS learning_event_keys (
+    user_id INT NOT NULL,
+    idempotency_key VARCHAR(64) NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (user_id, idempotency_key),
+    INDEX idx_created (created_at)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- 学习记录终身汇总表（超过保留期的逐日记录压缩后合并到这里）
+CREATE TABLE IF NOT EXISTS learning_item_summary (
+    item_id INT NOT NULL PRIMARY KEY,
+    user_id INT,
+    days_count INT NOT NULL DEFAULT 0,
+    review_count INT NOT NULL DEFAULT 0,
+    correct_count INT NOT NULL DEFAULT 0,
+    wrong_count INT NOT NULL DEFAULT 0,
+    first_learned DATE NOT NULL,
+    last_learned DATE NOT NULL,
+    last_review TIMESTAMP NULL,
     FOREIGN KEY (item_id) REFERENCES learning_items(id) ON DELETE CASCADE,
-    INDEX idx_item_reviewed (item_id, reviewed)
-) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
\ No newline at end of file
+    INDEX idx_user (user_id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- 压缩水位表
+CREATE TABLE IF NOT EXISTS learning_compaction (
+    id TINYINT NOT NULL PRIMARY KEY,
+    compacted_before DATE NOT NULL,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;